@@ -1,11 +1,17 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, session
+from flask import Flask, render_template, request, jsonify, send_from_directory, session, Response, redirect, g
 import os
+import logging
 import json
 import re 
 from dotenv import load_dotenv
 import tempfile 
 import uuid 
 import shutil 
+import threading
+import itertools
+import queue
+import contextvars
+import time
 
 load_dotenv()
 
@@ -15,45 +21,288 @@ from core_logic.config_web import (
     CHATBOT_MODE_GRIEVANCE, 
     # CHATBOT_MODE_SCHEME_FINDER, # Not used in this simplified version yet
     TRANSCRIPTION_MODEL,
-    TTS_MODEL # Import TTS_MODEL
+    TTS_MODEL, # Import TTS_MODEL
+    GRIEVANCE_SEGMENT_MAX_BYTES,
+    GRIEVANCE_GROUP_COMMIT_INTERVAL,
+    GRIEVANCE_COMPACTION_INTERVAL,
+    SESSION_MAX_ENTRIES,
+    SESSION_MAX_BYTES,
+    SESSION_IDLE_TTL,
+    SESSION_SWEEP_INTERVAL,
+    SESSION_BACKEND,
+    SESSION_DB_PATH,
+    FLASK_SECRET_KEY,
+    TTS_RESPONSE_FORMAT,
+    TTS_CACHE_MAX_BYTES,
+    TTS_WARMUP_ON_STARTUP,
+    TTS_WARMUP_WORKERS,
+    BOT_POOL_SIZE,
+    TTS_DELIVERY_MODE,
+    TTS_STREAM_TEE,
+    TTS_STREAM_CHUNK_BYTES,
+    TTS_STREAM_TOKEN_TTL,
+    TTS_AUDIO_MAX_AGE,
+    TTS_AUDIO_MAX_BYTES,
+    DEBUG_AUDIO_MAX_AGE,
+    DEBUG_AUDIO_MAX_BYTES,
+    AUDIO_JANITOR_INTERVAL,
+    AUDIO_JANITOR_GRACE_SECONDS,
+    TTS_JOB_WORKERS,
+    TTS_JOB_MAX_PENDING,
+    TTS_JOB_TTL,
+    TTS_JOB_WAIT_TIMEOUT,
+    TTS_SENTENCE_PIPELINE,
+    TTS_SENTENCE_MIN_CHARS,
+    TRACE_DEBUG_ENDPOINT,
+    DATA_DIR
 )
 from core_logic.chatbot_web import WebChatbot as GrievanceChatbot
 from core_logic.mappings_web import LANGUAGES, get_voice_for_language, get_tts_instruction_for_language
+from core_logic.storage_web import GrievanceStore
+from core_logic.sessions_web import SessionRegistry, BotPool, create_session_backend
+from core_logic.tts_cache_web import TTSCache
+from core_logic.warmup_web import warm_tts_cache
+from core_logic.localization_web import LOCALIZED_STRINGS
+from core_logic.tts_stream_web import PendingSpeechStreams, relay_speech, AUDIO_MIME_TYPES
+from core_logic.janitor_web import AudioJanitor, RetentionPolicy
+from core_logic.tts_jobs_web import TTSJobQueue, SentenceSpeechPipeline
+from core_logic.logging_web import setup_logging, set_log_context, reset_log_context, new_turn_id, session_id_var
+from core_logic.tracing_web import (SPAN_BUFFER, SPAN_KIND_SERVER, TURN_ID_HEADER, TURN_ID_COOKIE, valid_turn_id,
+                                    start_span, end_span, span, to_chrome_trace, to_otlp_json)
+from core_logic.metrics_web import REGISTRY, track_stage, directory_size, TTS_CHARACTERS, STT_AUDIO_BYTES, HTTP_REQUEST_DURATION, ACTIVE_SESSIONS, AUDIO_DIRECTORY_BYTES
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24) 
+app.secret_key = FLASK_SECRET_KEY or os.urandom(24) 
+data_dir = DATA_DIR or app.root_path
 
 # --- Directory for TTS Audio Files ---
-TTS_AUDIO_DIR = os.path.join(app.root_path, 'tts_audio_files')
+TTS_AUDIO_DIR = os.path.join(data_dir, 'tts_audio_files')
 os.makedirs(TTS_AUDIO_DIR, exist_ok=True)
+# Content-addressed cache of synthesized clips, served through /get_tts_audio as well
+TTS_CACHE_DIR = os.path.join(data_dir, 'tts_cache')
+tts_cache = TTSCache(TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES, audio_format=TTS_RESPONSE_FORMAT)
+# Copies of user recordings kept for debugging STT
+DEBUG_AUDIO_DIR = os.path.join(data_dir, 'debug_audio')
+os.makedirs(DEBUG_AUDIO_DIR, exist_ok=True)
+
+# Age/size retention for both directories (the TTS cache bounds itself)
+audio_janitor = AudioJanitor([
+    RetentionPolicy(TTS_AUDIO_DIR, max_age_seconds=TTS_AUDIO_MAX_AGE, max_bytes=TTS_AUDIO_MAX_BYTES,
+                    pattern="tts_*", grace_seconds=AUDIO_JANITOR_GRACE_SECONDS),
+    RetentionPolicy(DEBUG_AUDIO_DIR, max_age_seconds=DEBUG_AUDIO_MAX_AGE, max_bytes=DEBUG_AUDIO_MAX_BYTES,
+                    pattern="user_audio_*", grace_seconds=AUDIO_JANITOR_GRACE_SECONDS),
+], interval=AUDIO_JANITOR_INTERVAL)
+# ---
+
+# --- Append-only grievance store (submissions/grievances.json is migrated by migrate-grievances / python app.py) ---
+grievance_store = GrievanceStore(
+    os.path.join(data_dir, 'submissions'),
+    segment_max_bytes=GRIEVANCE_SEGMENT_MAX_BYTES,
+    group_commit_interval=GRIEVANCE_GROUP_COMMIT_INTERVAL,
+    compaction_interval=GRIEVANCE_COMPACTION_INTERVAL
+)
 # ---
 
 # --- OpenAI Client Initialization (once) ---
+# One pooled client for all requests; each call names its call type (see core_logic/openai_client_web.py)
 openai_client = None
 if OPENAI_API_KEY and OPENAI_API_KEY != "your-api-key-here":
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-    print(f"Global OpenAI client initialized with key ending: ...{OPENAI_API_KEY[-4:] if OPENAI_API_KEY and len(OPENAI_API_KEY) > 4 else '****'}")
+    from core_logic.openai_client_web import ResilientOpenAI
+    openai_client = ResilientOpenAI(api_key=OPENAI_API_KEY)
+    logger.info("Global OpenAI client initialized with key ending: ...%s", OPENAI_API_KEY[-4:] if OPENAI_API_KEY and len(OPENAI_API_KEY) > 4 else '****')
 else:
-    print("WARNING: OPENAI_API_KEY not configured. LLM, Transcription, and TTS features will fail.")
+    logger.warning("OPENAI_API_KEY not configured. LLM, Transcription, and TTS features will fail.")
 
 # --- Helper to get or create a unique session ID ---
 def get_user_session_id():
     if '_user_session_id' not in session:
         session['_user_session_id'] = uuid.uuid4().hex
+        session_id_var.set(session['_user_session_id']) # Later records of this request carry the new id
     return session['_user_session_id']
 
+# --- Log and trace context: records and spans of a request carry its session and turn ids ---
+# The browser sends one turn id with every request of a voice turn (transcription, reply, audio), so they form one trace.
+UNTRACED_ENDPOINTS = {"static", "form_static", "metrics", "debug_traces", "debug_trace"}
+
+@app.before_request
+def bind_log_context():
+    g.request_start = time.perf_counter()
+    turn_id = valid_turn_id(request.headers.get(TURN_ID_HEADER) or request.cookies.get(TURN_ID_COOKIE)) or new_turn_id()
+    g.log_context_tokens = set_log_context(session.get('_user_session_id'), turn_id)
+    if request.endpoint not in UNTRACED_ENDPOINTS:
+        g.request_span = start_span(f"{request.method} {request.endpoint or 'unmatched'}", SPAN_KIND_SERVER,
+                                    {"http.method": request.method, "http.route": request.url_rule.rule if request.url_rule else request.path},
+                                    profile=True)
+
+@app.after_request
+def observe_request_duration(response):
+    # Streamed responses (SSE, TTS relay) are timed to their headers; their upstream calls have stage metrics.
+    request_start = g.get('request_start')
+    if request_start is not None:
+        HTTP_REQUEST_DURATION.labels(request.endpoint or "unmatched", response.status_code).observe(time.perf_counter() - request_start)
+    request_span = g.get('request_span')
+    if request_span:
+        request_span.set_attribute("http.status_code", response.status_code)
+        response.headers[TURN_ID_HEADER] = request_span.trace_id
+    return response
+
+@app.teardown_request
+def unbind_log_context(exc=None):
+    end_span(g.pop('request_span', None), error=exc)
+    tokens = g.pop('log_context_tokens', None)
+    if tokens:
+        reset_log_context(tokens)
+
 # --- Bot Instance Management ---
+# Bounded LRU + idle-TTL registry; a background sweeper drops abandoned sessions.
+app.active_bots = SessionRegistry(
+    max_entries=SESSION_MAX_ENTRIES,
+    max_bytes=SESSION_MAX_BYTES or None,
+    idle_ttl=SESSION_IDLE_TTL,
+    sweep_interval=SESSION_SWEEP_INTERVAL
+)
+
+# Ready-made bots so /init_grievance_chat doesn't construct one on the request path.
+bot_pool = BotPool(lambda: GrievanceChatbot(client=openai_client), size=BOT_POOL_SIZE)
+
+# Shared snapshot store: each turn restores the conversation from here (one small read)
+# and saves it back afterwards (one small write), so no sticky sessions are needed.
+session_backend = create_session_backend(
+    SESSION_BACKEND,
+    db_path=SESSION_DB_PATH or os.path.join(data_dir, 'sessions.db'),
+    idle_ttl=SESSION_IDLE_TTL,
+    max_entries=SESSION_MAX_ENTRIES
+)
+
 def get_grievance_bot_for_session():
     user_sid = get_user_session_id()
     bot_key = f"grievance_bot_{user_sid}"
-    if not hasattr(app, 'active_bots'):
-        app.active_bots = {}
     
-    if bot_key not in app.active_bots:
-        print(f"Creating new GrievanceChatbot for session key: {bot_key}")
-        app.active_bots[bot_key] = GrievanceChatbot(client=openai_client)
-    return app.active_bots[bot_key]
+    current_bot = app.active_bots.get(bot_key)
+    if current_bot is None:
+        logger.info("Creating new GrievanceChatbot for session key: %s", bot_key)
+        current_bot = GrievanceChatbot(client=openai_client)
+        app.active_bots.put(bot_key, current_bot)
+    if session_backend:
+        # Another worker may have served the previous turn; the backend snapshot is authoritative.
+        snapshot = session_backend.load(bot_key)
+        if snapshot:
+            try:
+                current_bot.restore_state(snapshot)
+            except ValueError as e:
+                logger.warning("Could not restore session state for %s: %s. Continuing with local state.", bot_key, e)
+    return current_bot
+
+def save_grievance_bot_for_session(current_bot, bot_key=None):
+    # bot_key must be passed when saving outside the request context (e.g. from a streaming worker thread)
+    bot_key = bot_key or f"grievance_bot_{get_user_session_id()}"
+    app.active_bots.touch(bot_key) # Re-measure the grown history for the memory cap
+    if session_backend:
+        session_backend.save(bot_key, current_bot.snapshot_state())
+
+# --- Text-to-Speech (cached, optionally streamed) ---
+# Stream tokens live in the shared session backend so any worker can serve the audio request.
+pending_speech_streams = PendingSpeechStreams(backend=session_backend, ttl=TTS_STREAM_TOKEN_TTL)
+
+def get_tts_cache_key(text, language_code):
+    voice = get_voice_for_language(language_code)
+    return TTSCache.make_key(text, voice, TTS_MODEL, TTS_RESPONSE_FORMAT, language_code)
+
+def synthesize_tts_audio_url(text, language_code, cache_key=None):
+    """Synthesizes the whole clip, stores it in the TTS cache and returns its URL."""
+    cache_key = cache_key or get_tts_cache_key(text, language_code)
+    # tts_instructions = get_tts_instruction_for_language(language_code) # For gpt-4o-mini-tts
+    TTS_CHARACTERS.labels(TTS_MODEL).inc(len(text))
+    with track_stage("tts", TTS_MODEL):
+        speech_response_openai = openai_client.for_call("tts").audio.speech.create(
+            model=TTS_MODEL,
+            voice=get_voice_for_language(language_code),
+            input=text,
+            # instructions=tts_instructions, # If using a model that supports it well
+            response_format=TTS_RESPONSE_FORMAT
+        )
+    audio_filename = tts_cache.put(cache_key, speech_response_openai.content)
+    logger.debug("TTS audio generated and cached: %s", audio_filename)
+    return f"/get_tts_audio/{audio_filename}"
+
+def get_tts_audio_url(text, language_code, allow_stream=True):
+    """
+    Returns an audio URL for the spoken form of `text`.
+    Clips are looked up in the content-addressed cache first, so repeated phrases
+    cost no API call. On a miss, TTS_DELIVERY_MODE decides whether the browser gets a
+    streaming URL (synthesis starts when it is fetched) or a fully synthesized clip.
+    Returns None if the clip is not cached and no client is configured.
+    """
+    cache_key = get_tts_cache_key(text, language_code)
+    cached_filename = tts_cache.get(cache_key)
+    if cached_filename:
+        logger.debug("TTS cache hit for key %s (lang: %s)", cache_key[:12], language_code)
+        return f"/get_tts_audio/{cached_filename}"
+    if not openai_client:
+        return None
+
+    if allow_stream and TTS_DELIVERY_MODE == "stream":
+        token = pending_speech_streams.register(text, language_code, cache_key)
+        return f"/stream_tts_audio/{token}?clip={cache_key}" # clip: lets a replay find the cached audio once the token is gone
+    return synthesize_tts_audio_url(text, language_code, cache_key)
+
+# Bounded pool for TTS_DELIVERY_MODE == "async": replies go out immediately, audio follows.
+tts_jobs = TTSJobQueue(synthesize_tts_audio_url, max_workers=TTS_JOB_WORKERS, max_pending=TTS_JOB_MAX_PENDING,
+                       backend=session_backend, ttl=TTS_JOB_TTL)
+
+def get_bot_audio_fields(text, language_code):
+    """
+    Audio fields for a bot reply's JSON payload: "audio_url", plus "audio_job_id" when the
+    clip is being synthesized in the background (async mode, cache miss).
+    Both stay None if no server audio is available; the browser then speaks the text itself.
+    """
+    fields = {"audio_url": None, "audio_job_id": None}
+    if not text:
+        return fields
+    if TTS_DELIVERY_MODE != "async" or not openai_client:
+        fields["audio_url"] = get_tts_audio_url(text, language_code)
+        return fields
+    cached_filename = tts_cache.get(get_tts_cache_key(text, language_code))
+    if cached_filename:
+        fields["audio_url"] = f"/get_tts_audio/{cached_filename}"
+    else:
+        fields["audio_job_id"] = tts_jobs.submit(text, language_code)
+    return fields
+
+def speak_sentence(text, language_code, on_ready):
+    """Starts synthesis of one sentence of a streamed reply; on_ready(audio_url or None) is called once it is done."""
+    cached_filename = tts_cache.get(get_tts_cache_key(text, language_code))
+    if cached_filename:
+        on_ready(f"/get_tts_audio/{cached_filename}")
+    elif not tts_jobs.submit(text, language_code, on_done=lambda job: on_ready(job["audio_url"])):
+        on_ready(None) # Queue full: the browser speaks this sentence itself
+
+def warm_up_tts():
+    """Pre-synthesizes every static localized prompt for all languages into the TTS cache."""
+    synthesize = lambda text, language_code: get_tts_audio_url(text, language_code, allow_stream=False)
+    return warm_tts_cache(LOCALIZED_STRINGS, synthesize, max_workers=TTS_WARMUP_WORKERS)
+
+@app.cli.command('warm-tts')
+def warm_tts_command():
+    """Build-time warm-up: flask --app app warm-tts"""
+    if not openai_client:
+        logger.warning("OPENAI_API_KEY not configured; cannot synthesize warm-up clips.")
+        return
+    warm_up_tts()
+
+def migrate_legacy_grievances():
+    """Migrates submissions/grievances.json from DATA_DIR, or from the app directory where it lived before DATA_DIR."""
+    if grievance_store.migrate_legacy_file() or data_dir == app.root_path:
+        return
+    grievance_store.migrate_legacy_file(os.path.join(app.root_path, 'submissions', 'grievances.json'))
+
+@app.cli.command('migrate-grievances')
+def migrate_grievances_command():
+    """One-time copy of submissions/grievances.json into the grievance log: flask --app app migrate-grievances"""
+    migrate_legacy_grievances()
 
 # --- Static files for forms ---
 @app.route('/form_static/<path:filename>')
@@ -72,46 +321,26 @@ def init_grievance_chat():
     user_sid = get_user_session_id() 
     bot_key = f"grievance_bot_{user_sid}"
 
-    if not hasattr(app, 'active_bots'):
-        app.active_bots = {}
-    
-    print(f"Initializing new GrievanceChatbot for session key: {bot_key}")
-    current_bot = GrievanceChatbot(client=openai_client)
-    app.active_bots[bot_key] = current_bot
+    logger.info("Initializing new GrievanceChatbot for session key: %s", bot_key)
+    current_bot = bot_pool.acquire()
+    app.active_bots.put(bot_key, current_bot)
     
     initial_bot_response = current_bot.start_session() 
+    save_grievance_bot_for_session(current_bot)
     bot_text_response = initial_bot_response["bot_response"]
     language_code = initial_bot_response["language"] # e.g. 'en', 'hi'
     
-    audio_url = None
-    if bot_text_response and openai_client:
-        try:
-            voice = get_voice_for_language(language_code)
-            tts_instructions = get_tts_instruction_for_language(language_code)
-            
-            # Generate speech using OpenAI TTS
-            speech_response_openai = openai_client.audio.speech.create(
-                model=TTS_MODEL,
-                voice=voice,
-                input=bot_text_response,
-                # The 'instructions' parameter is not standard for tts-1, but gpt-4o-mini-tts might use it.
-                # For tts-1, it's more about the voice and input language.
-                # If using gpt-4o-mini-tts, you can add: instructions=tts_instructions
-                response_format="mp3" 
-            )
-            audio_filename = f"tts_{uuid.uuid4().hex}.mp3"
-            audio_filepath = os.path.join(TTS_AUDIO_DIR, audio_filename)
-            speech_response_openai.stream_to_file(audio_filepath)
-            audio_url = f"/get_tts_audio/{audio_filename}"
-            print(f"TTS audio generated for init: {audio_filepath}")
-        except Exception as e:
-            print(f"Error generating TTS for initial message: {e}")
+    audio_fields = {"audio_url": None, "audio_job_id": None}
+    try:
+        audio_fields = get_bot_audio_fields(bot_text_response, language_code)
+    except Exception as e:
+        logger.error("Error generating TTS for initial message: %s", e)
 
     return jsonify({
         "bot_response": bot_text_response,
         "language": language_code, 
         "history": current_bot.get_conversation_history(),
-        "audio_url": audio_url # Add audio URL to response
+        **audio_fields # audio_url (or audio_job_id in async TTS mode)
     })
 
 # --- Shared message endpoint ---
@@ -127,7 +356,7 @@ def send_message():
     if active_bot_type == CHATBOT_MODE_GRIEVANCE: 
         current_bot = get_grievance_bot_for_session() 
     else:
-        print("Warning: active_bot_type not in session for /send_message. Defaulting to grievance bot.")
+        logger.warning("active_bot_type not in session for /send_message. Defaulting to grievance bot.")
         session['active_bot_type'] = CHATBOT_MODE_GRIEVANCE 
         current_bot = get_grievance_bot_for_session()
         if not user_message: 
@@ -139,36 +368,156 @@ def send_message():
         return jsonify({"error": "No message provided"}), 400
     
     bot_turn_response = current_bot.process_user_turn(user_message, user_stated_language=user_stated_language_code)
-    
+    save_grievance_bot_for_session(current_bot)
+    return jsonify(build_turn_payload(bot_turn_response))
+
+def build_turn_payload(bot_turn_response):
+    """Client payload for a processed turn: the bot's data (action, form_url etc.) plus its audio fields."""
     bot_text_response = bot_turn_response.get("bot_response")
     language_code = bot_turn_response.get("language", "en") # Default to 'en'
     
     final_json_response = bot_turn_response.copy() # Start with all data from bot (action, form_url etc.)
     final_json_response["audio_url"] = None
+    final_json_response["audio_job_id"] = None
 
-    if bot_text_response and openai_client:
+    try:
+        final_json_response.update(get_bot_audio_fields(bot_text_response, language_code))
+    except Exception as e:
+        logger.error("Error generating TTS for bot response: %s", e)
+        # Fallback: client will use browser TTS if audio_url is null
+    return final_json_response
+
+# --- Streaming message endpoint (server-sent events) ---
+# Same turn pipeline as /send_message, but reply text is pushed to the browser as the LLM
+# generates it: "token" events carry text deltas, a "done" event carries the full
+# /send_message payload (authoritative text, action, audio fields), "error" ends a failed turn.
+# With TTS_SENTENCE_PIPELINE, each finished sentence is synthesized right away and announced in an
+# "audio" event ({"seq", "audio_url", "text"}); "done" then reports "audio_sentences" (the playlist
+# length) instead of a whole-reply clip, and the stream closes once every sentence has been announced.
+def format_sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.route('/send_message_stream', methods=['POST'])
+def send_message_stream():
+    data = request.json
+    user_message = data.get('message')
+    user_stated_language_code = data.get('language')
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    if session.get('active_bot_type') != CHATBOT_MODE_GRIEVANCE:
+        logger.warning("active_bot_type not in session for /send_message_stream. Defaulting to grievance bot.")
+        session['active_bot_type'] = CHATBOT_MODE_GRIEVANCE
+    current_bot = get_grievance_bot_for_session()
+    if not current_bot:
+        return jsonify({"error": "Chatbot instance could not be created or retrieved."}), 500
+    bot_key = f"grievance_bot_{get_user_session_id()}" # Resolved here; the turn runs outside the request context
+
+    events = queue.Queue()
+    speech_pipeline = None
+    if TTS_SENTENCE_PIPELINE and openai_client:
+        speech_pipeline = SentenceSpeechPipeline(
+            lambda text, on_ready: speak_sentence(text, current_bot.language_code, on_ready),
+            lambda seq, audio_url, text: events.put(("audio", {"seq": seq, "audio_url": audio_url, "text": text})),
+            min_chars=TTS_SENTENCE_MIN_CHARS
+        )
+
+    def on_token(text):
+        events.put(("token", {"text": text}))
+        if speech_pipeline:
+            speech_pipeline.feed(text)
+
+    def run_turn():
         try:
-            voice = get_voice_for_language(language_code)
-            # tts_instructions = get_tts_instruction_for_language(language_code) # For gpt-4o-mini-tts
-            
-            speech_response_openai = openai_client.audio.speech.create(
-                model=TTS_MODEL,
-                voice=voice,
-                input=bot_text_response,
-                # instructions=tts_instructions, # If using a model that supports it well
-                response_format="mp3"
-            )
-            audio_filename = f"tts_{uuid.uuid4().hex}.mp3"
-            audio_filepath = os.path.join(TTS_AUDIO_DIR, audio_filename)
-            speech_response_openai.stream_to_file(audio_filepath)
-            
-            final_json_response["audio_url"] = f"/get_tts_audio/{audio_filename}"
-            print(f"TTS audio generated: {audio_filepath}")
+            with span("stream_turn", profile=True):
+                bot_turn_response = current_bot.process_user_turn(
+                    user_message, user_stated_language=user_stated_language_code, on_token=on_token)
+                save_grievance_bot_for_session(current_bot, bot_key=bot_key)
+                sentence_count = speech_pipeline.finish(bot_turn_response.get("bot_response")) if speech_pipeline else 0
+            if sentence_count:
+                payload = bot_turn_response.copy()
+                payload.update({"audio_url": None, "audio_job_id": None, "audio_sentences": sentence_count})
+            else:
+                payload = build_turn_payload(bot_turn_response) # Fixed reply: voiced as a whole (often a warm cache hit)
+                payload["audio_sentences"] = 0
+            events.put(("done", payload))
         except Exception as e:
-            print(f"Error generating TTS for bot response: {e}")
-            # Fallback: client will use browser TTS if audio_url is null
-    
-    return jsonify(final_json_response)
+            logger.exception("Error processing streamed turn for %s: %s", bot_key, e)
+            events.put(("error", {"error": "Failed to process message."}))
+
+    # The turn runs on its own thread so tokens can be yielded while the LLM is still generating.
+    # It runs in a copy of the request's context so its log records and spans keep the session/turn ids.
+    threading.Thread(target=contextvars.copy_context().run, args=(run_turn,), name="stream-turn", daemon=True).start()
+
+    def stream():
+        audio_expected = None # Known once "done" has been sent
+        audio_sent = 0
+        while audio_expected is None or audio_sent < audio_expected:
+            try:
+                event, payload = events.get(timeout=TTS_JOB_WAIT_TIMEOUT if audio_expected is not None else None)
+            except queue.Empty:
+                logger.warning("Timed out waiting for sentence audio for %s; the browser speaks the rest itself.", bot_key)
+                break
+            yield format_sse_event(event, payload)
+            if event == "audio":
+                audio_sent += 1
+            elif event == "done":
+                audio_expected = payload.get("audio_sentences", 0)
+            elif event == "error":
+                break
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+
+# --- Session registry counters (for sizing workers) ---
+@app.route('/session_stats')
+def session_stats():
+    stats = app.active_bots.stats()
+    stats["bot_pool"] = bot_pool.stats()
+    return jsonify(stats)
+
+@app.route('/tts_cache_stats')
+def tts_cache_stats():
+    return jsonify(tts_cache.stats())
+
+@app.route('/janitor_stats')
+def janitor_stats():
+    return jsonify(audio_janitor.stats())
+
+@app.route('/openai_stats')
+def openai_stats():
+    if not openai_client:
+        return jsonify({"error": "OpenAI client not initialized."}), 503
+    return jsonify(openai_client.stats())
+
+# --- Metrics (Prometheus text format; per-stage latency, tokens and errors) ---
+ACTIVE_SESSIONS.set_function(lambda: app.active_bots.stats()["entries"])
+AUDIO_DIRECTORY_BYTES.set_function(lambda: {
+    ("tts_audio",): directory_size(TTS_AUDIO_DIR, "tts_"),
+    ("debug_audio",): directory_size(DEBUG_AUDIO_DIR, "user_audio_"),
+    ("tts_cache",): tts_cache.stats()["bytes"],
+})
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+# --- Traces of recent turns (opt-in: TRACE_DEBUG_ENDPOINT) ---
+@app.route('/debug/traces')
+def debug_traces():
+    if not TRACE_DEBUG_ENDPOINT:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(SPAN_BUFFER.traces(limit=request.args.get('limit', 50, type=int)))
+
+@app.route('/debug/traces/<turn_id>')
+def debug_trace(turn_id):
+    """One turn's spans: ?format=chrome (default; open in chrome://tracing or Perfetto) or ?format=otlp."""
+    if not TRACE_DEBUG_ENDPOINT:
+        return jsonify({"error": "Not found"}), 404
+    spans = SPAN_BUFFER.spans(turn_id)
+    if not spans:
+        return jsonify({"error": "Trace not found"}), 404
+    return jsonify(to_otlp_json(spans) if request.args.get('format') == 'otlp' else to_chrome_trace(spans))
 
 # --- Endpoint for Serving TTS Audio ---
 @app.route('/get_tts_audio/<filename>')
@@ -177,12 +526,80 @@ def get_tts_audio(filename):
     if ".." in filename or filename.startswith("/"):
         return "Invalid filename", 400
     try:
+        if os.path.exists(os.path.join(TTS_CACHE_DIR, filename)):
+            # Cached clips are content-addressed, so browsers may keep them indefinitely.
+            return send_from_directory(TTS_CACHE_DIR, filename, as_attachment=False, max_age=31536000)
         return send_from_directory(TTS_AUDIO_DIR, filename, as_attachment=False)
     except FileNotFoundError:
-        print(f"TTS audio file not found: {filename}")
+        logger.warning("TTS audio file not found: %s", filename)
         return "Audio file not found", 404
 
 
+# --- Endpoints for Asynchronous TTS Jobs (poll or server-sent events) ---
+@app.route('/tts_job/<job_id>')
+def tts_job_status(job_id):
+    job = tts_jobs.status(job_id)
+    if not job:
+        return jsonify({"error": "Unknown or expired audio job"}), 404
+    if job["status"] != "pending":
+        tts_jobs.forget(job_id) # The browser stops polling once it has the final status
+    return jsonify({"status": job["status"], "audio_url": job["audio_url"]})
+
+@app.route('/tts_job/<job_id>/events')
+def tts_job_events(job_id):
+    def events():
+        job = tts_jobs.wait(job_id, timeout=TTS_JOB_WAIT_TIMEOUT)
+        if not job:
+            payload = {"status": "failed", "audio_url": None}
+        elif job["status"] == "pending":
+            payload = {"status": "timeout", "audio_url": None}
+        else:
+            payload = {"status": job["status"], "audio_url": job["audio_url"]}
+            tts_jobs.forget(job_id) # One event per job: the browser closes the stream after it
+        yield f"data: {json.dumps(payload)}\n\n"
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-store"})
+
+@app.route('/tts_job_stats')
+def tts_job_stats():
+    return jsonify(tts_jobs.stats())
+
+# --- Endpoint for Streaming TTS Audio (chunked relay from the TTS API) ---
+@app.route('/stream_tts_audio/<token>')
+def stream_tts_audio(token):
+    spec = pending_speech_streams.get(token)
+    cache_key = spec["cache_key"] if spec else request.args.get("clip", "")
+    cached_filename = tts_cache.get(cache_key) if re.fullmatch(r"[0-9a-f]{64}", cache_key) else None
+    if cached_filename: # Already synthesized (e.g. the browser re-requested the URL)
+        if spec:
+            pending_speech_streams.consume(token)
+        return redirect(f"/get_tts_audio/{cached_filename}")
+    if not spec:
+        return "Audio stream not found or expired", 404
+    if not openai_client:
+        return "TTS not available", 503
+
+    def store_clip(audio_bytes):
+        tts_cache.put(cache_key, audio_bytes)
+        pending_speech_streams.consume(token) # Replays are redirected to the cached clip from now on
+    tee_to_cache = store_clip if TTS_STREAM_TEE == "cache" else None
+    tee_to_path = os.path.join(TTS_AUDIO_DIR, f"tts_{uuid.uuid4().hex}.{TTS_RESPONSE_FORMAT}") if TTS_STREAM_TEE == "disk" else None
+    chunks = relay_speech(
+        openai_client, TTS_MODEL, get_voice_for_language(spec["language"]), spec["text"], TTS_RESPONSE_FORMAT,
+        chunk_size=TTS_STREAM_CHUNK_BYTES, tee_to_cache=tee_to_cache, tee_to_path=tee_to_path
+    )
+    # Pull the first chunk before sending headers so upstream failures become a clean 502
+    # (the browser then falls back to its own speech synthesis).
+    try:
+        first_chunk = next(chunks)
+    except StopIteration:
+        first_chunk = b""
+    except Exception as e:
+        logger.error("Error starting TTS stream: %s", e)
+        return "TTS stream failed", 502
+    return Response(itertools.chain([first_chunk], chunks),
+                    mimetype=AUDIO_MIME_TYPES.get(TTS_RESPONSE_FORMAT, "application/octet-stream"),
+                    headers={"Cache-Control": "no-store"})
+
 # --- Endpoint for Speech-to-Text ---
 @app.route('/transcribe_audio', methods=['POST'])
 def transcribe_audio_route():
@@ -196,15 +613,12 @@ def transcribe_audio_route():
 
     language_hint = request.form.get('language', 'en') 
     if language_hint not in LANGUAGES.values(): 
-        print(f"Warning: Invalid language hint '{language_hint}' for STT. Defaulting to 'en'.")
+        logger.warning("Invalid language hint '%s' for STT. Defaulting to 'en'.", language_hint)
         language_hint = 'en'
 
     temp_audio_path = None
     debug_audio_path = None 
     try:
-        debug_audio_dir = os.path.join(app.root_path, 'debug_audio')
-        os.makedirs(debug_audio_dir, exist_ok=True)
-        
         temp_dir = tempfile.gettempdir()
         original_filename = file.filename or "audio.webm" 
         extension = os.path.splitext(original_filename)[1]
@@ -218,33 +632,34 @@ def transcribe_audio_route():
         unique_filename_base = f"user_audio_{uuid.uuid4().hex}"
         temp_audio_path = os.path.join(temp_dir, f"{unique_filename_base}{extension}")
         
-        debug_audio_path = os.path.join(debug_audio_dir, f"{unique_filename_base}{extension}")
+        debug_audio_path = os.path.join(DEBUG_AUDIO_DIR, f"{unique_filename_base}{extension}")
         file.save(temp_audio_path) # Save to temp path first
         shutil.copy2(temp_audio_path, debug_audio_path) # Then copy for debugging
-        print(f"Audio saved temporarily to: {temp_audio_path}, size: {os.path.getsize(temp_audio_path)} bytes")
-        print(f"DEBUGGING: Audio copy saved to: {debug_audio_path}")
+        logger.debug("Audio saved temporarily to: %s, size: %s bytes", temp_audio_path, os.path.getsize(temp_audio_path))
+        logger.debug("Audio copy saved to: %s", debug_audio_path)
 
+        STT_AUDIO_BYTES.labels(TRANSCRIPTION_MODEL).inc(os.path.getsize(temp_audio_path))
         with open(temp_audio_path, "rb") as audio_file_to_transcribe:
-            transcription_response = openai_client.audio.transcriptions.create(
+            audio_upload = (os.path.basename(temp_audio_path), audio_file_to_transcribe.read()) # Bytes, so a retried call resends the whole clip
+        with track_stage("stt", TRANSCRIPTION_MODEL):
+            transcription_response = openai_client.for_call("stt").audio.transcriptions.create(
                 model=TRANSCRIPTION_MODEL, 
-                file=audio_file_to_transcribe,
+                file=audio_upload,
                 language=language_hint, 
                 response_format="json" 
             )
         transcript_text = transcription_response.text
-        print(f"Transcription successful. Language hint: {language_hint}, Text: {transcript_text}")
+        logger.debug("Transcription successful. Language hint: %s, Text: %s", language_hint, transcript_text)
         return jsonify({"transcript": transcript_text})
     except Exception as e:
-        print(f"Error during transcription: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error during transcription: %s", e)
         return jsonify({"error": f"Transcription failed: {str(e)}"}), 500
     finally:
         if temp_audio_path and os.path.exists(temp_audio_path):
             try:
                 os.remove(temp_audio_path)
             except Exception as e:
-                print(f"Error deleting temporary STT audio file {temp_audio_path}: {e}")
+                logger.error("Error deleting temporary STT audio file %s: %s", temp_audio_path, e)
 
 # --- Grievance Form Routes ---
 @app.route('/forms/<form_name>')
@@ -259,17 +674,15 @@ def serve_form(form_name):
 def submit_grievance_form_route():
     try:
         form_data = request.get_json(force=True) 
-        submissions_dir = os.path.join(app.root_path, 'submissions')
-        os.makedirs(submissions_dir, exist_ok=True)
-        submission_file_path = os.path.join(submissions_dir, 'grievances.json')
-        try:
-            with open(submission_file_path, 'r') as f: submissions = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError): submissions = []
-        submissions.append(form_data)
-        with open(submission_file_path, 'w') as f: json.dump(submissions, f, indent=2)
+        grievance_store.append(form_data) # Blocks only until this record's batch is fsync'd
         return jsonify({"message": "Form submitted successfully via main app!"}), 200
     except Exception as e:
-        print(f"Error processing form submission: {e}"); return jsonify({"error": str(e)}), 500
+        logger.exception("Error processing form submission: %s", e); return jsonify({"error": str(e)}), 500
+
+# --- Startup warm-up (runs in the background so boot is not delayed) ---
+if TTS_WARMUP_ON_STARTUP and openai_client:
+    threading.Thread(target=warm_up_tts, name="tts-warmup", daemon=True).start()
 
 if __name__ == '__main__':
+    migrate_legacy_grievances()
     app.run(host='0.0.0.0', debug=True, port=5050)
@@ -0,0 +1,94 @@
+# Benchmark for the offline language identifier in core_logic/detector_web.py.
+# Reports accuracy on a labelled set of grievance-style turns, the share of turns
+# answered locally at the configured confidence threshold (i.e. LLM calls avoided),
+# the accuracy of those local answers, and the per-call latency.
+#
+# Usage: python benchmarks/bench_language_id.py [--threshold 0.9]
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_logic.config_web import LANG_ID_CONFIDENCE_THRESHOLD
+from core_logic.detector_web import identify_language
+
+# (text, expected language); none of these are in the identifier's seed texts.
+SAMPLES = [
+    ("The streetlights on our lane have not worked for two weeks", "english"),
+    ("I want to complain about the delay in my pension", "english"),
+    ("Garbage is not being collected from our colony", "english"),
+    ("The contractor took money but the drain is still broken", "english"),
+    ("No, that is wrong, my phone number is different", "english"),
+    ("Please submit the form now", "english"),
+    ("It started about three months ago", "english"),
+    ("I already went to the ward office twice", "english"),
+    ("hamari gali ki light do hafte se band hai", "hindi"),
+    ("meri pension mein bahut der ho rahi hai", "hindi"),
+    ("colony se kachra nahi uthaya ja raha", "hindi"),
+    ("theke wale ne paise le liye par naali abhi bhi tooti hai", "hindi"),
+    ("nahi, yeh galat hai, mera phone number alag hai", "hindi"),
+    ("haan ji bilkul sahi hai", "hindi"),
+    ("teen mahine pehle shuru hua tha", "hindi"),
+    ("main do baar ward office ja chuka hoon", "hindi"),
+    ("हमारी गली की बत्ती दो हफ्ते से बंद है", "hindi"),
+    ("मेरी पेंशन में बहुत देर हो रही है", "hindi"),
+    ("कॉलोनी से कूड़ा नहीं उठाया जा रहा है", "hindi"),
+    ("ठेकेदार ने पैसे ले लिए लेकिन नाली अभी भी टूटी है", "hindi"),
+    ("नहीं, यह गलत है, मेरा फोन नंबर अलग है", "hindi"),
+    ("यह तीन महीने पहले शुरू हुआ था", "hindi"),
+    ("मैं दो बार वार्ड कार्यालय जा चुका हूँ", "hindi"),
+    ("आमच्या गल्लीतील दिवे दोन आठवड्यांपासून बंद आहेत", "marathi"),
+    ("माझ्या पेन्शनला खूप उशीर होत आहे", "marathi"),
+    ("कॉलनीतून कचरा उचलला जात नाही", "marathi"),
+    ("ठेकेदाराने पैसे घेतले पण गटार अजूनही फुटलेले आहे", "marathi"),
+    ("नाही, हे चुकीचे आहे, माझा फोन नंबर वेगळा आहे", "marathi"),
+    ("हे तीन महिन्यांपूर्वी सुरू झाले", "marathi"),
+    ("मी दोनदा वॉर्ड कार्यालयात गेलो आहे", "marathi"),
+    ("எங்கள் தெருவில் விளக்குகள் இரண்டு வாரங்களாக எரியவில்லை", "tamil"),
+    ("என் ஓய்வூதியம் மிகவும் தாமதமாகிறது", "tamil"),
+    ("ஆம், அது சரி", "tamil"),
+    ("ನಮ್ಮ ಬೀದಿಯ ದೀಪಗಳು ಎರಡು ವಾರಗಳಿಂದ ಕೆಲಸ ಮಾಡುತ್ತಿಲ್ಲ", "kannada"),
+    ("ನನ್ನ ಪಿಂಚಣಿ ತುಂಬಾ ತಡವಾಗುತ್ತಿದೆ", "kannada"),
+    ("ಹೌದು, ಅದು ಸರಿ", "kannada"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, default=LANG_ID_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=200, help="Timing repetitions per sample")
+    args = parser.parse_args()
+
+    correct = 0
+    local = 0
+    local_correct = 0
+    for text, expected in SAMPLES:
+        language, confidence = identify_language(text)
+        ok = language == expected
+        correct += ok
+        if confidence >= args.threshold:
+            local += 1
+            local_correct += ok
+        marker = "ok " if ok else "ERR"
+        print(f"[{marker}] {confidence:5.2f} {language or '-':8} (expected {expected:8}) {text[:50]}")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for text, _ in SAMPLES:
+            identify_language(text)
+    per_call_us = (time.perf_counter() - start) / (args.repeat * len(SAMPLES)) * 1e6
+
+    total = len(SAMPLES)
+    print()
+    print(f"Samples:                       {total}")
+    print(f"Overall accuracy:              {correct / total:.1%}")
+    print(f"Answered locally (>= {args.threshold:.2f}):   {local / total:.1%} of LLM calls avoided")
+    print(f"Accuracy of local answers:     {(local_correct / local if local else 0):.1%}")
+    print(f"Mean identify_language time:   {per_call_us:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
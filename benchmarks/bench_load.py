@@ -0,0 +1,390 @@
+# Load and latency benchmark against a local OpenAI stand-in (benchmarks/fake_openai.py).
+# Replays scripted multilingual grievance conversations through the app's HTTP endpoints
+# (/init_grievance_chat, /transcribe_audio for voice turns, /send_message, the reply audio and
+# /submit_grievance once the form is ready) with a number of concurrent users, then reports
+# p50/p95/p99 per endpoint, per whole turn, and per pipeline stage (from the app's /metrics).
+#
+# By default the fake API and the app are both started in this process on free ports, so a run
+# needs no network or API key, and everything the app writes (grievances, sessions, audio) goes to a
+# temporary DATA_DIR that is deleted afterwards. --target runs against an app that is already up instead (start it
+# with OPENAI_BASE_URL pointing at a fake_openai.py server and INCREMENTAL_EXTRACTION=1, since the fake
+# only fills the form through per-turn extraction).
+#
+# Usage: python benchmarks/bench_load.py [--users 8] [--conversations 40] [--voice-share 0.5]
+#        [--latency-scale 0.2] [--error-rate all=0.01] [--output results.json]
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import http.cookiejar
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openai import FakeOpenAIServer, fake_audio, add_fake_openai_arguments, config_from_arguments
+
+# Scripted conversations: the browser language code and the user's messages, in order. Once the
+# script runs out before the form is ready, `filler` is repeated (up to --max-turns).
+CONVERSATIONS = [
+    {"language": "en", "messages": [
+        "The water supply in our colony has been irregular and dirty for the last few weeks",
+        "yes",
+        "My name is Ravi Kumar, my email is ravi.kumar@example.com and my mobile is 9876543210",
+        "I live at 14 Station Road, Nagpur, and the problem is near the main water tank",
+        "It has been going on for about two months"],
+     "filler": "That is all the information I have."},
+    {"language": "hi", "messages": [
+        "हमारे मोहल्ले में पिछले दो हफ्तों से पानी गंदा आ रहा है",
+        "हाँ जी",
+        "मेरा नाम सुनीता शर्मा है, मेरा मोबाइल नंबर 9812345678 है",
+        "मेरा ईमेल sunita.sharma@example.com है और पता 22 गांधी नगर, जयपुर है",
+        "यह समस्या एक महीने से ज़्यादा समय से है"],
+     "filler": "मेरे पास बस इतनी ही जानकारी है।"},
+    {"language": "hi", "messages": [
+        "mera passport application teen mahine se pending hai",
+        "haan ji",
+        "mera naam Amit Singh hai, mobile 9988776655",
+        "application number PSP20240112 hai, email amit.singh@example.com",
+        "maine do baar office mein follow up kiya hai"],
+     "filler": "bas itni hi jaankari hai"},
+    {"language": "ta", "messages": [
+        "எங்கள் தெருவில் சாலை மிகவும் மோசமாக உடைந்துள்ளது",
+        "ஆம்",
+        "என் பெயர் கார்த்திக், மொபைல் 9445566778",
+        "என் மின்னஞ்சல் karthik@example.com, முகவரி 5 காந்தி தெரு, மதுரை",
+        "இது மூன்று மாதங்களாக உள்ளது"],
+     "filler": "என்னிடம் இவ்வளவு தகவல் தான் உள்ளது."},
+    {"language": "mr", "messages": [
+        "माझी शिष्यवृत्ती अजून मिळालेली नाही",
+        "होय",
+        "माझे नाव प्रिया पाटील आहे, मोबाइल 9822334455",
+        "माझा ईमेल priya.patil@example.com आहे, पत्ता 8 शिवाजी नगर, पुणे",
+        "अर्ज करून चार महिने झाले आहेत"],
+     "filler": "माझ्याकडे एवढीच माहिती आहे."},
+    {"language": "kn", "messages": [
+        "ಕಚೇರಿಯಲ್ಲಿ ಅಧಿಕಾರಿ ಲಂಚ ಕೇಳುತ್ತಿದ್ದಾರೆ",
+        "ಹೌದು",
+        "ನನ್ನ ಹೆಸರು ರಾಜು, ಮೊಬೈಲ್ 9900112233",
+        "ನನ್ನ ಇಮೇಲ್ raju@example.com, ವಿಳಾಸ 3 ಎಂ ಜಿ ರಸ್ತೆ, ಬೆಂಗಳೂರು",
+        "ಇದು ಕಳೆದ ವಾರ ನಡೆಯಿತು"],
+     "filler": "ನನ್ನ ಬಳಿ ಇಷ್ಟೇ ಮಾಹಿತಿ ಇದೆ."},
+]
+
+STAGE_METRIC = "grievance_stage_duration_seconds"
+FIRST_CHUNK_METRIC = "grievance_stage_first_chunk_seconds"
+STAGE_ERRORS_METRIC = "grievance_stage_errors_total"
+_SAMPLE_PATTERN = re.compile(r'^(\w+)\{([^}]*)\} (\S+)$')
+_LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of `values` (0.0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(fraction * len(ordered)))) - 1]
+
+
+class Recorder:
+    """Latencies and failures per endpoint (and per whole turn), shared by the user threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, name, seconds, ok=True):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            return {name: {"count": len(values), "errors": self.errors.get(name, 0),
+                           "p50": percentile(values, 0.50), "p95": percentile(values, 0.95), "p99": percentile(values, 0.99),
+                           "mean": sum(values) / len(values)}
+                    for name, values in sorted(self.latencies.items())}
+
+
+class VirtualUser:
+    """One browser: its own cookie jar (Flask session), requests timed per endpoint."""
+
+    def __init__(self, base_url, recorder, fetch_audio=True, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.fetch_audio = fetch_audio
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, name, path, body=None, headers=None, method=None):
+        """Returns (status, body bytes); network errors count as status 0."""
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers or {}, method=method)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status, data = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, data = e.code, e.read()
+        except OSError:
+            status, data = 0, b""
+        self.recorder.record(name, time.perf_counter() - start, ok=200 <= status < 300)
+        return status, data
+
+    def post_json(self, name, path, payload, turn_id=None):
+        headers = {"Content-Type": "application/json"}
+        if turn_id:
+            headers["X-Turn-Id"] = turn_id
+        status, data = self.request(name, path, json.dumps(payload).encode("utf-8"), headers)
+        try:
+            return status, json.loads(data or b"{}")
+        except ValueError:
+            return status, {}
+
+    def transcribe(self, text, language_code, turn_id):
+        boundary = uuid.uuid4().hex
+        body = b"".join([
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"language\"\r\n\r\n{language_code}\r\n".encode(),
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"audio_file\"; filename=\"user_audio.webm\"\r\n"
+            f"Content-Type: audio/webm\r\n\r\n".encode(),
+            fake_audio(text), f"\r\n--{boundary}--\r\n".encode(),
+        ])
+        status, data = self.request("transcribe_audio", "/transcribe_audio", body,
+                                    {"Content-Type": f"multipart/form-data; boundary={boundary}", "X-Turn-Id": turn_id})
+        try:
+            return json.loads(data).get("transcript") if status == 200 else None
+        except ValueError:
+            return None
+
+    def wait_for_audio(self, payload, turn_id):
+        """Fetches the reply audio: directly, or once its audio job is done. Returns True if audio arrived."""
+        audio_url = payload.get("audio_url")
+        job_id = payload.get("audio_job_id")
+        deadline = time.monotonic() + self.timeout
+        while not audio_url and job_id and time.monotonic() < deadline:
+            status, data = self.request("tts_job", f"/tts_job/{job_id}", headers={"X-Turn-Id": turn_id})
+            job = json.loads(data or b"{}") if status == 200 else {"status": "failed"}
+            if job.get("status") != "pending":
+                audio_url = job.get("audio_url")
+                break
+            time.sleep(0.05)
+        if not audio_url:
+            return False
+        name = audio_url.strip("/").split("/")[0]
+        status, _ = self.request(name, audio_url, headers={"X-Turn-Id": turn_id})
+        return status == 200
+
+    def run_conversation(self, script, voice_share, max_turns, rng):
+        """Returns True if the conversation reached the form and it was submitted."""
+        language_code = script["language"]
+        status, _ = self.post_json("init_grievance_chat", "/init_grievance_chat", {})
+        if status != 200:
+            return False
+        messages = list(script["messages"])
+        for turn in range(max_turns):
+            text = messages[turn] if turn < len(messages) else script["filler"]
+            turn_id = uuid.uuid4().hex[:16]
+            turn_start = time.perf_counter()
+            voice = rng.random() < voice_share
+            if voice:
+                text = self.transcribe(text, language_code, turn_id)
+                if not text:
+                    self.recorder.record("turn_voice", time.perf_counter() - turn_start, ok=False)
+                    continue
+            status, payload = self.post_json("send_message", "/send_message", {"message": text, "language": language_code}, turn_id)
+            audio_ok = status == 200 and (not self.fetch_audio or self.wait_for_audio(payload, turn_id))
+            self.recorder.record("turn_voice" if voice else "turn_text", time.perf_counter() - turn_start, ok=status == 200 and audio_ok)
+            if status != 200:
+                continue
+            language_code = payload.get("language", language_code)
+            if payload.get("action") == "LOAD_FORM":
+                form_data = dict(payload.get("form_data") or {}, declaration=True)
+                status, _ = self.post_json("submit_grievance", "/submit_grievance", form_data)
+                return status == 200
+        return False
+
+
+def parse_metrics(text):
+    """{(metric name, labels tuple): value} for every sample of a Prometheus text exposition."""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE_PATTERN.match(line)
+        if match:
+            labels = tuple(sorted(_LABEL_PATTERN.findall(match.group(2))))
+            samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+def histogram_quantiles(before, after, metric):
+    """
+    Per (stage, model): count and p50/p95/p99 of a histogram over the run (after minus before),
+    interpolated within buckets like Prometheus' histogram_quantile().
+    """
+    buckets = {}
+    for (name, labels), value in after.items():
+        if name != f"{metric}_bucket":
+            continue
+        label_map = dict(labels)
+        key = (label_map.get("stage"), label_map.get("model"))
+        bound = float("inf") if label_map["le"] == "+Inf" else float(label_map["le"])
+        buckets.setdefault(key, []).append((bound, value - before.get((name, labels), 0.0)))
+    results = {}
+    for key, key_buckets in buckets.items():
+        key_buckets.sort()
+        total = key_buckets[-1][1]
+        if total <= 0:
+            continue
+        quantiles = {}
+        for label, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            rank = fraction * total
+            lower_bound, lower_count = 0.0, 0.0
+            for bound, count in key_buckets:
+                if count >= rank:
+                    if bound == float("inf"):
+                        quantiles[label] = lower_bound # Beyond the largest bucket; report its bound
+                    else:
+                        quantiles[label] = lower_bound + (bound - lower_bound) * ((rank - lower_count) / max(count - lower_count, 1e-9))
+                    break
+                lower_bound, lower_count = bound, count
+        results[f"{key[0]} ({key[1]})"] = dict(quantiles, count=int(total))
+    return results
+
+
+def stage_errors(before, after):
+    errors = {}
+    for (name, labels), value in after.items():
+        if name == STAGE_ERRORS_METRIC and value - before.get((name, labels), 0.0) > 0:
+            label_map = dict(labels)
+            errors[f"{label_map['stage']} ({label_map['kind']})"] = int(value - before.get((name, labels), 0.0))
+    return errors
+
+
+def scrape_metrics(base_url):
+    try:
+        with urllib.request.urlopen(base_url.rstrip("/") + "/metrics", timeout=10) as response:
+            return parse_metrics(response.read().decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def start_local_app(args, data_dir):
+    """
+    Starts the fake API and the app (threaded dev server) in this process.
+
+    Args:
+        args (argparse.Namespace): Parsed command line (fake API settings).
+        data_dir (str): Scratch directory for everything the app writes (grievances, sessions, audio),
+            so the benchmark never touches the real stores.
+
+    Returns:
+        tuple: (app base URL, FakeOpenAIServer)
+    """
+    fake_server = FakeOpenAIServer(config_from_arguments(args))
+    os.environ["OPENAI_BASE_URL"] = fake_server.start()
+    os.environ["OPENAI_API_KEY"] = "sk-fake-benchmark-key"
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["SESSION_DB_PATH"] = os.path.join(data_dir, "sessions.db")
+    os.environ["TTS_WARMUP_ON_STARTUP"] = "0"
+    os.environ.setdefault("INCREMENTAL_EXTRACTION", "1") # The fake only fills the form through per-turn extraction
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from werkzeug.serving import make_server
+    import app as app_module
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING) # No access log line per request
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", fake_server
+
+
+def print_table(title, rows, unit_scale=1000.0):
+    print(f"\n{title}")
+    print(f"  {'name':38} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in rows.items():
+        print(f"  {name:38} {row['count']:>6} {row.get('errors', 0):>6} "
+              f"{row['p50'] * unit_scale:>9.1f} {row['p95'] * unit_scale:>9.1f} {row['p99'] * unit_scale:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and latency benchmark against a local OpenAI stand-in.")
+    parser.add_argument("--target", help="Base URL of a running app (default: start the app and fake API in-process)")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent conversations (default 8)")
+    parser.add_argument("--conversations", type=int, default=40, help="Conversations to run in total (default 40)")
+    parser.add_argument("--voice-share", type=float, default=0.5, help="Share of turns sent as audio through /transcribe_audio (default 0.5)")
+    parser.add_argument("--max-turns", type=int, default=10, help="Turns per conversation before giving up on reaching the form (default 10)")
+    parser.add_argument("--languages", help="Comma-separated browser language codes to replay (default: all scripts)")
+    parser.add_argument("--no-audio", action="store_true", help="Do not fetch reply audio")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    add_fake_openai_arguments(parser)
+    args = parser.parse_args()
+
+    scripts = [script for script in CONVERSATIONS if not args.languages or script["language"] in args.languages.split(",")]
+    if not scripts:
+        parser.error("No conversation scripts for the given --languages")
+    fake_server = None
+    base_url = args.target
+    with tempfile.TemporaryDirectory(prefix="grievance-bench-", ignore_cleanup_errors=True) as data_dir:
+        if not base_url:
+            base_url, fake_server = start_local_app(args, data_dir)
+        run_benchmark(args, scripts, base_url, fake_server)
+
+
+def run_benchmark(args, scripts, base_url, fake_server):
+
+    recorder = Recorder()
+    metrics_before = scrape_metrics(base_url)
+    completed = []
+    rng = random.Random(args.seed)
+    seeds = [rng.random() for _ in range(args.conversations)]
+
+    def run(index):
+        user = VirtualUser(base_url, recorder, fetch_audio=not args.no_audio)
+        completed.append(user.run_conversation(scripts[index % len(scripts)], args.voice_share, args.max_turns, random.Random(seeds[index])))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        list(executor.map(run, range(args.conversations)))
+    elapsed = time.perf_counter() - start
+    metrics_after = scrape_metrics(base_url)
+
+    endpoints = recorder.summary()
+    turns = {name: endpoints.pop(name) for name in list(endpoints) if name.startswith("turn_")}
+    stages = histogram_quantiles(metrics_before, metrics_after, STAGE_METRIC) if metrics_before and metrics_after else {}
+    first_chunks = histogram_quantiles(metrics_before, metrics_after, FIRST_CHUNK_METRIC) if metrics_before and metrics_after else {}
+    turn_count = sum(row["count"] for row in turns.values())
+
+    print(f"Target: {base_url}  users: {args.users}  conversations: {args.conversations}  voice share: {args.voice_share:.0%}")
+    print(f"Completed (form submitted): {sum(completed)}/{len(completed)}  wall time: {elapsed:.1f}s  "
+          f"turns/s: {turn_count / elapsed if elapsed else 0:.2f}")
+    print_table("Per endpoint", endpoints)
+    print_table("Per turn (STT + reply + audio)", turns)
+    if stages:
+        print_table("Per stage (from /metrics; interpolated within histogram buckets)", stages)
+    if first_chunks:
+        print_table("Time to first chunk per stage", first_chunks)
+    errors = stage_errors(metrics_before, metrics_after) if metrics_before and metrics_after else {}
+    if errors:
+        print("\nUpstream errors per stage: " + ", ".join(f"{name}: {count}" for name, count in sorted(errors.items())))
+    if fake_server:
+        print("Fake API calls: " + ", ".join(f"{name}: {count}" for name, count in sorted(fake_server.stats().items())))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"users": args.users, "conversations": args.conversations, "voice_share": args.voice_share,
+                       "completed": sum(completed), "elapsed_seconds": elapsed, "endpoints": endpoints, "turns": turns,
+                       "stages": stages, "first_chunk": first_chunks, "stage_errors": errors}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
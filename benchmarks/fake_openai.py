@@ -0,0 +1,411 @@
+# Local stand-in for the OpenAI API, for load and latency benchmarks without cost or network.
+# Serves the calls the app makes: chat completions (classic replies with control markers, streamed
+# or not; JSON-mode extraction; the structured turn's JSON schema; language detection),
+# transcriptions and speech. Replies are driven by what the app sends (the stage prompt, the
+# CURRENT FORM STATE message, the fields an extraction asks for), so scripted conversations move
+# through the stages to the form like real ones. Each call type has its own latency distribution
+# and error rate, so tail latency and upstream failures can be reproduced.
+#
+# Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8787/v1 (any OPENAI_API_KEY).
+# Usage: python benchmarks/fake_openai.py [--port 8787] [--latency chat=lognormal:0.7,0.35]
+#        [--error-rate tts=0.02] [--latency-scale 0.1] [--seed 1]
+# Transcriptions return the text embedded in the uploaded audio by fake_audio() (see bench_load.py).
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core_logic.normalizers_web import FIELD_OPTIONS
+
+CALL_TYPES = ("chat", "structured", "extraction", "detect", "stt", "tts")
+
+# Time to the first byte (first token for streamed chat), in seconds
+DEFAULT_LATENCY = {
+    "chat": "lognormal:0.7,0.35",
+    "structured": "lognormal:0.9,0.35",
+    "extraction": "lognormal:0.8,0.3",
+    "detect": "lognormal:0.25,0.3",
+    "stt": "lognormal:0.6,0.3",
+    "tts": "lognormal:0.5,0.3",
+}
+
+AUDIO_MARKER = b"FAKE-AUDIO:"
+AUDIO_BYTES_PER_CHAR = 400 # Roughly 48 kbps speech at 15 characters per second
+
+SAMPLE_VALUES = {
+    "full_name": "Asha Verma",
+    "email": "asha.verma@example.com",
+    "mobile": "9876543210",
+    "address": "12 MG Road, Pune 411001",
+    "application_date": "2024-05-01",
+    "incident_date": "2024-06-12",
+    "amount_requested": "5000",
+    "application_number": "APP2024001",
+}
+
+REPLIES = {
+    "english": {"category": "It sounds like a {category} issue. Would you like to file a complaint?",
+                "ask": "Thank you. Could you please tell me your {fields}?", "done": "Thank you, I have all the details."},
+    "hindi": {"category": "यह {category} से जुड़ी समस्या लगती है। क्या आप शिकायत दर्ज करना चाहेंगे?",
+              "ask": "धन्यवाद। कृपया अपना {fields} बताइए।", "done": "धन्यवाद, मुझे सारी जानकारी मिल गई है।"},
+    "marathi": {"category": "ही {category} संबंधित समस्या दिसते. तुम्हाला तक्रार नोंदवायची आहे का?",
+                "ask": "धन्यवाद. कृपया तुमचे {fields} सांगा.", "done": "धन्यवाद, मला सर्व माहिती मिळाली आहे."},
+    "tamil": {"category": "இது {category} தொடர்பான பிரச்சினை போல் தெரிகிறது. புகார் பதிவு செய்ய விரும்புகிறீர்களா?",
+              "ask": "நன்றி. உங்கள் {fields} சொல்லுங்கள்.", "done": "நன்றி, எனக்கு எல்லா விவரங்களும் கிடைத்தன."},
+    "kannada": {"category": "ಇದು {category} ಸಮಸ್ಯೆ ಎಂದು ತೋರುತ್ತದೆ. ನೀವು ದೂರು ದಾಖಲಿಸಲು ಬಯಸುವಿರಾ?",
+                "ask": "ಧನ್ಯವಾದಗಳು. ದಯವಿಟ್ಟು ನಿಮ್ಮ {fields} ತಿಳಿಸಿ.", "done": "ಧನ್ಯವಾದಗಳು, ನನಗೆ ಎಲ್ಲಾ ವಿವರಗಳು ಸಿಕ್ಕಿವೆ."},
+}
+
+CATEGORY_KEYWORDS = {
+    "corruption": ("bribe", "rishwat", "रिश्वत", "लाच", "லஞ்சம்", "ಲಂಚ"),
+    "funds": ("scholarship", "pension", "subsidy", "छात्रवृत्ति", "पेंशन", "शिष्यवृत्ती", "உதவித்தொகை", "ವಿದ್ಯಾರ್ಥಿವೇತನ"),
+    "government_service": ("passport", "aadhaar", "certificate", "licence", "प्रमाणपत्र", "पासपोर्ट", "சான்றிதழ்", "ಪ್ರಮಾಣಪತ್ರ"),
+}
+MARATHI_HINTS = ("आहे", "नाही", "माझ", "आमच", "झाले")
+
+
+def parse_distribution(spec):
+    """
+    Sampler for a latency spec: "fixed:S", "uniform:A,B", "exp:MEAN" or "lognormal:MEDIAN,SIGMA" (seconds).
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Invalid latency spec '{spec}'")
+
+
+def parse_assignments(pairs, option):
+    """["chat=...", ...] -> {"chat": "..."}; "all=..." applies to every call type."""
+    result = {}
+    for pair in pairs or []:
+        call_type, _, value = pair.partition("=")
+        if call_type not in CALL_TYPES + ("all",) or not value:
+            raise ValueError(f"Invalid {option} '{pair}' (call types: {', '.join(CALL_TYPES)}, all)")
+        for target in (CALL_TYPES if call_type == "all" else (call_type,)):
+            result[target] = value
+    return result
+
+
+def fake_audio(text, size=16000):
+    """Audio upload whose transcription is `text`: the marker, the text, then padding up to `size` bytes."""
+    payload = AUDIO_MARKER + text.encode("utf-8") + b"\x00"
+    return payload + b"\x00" * max(0, size - len(payload))
+
+
+def guess_language(text):
+    text = text or ""
+    if re.search(r"[஀-௿]", text):
+        return "tamil"
+    if re.search(r"[ಀ-೿]", text):
+        return "kannada"
+    if re.search(r"[ऀ-ॿ]", text):
+        return "marathi" if any(hint in text for hint in MARATHI_HINTS) else "hindi"
+    return "english"
+
+
+def guess_category(text):
+    lowered = (text or "").lower()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            return category
+    return "infrastructure"
+
+
+def sample_value(field):
+    options = FIELD_OPTIONS.get(field)
+    if options:
+        return next(iter(options))
+    return SAMPLE_VALUES.get(field, f"Sample {field.replace('_', ' ')}")
+
+
+class FakeOpenAIConfig:
+    def __init__(self, latency=None, error_rate=None, latency_scale=1.0, token_interval=0.02,
+                 fields_per_turn=2, seed=None):
+        """
+        Args:
+            latency (dict, optional): {call type: spec} overriding DEFAULT_LATENCY (see parse_distribution).
+            error_rate (dict, optional): {call type: probability} of answering 500/429 instead.
+            latency_scale (float): Multiplier for every sampled latency (e.g. 0.1 for quick runs).
+            token_interval (float): Seconds between streamed chunks (before scaling).
+            fields_per_turn (int): Form fields the fake "extracts" per call, so collection takes several turns.
+            seed (int, optional): Seed for latencies, errors and choices.
+        """
+        specs = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.latency = {call_type: parse_distribution(spec) for call_type, spec in specs.items()}
+        self.error_rate = {call_type: float(rate) for call_type, rate in (error_rate or {}).items()}
+        self.latency_scale = latency_scale
+        self.token_interval = token_interval
+        self.fields_per_turn = fields_per_turn
+        self.rng = random.Random(seed)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, as the OpenAI client pools connections
+    server_version = "FakeOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- Plumbing ---
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds * self.config.latency_scale)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_failure(self, call_type):
+        """Answers with an API error (and returns True) at the call type's configured rate."""
+        rate = self.config.error_rate.get(call_type, 0.0)
+        if not rate or self.config.rng.random() >= rate:
+            return False
+        status = self.config.rng.choice((429, 500, 503))
+        self._send_json(status, {"error": {"message": f"Injected {status} from fake OpenAI", "type": "server_error", "code": None}})
+        return True
+
+    def _begin(self, call_type):
+        self.server.count(call_type)
+        self._sleep(self.config.latency[call_type](self.config.rng))
+        return not self._inject_failure(call_type)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            return self._send_json(200, self.server.stats())
+        self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/chat/completions"):
+            return self._chat(json.loads(body or b"{}"))
+        if path.endswith("/audio/transcriptions"):
+            return self._transcription(body)
+        if path.endswith("/audio/speech"):
+            return self._speech(json.loads(body or b"{}"))
+        self._send_json(404, {"error": {"message": f"Unknown endpoint {path}", "type": "invalid_request_error"}})
+
+    # --- Chat completions ---
+
+    def _chat(self, request):
+        messages = request.get("messages", [])
+        system_text = "\n".join(message.get("content") or "" for message in messages if message.get("role") == "system")
+        user_texts = [message.get("content") or "" for message in messages if message.get("role") == "user"]
+        last_user_text = user_texts[-1] if user_texts else ""
+        response_format = (request.get("response_format") or {}).get("type")
+
+        if response_format == "json_schema":
+            call_type, content = "structured", self._structured_turn(system_text, last_user_text)
+        elif response_format == "json_object":
+            call_type, content = "extraction", self._extraction(last_user_text)
+        elif last_user_text.startswith("What language is"):
+            call_type, content = "detect", guess_language(last_user_text.split("Text:", 1)[-1])
+        else:
+            call_type, content = "chat", self._classic_reply(system_text, last_user_text)
+
+        if not self._begin(call_type):
+            return
+        prompt_tokens = sum(len(message.get("content") or "") for message in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4 + 1,
+                 "total_tokens": prompt_tokens + len(content) // 4 + 1}
+        base = {"id": f"chatcmpl-fake{self.server.count('ids')}", "created": int(time.time()), "model": request.get("model", "fake")}
+        if not request.get("stream"):
+            return self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk = dict(base, object="chat.completion.chunk")
+        for start in range(0, len(content), 4):
+            if start:
+                self._sleep(self.config.token_interval)
+            self._write_event(dict(chunk, choices=[{"index": 0, "delta": {"content": content[start:start + 4]}, "finish_reason": None}]))
+        self._write_event(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_event(dict(chunk, choices=[], usage=usage))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _fields(self, missing):
+        return [field.strip() for field in missing.split(",") if field.strip()][:self.config.fields_per_turn]
+
+    def _reply(self, language, key, **kwargs):
+        return REPLIES.get(language, REPLIES["english"])[key].format(**kwargs)
+
+    def _classic_reply(self, system_text, user_text):
+        language = guess_language(user_text)
+        prefix = f"USER_LANGUAGE: {language} " if "USER_LANGUAGE:" in system_text else ""
+        category_match = re.search(r"'(\w+)' grievance", system_text)
+        if 'include the marker "GRIEVANCE_CATEGORY:' in system_text:
+            category = guess_category(user_text)
+            reply = f"{self._reply(language, 'category', category=category.replace('_', ' '))} GRIEVANCE_CATEGORY:{category}"
+        elif "READY_TO_CONFIRM" in system_text and category_match:
+            # Ready once none of the required fields is listed as still needed
+            required = re.search(r"Required fields for '\w+': (.*)\.", system_text)
+            missing_line = re.search(r"still needed \(prioritize these\): (.*)", system_text)
+            missing = [field for field in (required.group(1).split(", ") if required else []) if missing_line and field in missing_line.group(1)]
+            reply = (self._reply(language, "ask", fields=", ".join(missing[:2])) if missing
+                     else f"{self._reply(language, 'done')} READY_TO_CONFIRM")
+        else:
+            reply = self._reply(language, "category", category=(category_match.group(1) if category_match else "this").replace("_", " "))
+        return prefix + reply
+
+    def _extraction(self, prompt):
+        fields = re.findall(r'^- "(\w+)":', prompt, re.MULTILINE)
+        return json.dumps({field: sample_value(field) for field in fields[:self.config.fields_per_turn]})
+
+    def _structured_turn(self, system_text, user_text):
+        language = guess_language(user_text)
+        category_match = re.search(r"'(\w+)' grievance", system_text)
+        result = {"language": language, "category": "none", "category_confirmation": "unclear", "field_updates": [], "ready": False}
+        if "Your current goal is to accurately understand" in system_text:
+            result["category"] = guess_category(user_text)
+            result["reply"] = self._reply(language, "category", category=result["category"].replace("_", " "))
+            return json.dumps(result, ensure_ascii=False)
+
+        result["category"] = category_match.group(1) if category_match else "infrastructure"
+        result["category_confirmation"] = "confirmed"
+        missing_line = re.search(r"Still needed: (.*)", system_text)
+        missing = [field for field in (missing_line.group(1).split(",") if missing_line else []) if re.fullmatch(r"\s*\w+\s*", field)]
+        updates = self._fields(",".join(missing))
+        result["field_updates"] = [{"field": field, "value": sample_value(field)} for field in updates]
+        result["ready"] = len(updates) == len(missing)
+        result["reply"] = (self._reply(language, "done") if result["ready"]
+                           else self._reply(language, "ask", fields=", ".join(field.replace("_", " ") for field in missing[len(updates):][:2])))
+        return json.dumps(result, ensure_ascii=False)
+
+    # --- Audio ---
+
+    def _transcription(self, body):
+        if not self._begin("stt"):
+            return
+        start = body.find(AUDIO_MARKER)
+        if start < 0:
+            text = "I want to report a problem with the water supply in my area."
+        else:
+            start += len(AUDIO_MARKER)
+            end = body.find(b"\x00", start)
+            text = body[start:end if end >= 0 else None].decode("utf-8", "replace")
+        self._send_json(200, {"text": text})
+
+    def _speech(self, request):
+        if not self._begin("tts"):
+            return
+        size = max(1024, len(request.get("input", "")) * AUDIO_BYTES_PER_CHAR)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        # Audio arrives in pieces, like the real endpoint's chunked output
+        sent = 0
+        block = b"ID3" + b"\x00" * 8189
+        while sent < size:
+            piece = block[:min(len(block), size - sent)]
+            self.wfile.write(piece)
+            self.wfile.flush()
+            sent += len(piece)
+            if sent < size:
+                self._sleep(self.config.token_interval)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config, host="127.0.0.1", port=0):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.config = config
+        self._counts = {}
+        self._counts_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, key):
+        with self._counts_lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            return self._counts[key]
+
+    def stats(self):
+        with self._counts_lock:
+            return {key: value for key, value in self._counts.items() if key in CALL_TYPES}
+
+    def start(self):
+        """Serves on a background thread; returns the base URL for OPENAI_BASE_URL."""
+        threading.Thread(target=self.serve_forever, name="fake-openai", daemon=True).start()
+        return self.base_url
+
+
+def add_fake_openai_arguments(parser):
+    group = parser.add_argument_group("fake OpenAI")
+    group.add_argument("--latency", action="append", metavar="TYPE=SPEC",
+                       help=f"Latency per call type ({', '.join(CALL_TYPES)}, all), e.g. chat=lognormal:0.7,0.35, tts=fixed:0.3")
+    group.add_argument("--error-rate", action="append", metavar="TYPE=P", help="Share of calls answered with 429/500/503, e.g. all=0.01")
+    group.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for all latencies (default 1.0)")
+    group.add_argument("--token-interval", type=float, default=0.02, help="Seconds between streamed chunks (default 0.02)")
+    group.add_argument("--fields-per-turn", type=int, default=2, help="Form fields extracted per call (default 2)")
+    group.add_argument("--seed", type=int, default=None)
+
+
+def config_from_arguments(args):
+    return FakeOpenAIConfig(latency=parse_assignments(args.latency, "--latency"),
+                            error_rate=parse_assignments(args.error_rate, "--error-rate"),
+                            latency_scale=args.latency_scale, token_interval=args.token_interval,
+                            fields_per_turn=args.fields_per_turn, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    add_fake_openai_arguments(parser)
+    args = parser.parse_args()
+    server = FakeOpenAIServer(config_from_arguments(args), host=args.host, port=args.port)
+    print(f"Fake OpenAI API at {server.base_url} (set OPENAI_BASE_URL to this). Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 # OpenAI API Key - IMPORTANT: Set this in your environment variables for security
 # or replace "your-api-key-here" directly if this is for local testing only.
@@ -13,15 +16,150 @@ LANG_DETECTION_MODEL = "gpt-3.5-turbo"
 CHATBOT_MODE_GRIEVANCE = "grievance"
 CHATBOT_MODE_SCHEME_FINDER = "scheme_finder"
 
-# Maximum conversation history turns to store (each turn is user + bot)
+# Maximum conversation history turns to store (each turn is user + bot); only applies when HISTORY_TOKEN_BUDGET is 0
 MAX_HISTORY_TURNS = 10 # Reduced for web context perhaps, adjust as needed
 
+# Conversation memory (see core_logic/history_web.py): token budget for the history sent verbatim with
+# each prompt; older messages are condensed into a summary. Stages that need less context get a fraction.
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 1600)) # 0 = MAX_HISTORY_TURNS message cap instead
+HISTORY_STAGE_BUDGET_FACTORS = {"categorizing": 0.5, "confirming": 0.5, "form_filling": 0.4, "submitted": 0.4}
+HISTORY_TRIM_RATIO = 0.75 # Once over budget, trim to this fraction so the prompt prefix stays stable for a few turns
+HISTORY_SUMMARY_TOKEN_BUDGET = 300 # Cap on the summary of evicted messages
+
 # Max tokens for chat response from LLM
 MAX_RESPONSE_TOKENS = 180 # Adjust based on desired response length
 
 # LLM temperature (0.0 to 2.0) - lower is more deterministic, higher is more creative
 TEMPERATURE = 0.7
 
+# How user-language detection is scheduled relative to the main chat completion:
+#   "sequential" - detect_language_web round trip first, then the reply (original behaviour)
+#   "concurrent" - detection runs alongside the reply; the reply is regenerated only if the language changed
+#                  (saves a round trip per turn, but costs a second chat completion whenever the language switches)
+#   "inline"     - no separate detection call; the chat model reports the user's language with its reply
+LANG_DETECTION_MODE = os.environ.get("LANG_DETECTION_MODE", "sequential")
+# The offline identifier in detector_web.py answers on its own at or above this confidence;
+# below it the LANG_DETECTION_MODEL is asked (set to 1.01 to always ask the LLM)
+LANG_ID_CONFIDENCE_THRESHOLD = float(os.environ.get("LANG_ID_CONFIDENCE_THRESHOLD", "0.9"))
+
+# Form data extraction: "0" extracts every field from the whole history once READY_TO_CONFIRM is seen (default);
+# "1" extracts only still-missing fields from each new user message as the conversation goes (one extra, smaller
+# extraction call on collecting turns that local parsing cannot fill, but a short final extraction)
+INCREMENTAL_EXTRACTION = os.environ.get("INCREMENTAL_EXTRACTION", "0") == "1"
+
+# How the understanding/categorizing/collecting turns are produced:
+#   "classic"    - stage prompt whose reply carries GRIEVANCE_CATEGORY:/READY_TO_CONFIRM markers, plus separate
+#                  language detection and extraction calls (LANG_DETECTION_MODE, INCREMENTAL_EXTRACTION)
+#   "structured" - one JSON-schema completion returns language, category, field updates, readiness and the
+#                  reply together (see core_logic/structured_turn_web.py)
+TURN_ENGINE = os.environ.get("TURN_ENGINE", "classic")
+STRUCTURED_TURN_MAX_TOKENS = 400 # Room for the JSON envelope and field updates on top of the reply
+
+# Yes/no replies are matched locally (see core_logic/intents_web.py)
+CONFIRMATION_MIN_SCORE = 0.7 # Lowest match score accepted as a yes/no (1.0 exact, 0.9 leading phrase, 0.7 phrase inside)
+CONFIRMATION_STAGES = ("categorizing", "form_filling", "submitted") # A bare yes/no here needs no language detection call
+
+# Localized bot strings (see core_logic/localization_web.py). Optional <language>.json files in this
+# directory ({key: text or [variants]}) override or extend the built-in table when the module is imported.
+LOCALIZATION_DIR = os.environ.get("LOCALIZATION_DIR") # Defaults to core_logic/locales
+# Languages whose missing strings are taken from a closer language before English
+LOCALIZATION_FALLBACKS = {"marathi": ["hindi"]}
+
+# Where the app keeps what it writes: submissions/, sessions.db, tts_audio_files/, tts_cache/ and debug_audio/
+DATA_DIR = os.environ.get("DATA_DIR") # Defaults to the app directory
+
+# Grievance submission log (see core_logic/storage_web.py)
+GRIEVANCE_SEGMENT_MAX_BYTES = 16 * 1024 * 1024 # Rotate the active JSON-lines segment after this size
+GRIEVANCE_GROUP_COMMIT_INTERVAL = 0.005 # Seconds to gather concurrent submits into one fsync
+GRIEVANCE_COMPACTION_INTERVAL = 600 # Seconds between background gzip compaction of sealed segments
+
+# Per-process chatbot session registry (see core_logic/sessions_web.py)
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", 1000)) # LRU-evict beyond this many live sessions
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", 64 * 1024 * 1024)) # Approximate memory cap for all sessions (0 disables)
+SESSION_IDLE_TTL = int(os.environ.get("SESSION_IDLE_TTL", 1800)) # Seconds of inactivity before a session is dropped
+SESSION_SWEEP_INTERVAL = 60 # Seconds between background idle-session sweeps
+
+# Conversation-state backend ("memory", "sqlite" or "none"). "memory" keeps sessions in this process, as before;
+# set "sqlite" when running several workers so any worker can serve any turn.
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH") # "sqlite" only. Defaults to <DATA_DIR>/sessions.db; must be shared by all workers
+# Flask signs the session cookie with this; all workers must share it or sessions break between them.
+FLASK_SECRET_KEY = os.environ.get("FLASK_SECRET_KEY")
+
+# Content-addressed TTS clip cache (see core_logic/tts_cache_web.py)
+TTS_RESPONSE_FORMAT = "mp3"
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", 256 * 1024 * 1024)) # LRU-evict clips beyond this total size
+
+# How bot audio reaches the browser on a cache miss:
+#   "file"   - synthesize the whole clip before responding, then serve it from the cache (default, as before)
+#   "stream" - return a /stream_tts_audio URL that relays TTS bytes as they are generated (playback starts on first chunk;
+#              the browser must play progressive MP3 from an <audio> element, and proxies must not buffer the response)
+#   "async"  - respond with the text and an audio_job_id at once; the clip is synthesized on a worker pool
+#              and the browser fetches its audio_url via /tts_job/<id> (poll) or /tts_job/<id>/events (SSE)
+TTS_DELIVERY_MODE = os.environ.get("TTS_DELIVERY_MODE", "file")
+TTS_STREAM_TEE = os.environ.get("TTS_STREAM_TEE", "cache") # Where streamed clips are also stored: "cache", "disk" (tts_audio_files) or "none"
+TTS_STREAM_CHUNK_BYTES = 4096
+TTS_STREAM_TOKEN_TTL = 300 # Seconds a stream URL stays valid after /send_message returns it
+TTS_JOB_WORKERS = 4 # Concurrent background TTS requests in "async" mode
+TTS_JOB_MAX_PENDING = 64 # Queued + running jobs before new ones are refused (browser TTS covers those)
+TTS_JOB_TTL = 300 # Seconds a finished job's audio_url can still be fetched
+TTS_JOB_WAIT_TIMEOUT = 30 # Seconds the SSE endpoint waits for a job before reporting a timeout
+# Streamed replies (/send_message_stream): voice each sentence as soon as it is complete, on the TTS job pool,
+# instead of the whole reply once it is finished
+TTS_SENTENCE_PIPELINE = os.environ.get("TTS_SENTENCE_PIPELINE", "1") == "1"
+TTS_SENTENCE_MIN_CHARS = 24 # Shorter sentences are merged with the next one (fewer, more natural clips)
+
+# Retention for generated audio (see core_logic/janitor_web.py); ages in seconds, quotas in bytes
+TTS_AUDIO_MAX_AGE = int(os.environ.get("TTS_AUDIO_MAX_AGE", 24 * 3600))
+TTS_AUDIO_MAX_BYTES = int(os.environ.get("TTS_AUDIO_MAX_BYTES", 512 * 1024 * 1024))
+DEBUG_AUDIO_MAX_AGE = int(os.environ.get("DEBUG_AUDIO_MAX_AGE", 3 * 24 * 3600))
+DEBUG_AUDIO_MAX_BYTES = int(os.environ.get("DEBUG_AUDIO_MAX_BYTES", 256 * 1024 * 1024))
+AUDIO_JANITOR_INTERVAL = 300 # Seconds between retention sweeps
+AUDIO_JANITOR_GRACE_SECONDS = 120 # Never delete files younger than this (their URL may not have been fetched yet)
+
+# Startup warm-up (see core_logic/warmup_web.py)
+TTS_WARMUP_ON_STARTUP = os.environ.get("TTS_WARMUP_ON_STARTUP", "0") == "1" # Pre-synthesize static prompts in the background at boot (paid TTS calls on every start)
+TTS_WARMUP_WORKERS = 4 # Concurrent TTS requests during warm-up
+BOT_POOL_SIZE = int(os.environ.get("BOT_POOL_SIZE", 4)) # Pre-initialized chatbots kept ready for /init_grievance_chat
+
+# Upstream OpenAI calls (see core_logic/openai_client_web.py). One pooled client per worker process.
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", 64)) # Concurrent connections to the API
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 32)) # Idle connections kept open (no TLS handshake per call)
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", 3.0)) # Seconds to establish a connection
+# Total deadline per call type in seconds, shared by all attempts, backoff and hedges; past it the turn uses its local fallback
+OPENAI_CALL_TIMEOUTS = {
+    "language_detection": float(os.environ.get("OPENAI_TIMEOUT_LANGUAGE_DETECTION", 4.0)),
+    "chat": float(os.environ.get("OPENAI_TIMEOUT_CHAT", 25.0)),
+    "structured_turn": float(os.environ.get("OPENAI_TIMEOUT_STRUCTURED_TURN", 25.0)),
+    "extraction": float(os.environ.get("OPENAI_TIMEOUT_EXTRACTION", 20.0)),
+    "tts": float(os.environ.get("OPENAI_TIMEOUT_TTS", 20.0)),
+    "stt": float(os.environ.get("OPENAI_TIMEOUT_STT", 20.0)),
+}
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", 2)) # Retries after timeouts, connection errors, 429 and 5xx
+OPENAI_RETRY_BASE_DELAY = float(os.environ.get("OPENAI_RETRY_BASE_DELAY", 0.25)) # Retry n waits uniform(0, min(max, base * 2**n)) seconds
+OPENAI_RETRY_MAX_DELAY = float(os.environ.get("OPENAI_RETRY_MAX_DELAY", 2.0))
+# Call types whose request is duplicated when it has not been answered within OPENAI_HEDGE_DELAY; the first answer wins
+OPENAI_HEDGE_CALL_TYPES = tuple(call_type for call_type in os.environ.get("OPENAI_HEDGE_CALL_TYPES", "").split(",") if call_type) # e.g. "language_detection"
+OPENAI_HEDGE_DELAY = float(os.environ.get("OPENAI_HEDGE_DELAY", 1.0))
+OPENAI_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("OPENAI_BREAKER_FAILURE_THRESHOLD", 5)) # Consecutive failures that open a call type's circuit
+OPENAI_BREAKER_RESET_TIMEOUT = float(os.environ.get("OPENAI_BREAKER_RESET_TIMEOUT", 30.0)) # Seconds of failing fast before one trial call
+
+# Logging (see core_logic/logging_web.py). Records are written to stdout by a background thread.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO") # DEBUG adds per-turn detail: prompts, raw LLM output, payloads
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json") # "json" (one object per line) or "text"
+LOG_REDACT_PII = os.environ.get("LOG_REDACT_PII", "1") == "1" # Mask personal form fields, emails and phone numbers
+# Form fields whose values never appear in logs while LOG_REDACT_PII is on
+LOG_PII_FIELDS = ("full_name", "email", "mobile", "address", "application_number", "official_name", "witnesses")
+
+# Tracing (see core_logic/tracing_web.py). A voice turn's requests (/transcribe_audio, /send_message,
+# audio fetches) share the turn id the browser sends, so their spans form one trace.
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "1") == "1"
+TRACE_BUFFER_SPANS = int(os.environ.get("TRACE_BUFFER_SPANS", 4096)) # Most recent spans kept in memory (ring buffer)
+TRACE_DEBUG_ENDPOINT = os.environ.get("TRACE_DEBUG_ENDPOINT", "0") == "1" # Serve /debug/traces (Chrome-trace / OTLP JSON)
+TRACE_PROFILE_SLOW_TURNS = os.environ.get("TRACE_PROFILE_SLOW_TURNS", "0") == "1" # Sample request stacks; kept for slow requests only
+TRACE_SLOW_TURN_SECONDS = float(os.environ.get("TRACE_SLOW_TURN_SECONDS", 6.0)) # Requests at least this slow keep their profile
+TRACE_PROFILE_INTERVAL = float(os.environ.get("TRACE_PROFILE_INTERVAL", 0.01)) # Seconds between stack samples
+
 # Grievance Categories and their details
 # IMPORTANT: form_url should now point to the routes in your Flask app (e.g., /forms/infrastructure)
 # The 'required_fields' and 'field_descriptions' are crucial for the LLM data extraction.
@@ -106,9 +244,6 @@ GRIEVANCE_CATEGORIES = {
 
 # --- Sanity check for API key ---
 if OPENAI_API_KEY == "your-api-key-here":
-    print("*********************************************************************")
-    print("WARNING: OpenAI API key is not set in core_logic/config_web.py.")
-    print("The application might not work correctly with LLM-dependent features.")
-    print("Please set your OPENAI_API_KEY environment variable or update the config file.")
-    print("*********************************************************************")
+    logger.warning("OpenAI API key is not set in core_logic/config_web.py. The application might not work correctly with "
+                   "LLM-dependent features. Please set your OPENAI_API_KEY environment variable or update the config file.")
 
@@ -1,24 +1,200 @@
-# Placeholder for language detection logic
-# In a real scenario, this would use an NLP library or an API (like OpenAI's)
+# Language detection for user turns.
+# A local identifier (script detection + character n-gram profiles + function-word
+# markers) answers most turns in microseconds; the LLM is only consulted when the
+# local confidence is below LANG_ID_CONFIDENCE_THRESHOLD.
+
+import re
+import logging
+import math
+from collections import Counter
 
 from .mappings_web import LANGUAGES # To know which languages are supported
-from .config_web import LANG_DETECTION_MODEL # OpenAI model for language detection
+from .config_web import LANG_DETECTION_MODEL, LANG_ID_CONFIDENCE_THRESHOLD # OpenAI model for language detection
+from .metrics_web import track_stage
+
+logger = logging.getLogger(__name__)
+
+# --- Offline language identifier ---
+
+# Unicode blocks used to pick the script first; only Devanagari and Latin need further disambiguation.
+SCRIPT_RANGES = {
+    "devanagari": (0x0900, 0x097F),
+    "tamil": (0x0B80, 0x0BFF),
+    "kannada": (0x0C80, 0x0CFF),
+}
+# Candidate languages per script. Romanized Hindi ("Hinglish") is answered in Hindi.
+SCRIPT_LANGUAGES = {
+    "devanagari": ["hindi", "marathi"],
+    "tamil": ["tamil"],
+    "kannada": ["kannada"],
+    "latin": ["english", "hindi"],
+}
+
+# Small in-domain seed texts the character trigram profiles are built from at import.
+_SEED_TEXTS = {
+    ("devanagari", "hindi"): [
+        "मेरे घर के सामने की सड़क बहुत खराब है और कई महीनों से इसकी मरम्मत नहीं हुई है।",
+        "हमारे इलाके में पानी की आपूर्ति नियमित नहीं है, कभी कभी पानी गंदा भी आता है।",
+        "मैंने छात्रवृत्ति के लिए आवेदन किया था लेकिन अभी तक पैसा नहीं मिला।",
+        "सरकारी दफ्तर में अधिकारी ने काम करने के लिए रिश्वत मांगी।",
+        "मेरा नाम राहुल है और मेरा मोबाइल नंबर यह है।",
+        "बिजली कई दिनों से नहीं आ रही है, कृपया मेरी मदद कीजिए।",
+        "मुझे अपने पासपोर्ट के आवेदन में बहुत देरी का सामना करना पड़ रहा है।",
+        "हाँ, यह सही है, आगे बढ़िए।",
+        "क्या आप मेरी शिकायत दर्ज कर सकते हैं? मैं बहुत परेशान हूँ।",
+        "यह समस्या पिछले एक साल से चल रही है और किसी ने ध्यान नहीं दिया।",
+        "मैं आपको बुनियादी ढाँचे, भ्रष्टाचार, सरकारी सेवाओं, या धन संबंधी समस्याओं के बारे में शिकायत दर्ज करने में मदद कर सकता हूँ।",
+    ],
+    ("devanagari", "marathi"): [
+        "माझ्या घरासमोरचा रस्ता खूप खराब झाला आहे आणि अनेक महिन्यांपासून दुरुस्ती झालेली नाही.",
+        "आमच्या भागात पाणीपुरवठा नियमित होत नाही, कधी कधी पाणी गढूळ येते.",
+        "मी शिष्यवृत्तीसाठी अर्ज केला होता पण अजून पैसे मिळाले नाहीत.",
+        "सरकारी कार्यालयातील अधिकाऱ्याने काम करण्यासाठी लाच मागितली.",
+        "माझे नाव राहुल आहे आणि माझा मोबाईल नंबर हा आहे.",
+        "वीज अनेक दिवसांपासून येत नाही, कृपया मला मदत करा.",
+        "माझ्या पासपोर्टच्या अर्जाला खूप उशीर होत आहे.",
+        "होय, हे बरोबर आहे, पुढे जा.",
+        "तुम्ही माझी तक्रार नोंदवू शकाल का? मी खूप त्रासलो आहे.",
+        "ही समस्या गेल्या एक वर्षापासून सुरू आहे आणि कोणीही लक्ष दिले नाही.",
+        "पायाभूत सुविधा, भ्रष्टाचार, सरकारी सेवा किंवा निधी समस्यांबद्दल तक्रार दाखल करण्यास मी तुम्हाला मदत करू शकेन.",
+    ],
+    ("latin", "english"): [
+        "The road in front of my house is very bad and has not been repaired for many months.",
+        "Water supply in our area is not regular and sometimes the water is dirty.",
+        "I applied for a scholarship but I have not received the money yet.",
+        "An official at the government office asked for a bribe to do the work.",
+        "My name is Rahul and my mobile number is this.",
+        "There has been no electricity for several days, please help me.",
+        "My passport application is facing a long delay.",
+        "Yes, that is correct, please go ahead.",
+        "Can you register my complaint? I am very worried.",
+        "This problem has been going on for the last one year and nobody paid attention.",
+        "I can help you file a grievance about infrastructure, corruption, government services, or funding problems.",
+    ],
+    ("latin", "hindi"): [
+        "mere ghar ke saamne ki sadak bahut kharab hai aur kai mahino se theek nahi hui",
+        "hamare area mein paani ki supply regular nahi hai, kabhi kabhi paani ganda aata hai",
+        "maine scholarship ke liye apply kiya tha lekin abhi tak paisa nahi mila",
+        "sarkari daftar mein adhikari ne kaam karne ke liye rishwat maangi",
+        "mera naam rahul hai aur mera mobile number yeh hai",
+        "bijli kai dino se nahi aa rahi hai, please meri madad kijiye",
+        "haan ji, yeh sahi hai, aage badhiye",
+        "kya aap meri shikayat darj kar sakte ho? main bahut pareshan hoon",
+        "yeh problem pichle ek saal se chal rahi hai aur kisi ne dhyan nahi diya",
+    ],
+}
+
+# High-precision function words; each hit adds MARKER_WEIGHT to that language's score.
+_MARKER_WORDS = {
+    ("devanagari", "hindi"): {"है", "हैं", "नहीं", "और", "मैं", "मेरा", "मेरी", "मेरे", "में", "था", "थी", "हूँ", "हूं",
+                              "रहा", "रही", "को", "से", "हुई", "हुआ", "गया", "क्या", "यह", "वह", "कि", "लेकिन", "अभी"},
+    ("devanagari", "marathi"): {"आहे", "आहेत", "नाही", "नाहीत", "आणि", "मी", "माझा", "माझी", "माझे", "माझ्या", "होता",
+                                "होती", "होते", "आम्ही", "तुम्ही", "आमच्या", "झाला", "झाली", "करा", "पण", "होय", "अजून"},
+    ("latin", "english"): {"the", "is", "are", "and", "my", "of", "to", "in", "for", "not", "have", "has", "was", "were",
+                           "i", "it", "this", "that", "with", "from", "there", "our", "we", "you", "your", "been", "on", "at"},
+    ("latin", "hindi"): {"hai", "hain", "nahi", "nahin", "mera", "meri", "mere", "aur", "ka", "ki", "ke", "mein", "hum",
+                         "aap", "kya", "kyun", "kaise", "tha", "thi", "raha", "rahi", "gaya", "gayi", "haan", "ji", "bhi",
+                         "toh", "yeh", "woh", "kuch", "bahut", "paani", "sadak", "hoon", "hua", "hui", "kijiye", "liye", "se"},
+}
+MARKER_WEIGHT = 2.5
+# Letters and clusters that are strong evidence for Marathi within Devanagari.
+_MARATHI_CHAR_MARKERS = ("ळ", "च्या", "ऱ्")
+
+_TOKEN_PATTERN = re.compile(r"[^\s\d.,!?;:।॥\"'()\[\]{}\-_/]+")
+_SMOOTHING_VOCAB = 4000 # Assumed trigram vocabulary size for add-one smoothing
+
+
+def _trigrams(token):
+    padded = f" {token} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def _build_profile(texts):
+    counts = Counter()
+    for text in texts:
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            counts.update(_trigrams(token))
+    total = sum(counts.values())
+    denominator = total + _SMOOTHING_VOCAB
+    log_probs = {gram: math.log((count + 1) / denominator) for gram, count in counts.items()}
+    return log_probs, math.log(1 / denominator)
+
+# Compiled once at import: {(script, language): (trigram log-probs, log-prob of an unseen trigram)}
+_PROFILES = {key: _build_profile(texts) for key, texts in _SEED_TEXTS.items()}
+
+
+def _dominant_script(text):
+    """Returns (script name, fraction of letters in that script), or (None, 0.0) if there are no letters."""
+    counts = Counter()
+    for char in text:
+        code_point = ord(char)
+        if ("a" <= char <= "z") or ("A" <= char <= "Z"):
+            counts["latin"] += 1
+            continue
+        for script, (low, high) in SCRIPT_RANGES.items():
+            if low <= code_point <= high:
+                counts[script] += 1
+                break
+    if not counts:
+        return None, 0.0
+    script, count = counts.most_common(1)[0]
+    return script, count / sum(counts.values())
+
+def identify_language(text):
+    """
+    Offline language identification.
+
+    Args:
+        text (str): The text to classify.
+
+    Returns:
+        tuple: (language name or None, confidence between 0 and 1).
+    """
+    script, purity = _dominant_script(text)
+    if script is None:
+        return None, 0.0
+    candidates = SCRIPT_LANGUAGES[script]
+    if len(candidates) == 1:
+        return candidates[0], purity
+
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    grams = [gram for token in tokens for gram in _trigrams(token)]
+    scores = {}
+    for language in candidates:
+        log_probs, unseen = _PROFILES[(script, language)]
+        markers = _MARKER_WORDS[(script, language)]
+        score = sum(log_probs.get(gram, unseen) for gram in grams)
+        score += MARKER_WEIGHT * sum(1 for token in tokens if token in markers)
+        if language == "marathi":
+            score += MARKER_WEIGHT * sum(text.count(marker) for marker in _MARATHI_CHAR_MARKERS)
+        scores[language] = score
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best_language, best_score), (_, runner_up_score) = ranked[0], ranked[1]
+    margin = best_score - runner_up_score
+    confidence = 1.0 / (1.0 + math.exp(-margin)) # Two-way softmax over the log-likelihood scores
+    return best_language, confidence * purity
+
 
 def detect_language_web(text, current_language_name, client=None):
     """
-    Detect the language of the provided text using OpenAI or a simple heuristic.
-    
+    Detect the language of the provided text, locally when confident and via OpenAI otherwise.
+
     Args:
         text (str): The text to detect language from.
         current_language_name (str): Current language name being used by the chatbot (e.g., "english").
-        client (OpenAI, optional): OpenAI client instance.
-        
+        client (ResilientOpenAI, optional): Shared OpenAI client (see openai_client_web).
+
     Returns:
         str: Detected language name (e.g., "english", "hindi").
     """
     if not text or len(text.split()) < 2: # Too short to reliably detect
         return current_language_name
 
+    local_language, local_confidence = identify_language(text)
+    if local_language and local_confidence >= LANG_ID_CONFIDENCE_THRESHOLD:
+        logger.debug("Local language ID: %s (confidence %.2f) for text: '%s...'", local_language, local_confidence, text[:50])
+        return local_language
+
     if client:
         try:
             # Construct a prompt for the LLM
@@ -28,45 +204,32 @@ def detect_language_web(text, current_language_name, client=None):
                 f"What language is the following text in? Respond with ONLY ONE of these language names: "
                 f"{', '.join(supported_language_names)}.\n\nText: \"{text}\""
             )
-            
-            response = client.chat.completions.create(
-                model=LANG_DETECTION_MODEL,
-                messages=[{"role": "user", "content": lang_prompt}],
-                temperature=0, # For deterministic output
-                max_tokens=10  # Expecting just the language name
-            )
-            
+
+            with track_stage("language_detection", LANG_DETECTION_MODEL) as call:
+                response = client.for_call("language_detection").chat.completions.create(
+                    model=LANG_DETECTION_MODEL,
+                    messages=[{"role": "user", "content": lang_prompt}],
+                    temperature=0, # For deterministic output
+                    max_tokens=10  # Expecting just the language name
+                )
+                call.record_usage(response)
+
             detected_lang_name_from_llm = response.choices[0].message.content.strip().lower()
 
             # Validate if the LLM's response is one of the supported languages
             if detected_lang_name_from_llm in LANGUAGES:
-                print(f"LLM detected language: {detected_lang_name_from_llm} for text: '{text[:50]}...'")
+                logger.debug("LLM detected language: %s for text: '%s...' (local guess: %s, %.2f)", detected_lang_name_from_llm, text[:50], local_language, local_confidence)
                 return detected_lang_name_from_llm
             else:
-                print(f"LLM detected unsupported language '{detected_lang_name_from_llm}'. Falling back or staying with current.")
-                # Fallback or stick to current if LLM output is not a supported language name
-                # For now, let's stick to current if LLM gives an odd response
-                # A more robust solution might try a heuristic if LLM fails validation.
+                logger.warning("LLM detected unsupported language '%s'. Falling back or staying with current.", detected_lang_name_from_llm)
 
         except Exception as e:
-            print(f"Error during LLM language detection: {e}. Falling back to heuristic or current language.")
-            # Fallthrough to heuristic if API call fails
-    
-    # Simple heuristic fallback (if no client or LLM fails)
-    # This is very basic and primarily for non-Latin scripts.
-    # You'd want a more robust local library for offline detection if needed.
-    if any(0x0900 <= ord(char) <= 0x097F for char in text): # Devanagari (Hindi, Marathi)
-        # Could be Hindi or Marathi. Need more context or a better heuristic.
-        # For simplicity, if Devanagari detected, and current is not Hindi/Marathi, prefer Hindi.
-        if current_language_name not in ["hindi", "marathi"]:
-            return "hindi" 
-    elif any(0x0B80 <= ord(char) <= 0x0BFF for char in text): # Tamil script
-        if current_language_name != "tamil":
-            return "tamil"
-    elif any(0x0C80 <= ord(char) <= 0x0CFF for char in text): # Kannada script
-        if current_language_name != "kannada":
-            return "kannada"
-            
-    # If no strong signal from heuristics, stick to current language
-    return current_language_name
+            logger.warning("Error during LLM language detection: %s. Falling back to local identifier or current language.", e)
+            # Fallthrough to the local guess if API call fails
 
+    # No client (or LLM failed): accept the local guess when it leans clearly one way.
+    if local_language and local_confidence >= 0.5:
+        return local_language
+
+    # If no strong signal, stick to current language
+    return current_language_name
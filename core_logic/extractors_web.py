@@ -0,0 +1,338 @@
+# Deterministic local extraction of fixed-format form fields.
+# Emails, Indian mobile numbers, dates, rupee amounts and application numbers follow
+# fixed formats, so they are parsed from each user message with compiled patterns
+# before any LLM extraction call; only the remaining fields are sent to the model.
+# Devanagari/Tamil/Kannada digits and spoken digit sequences (as produced by speech
+# recognition) are normalized to ASCII digits first.
+
+import re
+import datetime
+
+# --- Digit normalization ---
+
+_NATIVE_DIGITS = str.maketrans(
+    "०१२३४५६७८९" "௦௧௨௩௪௫௬௭௮௯" "೦೧೨೩೪೫೬೭೮೯",
+    "0123456789" * 3
+)
+
+# Digit words per supported language (romanized Hindi included, since STT often transcribes it that way).
+_SPOKEN_DIGITS = {}
+for _digit, _words in enumerate([
+    ("zero", "oh", "shunya", "शून्य", "पूज्य", "பூஜ்ஜியம்", "ಸೊನ್ನೆ"),
+    ("one", "ek", "एक", "ஒன்று", "ಒಂದು"),
+    ("two", "do", "दो", "दोन", "இரண்டு", "ಎರಡು"),
+    ("three", "teen", "तीन", "மூன்று", "ಮೂರು"),
+    ("four", "char", "chaar", "चार", "நான்கு", "ನಾಲ್ಕು"),
+    ("five", "paanch", "panch", "पांच", "पाँच", "पाच", "ஐந்து", "ಐದು"),
+    ("six", "chhe", "chah", "छह", "छः", "छे", "सहा", "ஆறு", "ಆರು"),
+    ("seven", "saat", "सात", "ஏழு", "ಏಳು"),
+    ("eight", "aath", "आठ", "எட்டு", "ಎಂಟು"),
+    ("nine", "nau", "नौ", "नऊ", "ஒன்பது", "ಒಂಬತ್ತು"),
+]):
+    for _word in _words:
+        _SPOKEN_DIGITS[_word] = str(_digit)
+_DIGIT_REPEATERS = {"double": 2, "triple": 3, "डबल": 2, "ट्रिपल": 3}
+_MIN_SPOKEN_RUN = 3 # Shorter runs ("one week", "do din") are left as words
+
+
+def _spoken_digits_to_numerals(text):
+    """Replaces runs of spoken digits ("nine eight double seven ...") with the digit string."""
+    output_words = []
+    run_digits = ""
+    run_words = []
+    repeat = 1
+
+    def flush():
+        if len(run_digits) >= _MIN_SPOKEN_RUN:
+            output_words.append(run_digits)
+        else:
+            output_words.extend(run_words)
+
+    for word in text.split():
+        key = word.lower().strip(".,;:!?")
+        if key in _DIGIT_REPEATERS:
+            repeat = _DIGIT_REPEATERS[key]
+            run_words.append(word)
+        elif key in _SPOKEN_DIGITS:
+            run_digits += _SPOKEN_DIGITS[key] * repeat
+            repeat = 1
+            run_words.append(word)
+        else:
+            flush()
+            run_digits, run_words, repeat = "", [], 1
+            output_words.append(word)
+    flush()
+    return " ".join(output_words)
+
+def normalize_digits(text):
+    """Native-script digits and spoken digit runs to ASCII digits."""
+    return _spoken_digits_to_numerals(text.translate(_NATIVE_DIGITS))
+
+
+# --- Email ---
+
+_EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+# "rahul dot sharma at gmail dot com" / "... at the rate gmail dot com"
+_SPOKEN_EMAIL_PATTERN = re.compile(
+    r"\b([a-z0-9_-]+(?:\s+(?:dot|underscore)\s+[a-z0-9_-]+)*)\s+(?:at\s+the\s+rate(?:\s+of)?|at)\s+"
+    r"([a-z0-9-]+(?:\s+dot\s+[a-z]{2,})+)\b",
+    re.IGNORECASE
+)
+
+def extract_email(text, context=""):
+    match = _EMAIL_PATTERN.search(text)
+    if match:
+        return match.group(0).rstrip(".").lower(), match.span()
+    match = _SPOKEN_EMAIL_PATTERN.search(text)
+    if match:
+        local_part = re.sub(r"\s+dot\s+", ".", match.group(1), flags=re.IGNORECASE)
+        local_part = re.sub(r"\s+underscore\s+", "_", local_part, flags=re.IGNORECASE)
+        domain = re.sub(r"\s+dot\s+", ".", match.group(2), flags=re.IGNORECASE)
+        return f"{local_part}@{domain}".lower(), match.span()
+    return None
+
+
+# --- Mobile number ---
+
+# Optional +91 / 91 / 0 prefix, then ten digits starting 6-9, in any grouping with spaces or hyphens.
+_MOBILE_PATTERN = re.compile(r"(?<![\d+])(?:\+\s?91[\s-]*|91[\s-]*|0)?([6-9](?:[\s-]?\d){9})(?!\d)")
+
+def extract_mobile(text, context=""):
+    match = _MOBILE_PATTERN.search(text)
+    if match:
+        return re.sub(r"[\s-]", "", match.group(1)), match.span()
+    return None
+
+
+# --- Dates (returned as DD/MM/YYYY, the format the field descriptions ask for) ---
+
+_MONTH_NAMES = {}
+for _month, _names in enumerate([
+    ("january", "jan", "जनवरी", "जानेवारी", "ஜனவரி", "ಜನವರಿ"),
+    ("february", "feb", "फरवरी", "फ़रवरी", "फेब्रुवारी", "பிப்ரவரி", "ಫೆಬ್ರವರಿ"),
+    ("march", "mar", "मार्च", "மார்ச்", "ಮಾರ್ಚ್"),
+    ("april", "apr", "अप्रैल", "अप्रेल", "एप्रिल", "ஏப்ரல்", "ಏಪ್ರಿಲ್"),
+    ("may", "मई", "मे", "மே", "ಮೇ"),
+    ("june", "jun", "जून", "ஜூன்", "ಜೂನ್"),
+    ("july", "jul", "जुलाई", "जुलै", "ஜூலை", "ಜುಲೈ"),
+    ("august", "aug", "अगस्त", "ऑगस्ट", "ஆகஸ்ட்", "ಆಗಸ್ಟ್"),
+    ("september", "sept", "sep", "सितंबर", "सितम्बर", "सप्टेंबर", "செப்டம்பர்", "ಸೆಪ್ಟೆಂಬರ್"),
+    ("october", "oct", "अक्टूबर", "अक्तूबर", "ऑक्टोबर", "அக்டோபர்", "ಅಕ್ಟೋಬರ್"),
+    ("november", "nov", "नवंबर", "नवम्बर", "नोव्हेंबर", "நவம்பர்", "ನವೆಂಬರ್"),
+    ("december", "dec", "दिसंबर", "दिसम्बर", "डिसेंबर", "டிசம்பர்", "ಡಿಸೆಂಬರ್"),
+], start=1):
+    for _name in _names:
+        _MONTH_NAMES[_name] = _month
+# Longest names first so "sept" wins over "sep". A name must be a whole word in any script: not followed or preceded
+# by a letter or an Indic vowel sign ("mar" in "market", "मे" in "मेरे"/"में", "மே" in "மேல்").
+_MONTH_ALTERNATION = "|".join(re.escape(name) for name in sorted(_MONTH_NAMES, key=len, reverse=True))
+_WORD_CHAR = r"[^\W\d_]|[\u0900-\u0dff]"
+_MONTH = rf"(?<!{_WORD_CHAR})(?P<month>{_MONTH_ALTERNATION})\.?(?!{_WORD_CHAR})"
+# Month names that are also common words ("may", "mar", Marathi/Tamil "मे"/"மே"); they only count with a year or
+# when the bot asked for a date
+_AMBIGUOUS_MONTH_NAMES = frozenset(["may", "mar", "मे", "மே"])
+_DAY = r"(?P<day>\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?P<year>\d{4}|'?\d{2}(?!\d))"
+
+_DATE_PATTERNS = [
+    re.compile(r"(?<!\d)(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})(?!\d)"), # 2024-03-12
+    re.compile(r"(?<![\d/.-])(?P<day>\d{1,2})[/.-](?P<month>\d{1,2})[/.-](?P<year>\d{4}|\d{2})(?!\d)"), # 12/03/2024, 12-3-24
+    re.compile(rf"(?<!\d){_DAY}(?:\s+of)?[\s,-]*{_MONTH}(?:[\s,-]*{_YEAR})?", re.IGNORECASE), # 12th March 2024, 12 मार्च
+    re.compile(rf"{_MONTH}[\s,-]*{_DAY}(?!\d)(?:[\s,]*{_YEAR})?", re.IGNORECASE), # March 12, 2024
+]
+
+# Relative dates only count when the bot asked for a date (otherwise "today" rarely means the incident date).
+_RELATIVE_DAY_WORDS = [
+    (re.compile(r"\b(?:day before yesterday|parson)\b|परसों|परवा", re.IGNORECASE), 2),
+    (re.compile(r"\b(?:yesterday|kal)\b|(?<!\S)(?:कल|काल)(?!\S)|நேற்று|ನಿನ್ನೆ", re.IGNORECASE), 1),
+    (re.compile(r"\b(?:today|aaj)\b|(?<!\S)आज(?!\S)|இன்று|ಇಂದು", re.IGNORECASE), 0),
+]
+_RELATIVE_AGO_PATTERN = re.compile(
+    r"(?P<count>\d+)\s*(?P<unit>days?|din|दिन|दिवस|weeks?|hafte|हफ्ते|हफ़्ते|सप्ताह|आठवडे|आठवड्यां)\s*"
+    r"(?:ago|back|pehle|pahle|पहले|पूर्वी|आधी)",
+    re.IGNORECASE
+)
+_DATE_QUESTION_PATTERN = re.compile(r"\bdate\b|\bwhen\b|\bkab\b|कब|तारीख|तारीख़|दिनांक|कधी|எப்போது|தேதி|ಯಾವಾಗ|ದಿನಾಂಕ", re.IGNORECASE)
+
+def _build_date(day, month, year):
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        return None
+
+def extract_date(text, context="", today=None):
+    today = today or datetime.date.today()
+    asked_for_date = bool(context and _DATE_QUESTION_PATTERN.search(context))
+    for pattern in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            month_text = match.group("month")
+            month = int(month_text) if month_text.isdigit() else _MONTH_NAMES.get(month_text.lower().rstrip("."))
+            day = int(match.group("day"))
+            year_text = match.group("year")
+            if not year_text and not asked_for_date and month_text.lower().rstrip(".") in _AMBIGUOUS_MONTH_NAMES:
+                continue # "number 5 may be lost"
+            if year_text:
+                year_text = year_text.lstrip("'")
+                if len(year_text) == 4:
+                    year = int(year_text)
+                else:
+                    year = 2000 + int(year_text)
+                    if year > today.year:
+                        year -= 100 # Two-digit years are never in the future
+                date = _build_date(day, month, year) if month else None
+            else:
+                date = _build_date(day, month, today.year) if month else None
+                if date and date > today:
+                    date = _build_date(day, month, today.year - 1) # "12 March" said in January means last year
+            if date and date <= today:
+                return date.strftime("%d/%m/%Y"), match.span()
+
+    if asked_for_date:
+        match = _RELATIVE_AGO_PATTERN.search(text)
+        if match:
+            count = int(match.group("count"))
+            unit = match.group("unit").lower()
+            days = count if unit.startswith(("day", "din", "दिन", "दिवस")) else count * 7
+            return (today - datetime.timedelta(days=days)).strftime("%d/%m/%Y"), match.span()
+        for pattern, days_back in _RELATIVE_DAY_WORDS:
+            match = pattern.search(text)
+            if match:
+                return (today - datetime.timedelta(days=days_back)).strftime("%d/%m/%Y"), match.span()
+    return None
+
+
+# --- Amounts in rupees (returned as a plain number for the numeric form input) ---
+
+_NUMBER = r"(?P<number>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+_MAGNITUDES = {}
+for _value, _names in [
+    (1_000, ("thousand", "hazaar", "hazar", "हज़ार", "हजार", "ஆயிரம்", "ಸಾವಿರ")),
+    (100_000, ("lakhs", "lakh", "lacs", "lac", "लाख", "லட்சம்", "ಲಕ್ಷ")),
+    (1_000_000, ("million",)),
+    (10_000_000, ("crores", "crore", "cr", "करोड़", "करोड", "கோடி", "ಕೋಟಿ")),
+]:
+    for _name in _names:
+        _MAGNITUDES[_name] = _value
+_MAGNITUDE = "(?P<magnitude>" + "|".join(re.escape(name) for name in sorted(_MAGNITUDES, key=len, reverse=True)) + r")(?![a-zA-Z])"
+_CURRENCY = r"(?:₹|\brs\b\.?|\binr\b|\brupees?\b|\brupaye\b|\brupay\b|रुपये|रुपए|रुपया|रुपयांचा|रु\.?|ரூபாய்|ರೂಪಾಯಿ)"
+
+_AMOUNT_PATTERNS = [
+    re.compile(rf"{_CURRENCY}\s*{_NUMBER}(?:\s*{_MAGNITUDE})?", re.IGNORECASE), # Rs. 50,000 / ₹2.5 lakh
+    re.compile(rf"(?<![\d.]){_NUMBER}\s*{_MAGNITUDE}", re.IGNORECASE), # 5 lakh / 50 हज़ार
+    re.compile(rf"(?<![\d.]){_NUMBER}\s*{_CURRENCY}", re.IGNORECASE), # 5000 rupees
+]
+_AMOUNT_QUESTION_PATTERN = re.compile(r"\bamount\b|how much|\brupees\b|राशि|रकम|कितना|कितने|रक्कम|किती|தொகை|ಮೊತ್ತ", re.IGNORECASE)
+_BARE_NUMBER_PATTERN = re.compile(rf"^\D*?(?<![\d.]){_NUMBER}(?![\d.])\D*$")
+
+def _format_amount(number_text, magnitude_text):
+    value = float(number_text.replace(",", "")) * (_MAGNITUDES.get(magnitude_text.lower(), 1) if magnitude_text else 1)
+    return str(int(value)) if value == int(value) else f"{value:.2f}"
+
+def extract_amount(text, context=""):
+    for pattern in _AMOUNT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            magnitude = match.groupdict().get("magnitude")
+            return _format_amount(match.group("number"), magnitude), match.span()
+    if context and _AMOUNT_QUESTION_PATTERN.search(context):
+        match = _BARE_NUMBER_PATTERN.match(text.strip())
+        if match:
+            return _format_amount(match.group("number"), None), match.span("number")
+    return None
+
+
+# --- Application / reference numbers ---
+
+_APPLICATION_KEYWORDS = (
+    r"(?:application|reference|ref|acknowledge?ment|ack|registration|file|request|token)\.?\s*(?:number|no\.?|num|id|#)"
+    r"|आवेदन\s*(?:संख्या|नंबर|क्रमांक)|संदर्भ\s*(?:संख्या|नंबर)|पंजीकरण\s*संख्या|अर्ज\s*क्रमांक|नोंदणी\s*क्रमांक"
+)
+_APPLICATION_ID = r"(?P<id>(?=[A-Za-z0-9/-]*\d)[A-Za-z0-9][A-Za-z0-9/-]{3,})"
+_APPLICATION_PATTERN = re.compile(
+    rf"(?:{_APPLICATION_KEYWORDS})(?:\s+(?:is|was|hai|है|आहे))?\s*[:#=-]?\s*{_APPLICATION_ID}",
+    re.IGNORECASE
+)
+_APPLICATION_QUESTION_PATTERN = re.compile(_APPLICATION_KEYWORDS, re.IGNORECASE)
+_ID_TOKEN_PATTERN = re.compile(rf"(?<![\w@/.-]){_APPLICATION_ID}(?![\w@])")
+
+def extract_application_number(text, context=""):
+    match = _APPLICATION_PATTERN.search(text)
+    if match:
+        return match.group("id").upper().rstrip("/-"), match.span()
+    if context and _APPLICATION_QUESTION_PATTERN.search(context):
+        match = _ID_TOKEN_PATTERN.search(text)
+        if match:
+            return match.group("id").upper().rstrip("/-"), match.span()
+    return None
+
+
+# --- Which date field a date belongs to ---
+
+_DATE_FIELD_PATTERNS = [
+    ("application_date", re.compile(r"\bappl(?:y|ied|ication)|आवेदन|अप्लाई|अर्ज|விண்ணப்ப|ಅರ್ಜಿ", re.IGNORECASE)),
+    ("incident_date", re.compile(r"\bincident|\bhappen|\boccur|\btook place|घटना|हुआ|हुई|घडल|நடந்த|சம்பவ|ಘಟನೆ|ನಡೆದ", re.IGNORECASE)),
+]
+
+def _date_field_for(text, context, wanted):
+    """
+    The date field a matched date fills: the one the bot's question (or else the message) names, or the only
+    wanted date field when the bot asked for a date. None when it is unclear; the LLM extraction decides then.
+    """
+    candidates = [field for field, _ in _DATE_FIELD_PATTERNS if field in wanted]
+    for source in (context, text):
+        named = [field for field, pattern in _DATE_FIELD_PATTERNS if source and pattern.search(source)]
+        if len(named) == 1:
+            return named[0] if named[0] in candidates else None
+    if len(candidates) == 1 and context and _DATE_QUESTION_PATTERN.search(context):
+        return candidates[0]
+    return None
+
+
+# --- Field dispatch ---
+
+# Run order: each match is masked out before the next extractor runs, so digits inside an
+# email or an application number are not read again as a mobile number, date or amount.
+_EXTRACTION_STEPS = [
+    (extract_email, ("email",)),
+    (extract_application_number, ("application_number",)),
+    (extract_mobile, ("mobile",)),
+    (extract_date, ("incident_date", "application_date")),
+    (extract_amount, ("amount_requested",)),
+]
+LOCALLY_EXTRACTED_FIELDS = frozenset(field for _, step_fields in _EXTRACTION_STEPS for field in step_fields)
+
+
+def extract_fixed_format_fields(text, fields, context=""):
+    """
+    Parses fixed-format field values from a user message without any LLM call.
+
+    Args:
+        text (str): The user's message (several messages may be joined with newlines).
+        fields (iterable): Form fields still wanted; only these are returned.
+        context (str): The bot question the message answers. Lets bare answers ("50000", "ABC12345",
+            "yesterday") count when the question asked for that kind of value, and decides which date
+            field a date fills.
+
+    Returns:
+        dict: {field: value} for each wanted field found in the text.
+    """
+    wanted = set(fields)
+    if not text or not wanted & LOCALLY_EXTRACTED_FIELDS:
+        return {}
+    remaining_text = normalize_digits(text)
+    context = normalize_digits(context) if context else ""
+    found = {}
+    for extractor, step_fields in _EXTRACTION_STEPS:
+        # Every step runs (even for fields already filled) so its match is masked for the later ones.
+        result = extractor(remaining_text, context)
+        if not result:
+            continue
+        value, (start, end) = result
+        if extractor is extract_date:
+            date_field = _date_field_for(text, context, wanted)
+            step_fields = (date_field,) if date_field else ()
+        remaining_text = remaining_text[:start] + " " * (end - start) + remaining_text[end:]
+        for field in step_fields:
+            if field in wanted:
+                found[field] = value
+    return found
@@ -0,0 +1,129 @@
+# Token-budgeted conversation memory.
+# Messages are kept in a deque together with their token counts, so the size of the history
+# is known without re-counting. When it exceeds the token budget of the current stage, the
+# oldest messages are evicted and folded into a short extractive summary (no LLM call) that is
+# sent ahead of the remaining history. Prompt size therefore stays bounded however long or
+# chatty the conversation gets, while short turns are no longer dropped just for their number.
+
+import re
+from collections import deque
+
+from .config_web import HISTORY_SUMMARY_TOKEN_BUDGET, HISTORY_TRIM_RATIO
+from .prompts_web import count_tokens, MESSAGE_TOKEN_OVERHEAD
+
+# Summary lines keep more of user messages (they carry the grievance and field values) than of the bot's.
+SUMMARY_USER_CHARS = 240
+SUMMARY_ASSISTANT_CHARS = 100
+_SENTENCE_PATTERN = re.compile(r"[^.!?।॥]+[.!?।॥]?")
+
+
+def summarize_message(role, content):
+    """
+    One condensed summary line for an evicted message.
+
+    Args:
+        role (str): "user" or "assistant".
+        content (str): Message text.
+
+    Returns:
+        str: "User: <start of the message>" or "Assistant: <the question it asked, or its first sentence>".
+    """
+    text = " ".join(str(content).split())
+    if role == "assistant":
+        sentences = [sentence.strip() for sentence in _SENTENCE_PATTERN.findall(text) if sentence.strip()]
+        questions = [sentence for sentence in sentences if sentence.endswith("?")]
+        text = questions[-1] if questions else (sentences[0] if sentences else text)
+        label, limit = "Assistant", SUMMARY_ASSISTANT_CHARS
+    else:
+        label, limit = "User", SUMMARY_USER_CHARS
+    if len(text) > limit:
+        text = text[:limit].rsplit(" ", 1)[0] + "…"
+    return f"{label}: {text}"
+
+
+class ConversationMemory:
+    """
+    Conversation history with per-message token counts and a rolling summary of evicted messages.
+    Behaves like a read-only list of {"role", "content"} dicts (len, iteration, indexing, slicing).
+    """
+
+    __slots__ = ("_messages", "_token_counts", "total_tokens", "summary_lines", "summary_tokens")
+
+    def __init__(self, messages=(), summary_lines=()):
+        self._messages = deque()
+        self._token_counts = deque()
+        self.total_tokens = 0
+        self.summary_lines = list(summary_lines)
+        self.summary_tokens = sum(count_tokens(line) for line in self.summary_lines)
+        for message in messages:
+            self.append(message["role"], message["content"])
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._messages)[index]
+        return self._messages[index]
+
+    def append(self, role, content):
+        self._messages.append({"role": role, "content": content})
+        tokens = count_tokens(content) + MESSAGE_TOKEN_OVERHEAD
+        self._token_counts.append(tokens)
+        self.total_tokens += tokens
+
+    def clear(self):
+        self._messages.clear()
+        self._token_counts.clear()
+        self.total_tokens = 0
+        self.summary_lines = []
+        self.summary_tokens = 0
+
+    def to_list(self):
+        return list(self._messages)
+
+    def enforce_budget(self, budget_tokens, min_recent=2):
+        """
+        Evicts the oldest messages into the summary once the history exceeds `budget_tokens`.
+        Trims down to HISTORY_TRIM_RATIO of the budget, so eviction (which changes the prompt prefix)
+        happens every few turns rather than on every turn.
+
+        Args:
+            budget_tokens (int): Token budget for the verbatim history.
+            min_recent (int): Number of newest messages never evicted (the bot's question and the answer to it).
+
+        Returns:
+            int: Number of messages evicted.
+        """
+        if self.total_tokens <= budget_tokens:
+            return 0
+        return self._evict_while(lambda: self.total_tokens > budget_tokens * HISTORY_TRIM_RATIO, min_recent)
+
+    def enforce_message_cap(self, max_messages):
+        """Evicts the oldest messages into the summary beyond `max_messages` (message-count cap)."""
+        return self._evict_while(lambda: len(self._messages) > max_messages, min_recent=max_messages)
+
+    def _evict_while(self, over_limit, min_recent):
+        evicted = 0
+        while over_limit() and len(self._messages) > min_recent:
+            message = self._messages.popleft()
+            self.total_tokens -= self._token_counts.popleft()
+            self._add_summary_line(summarize_message(message["role"], message["content"]))
+            evicted += 1
+        return evicted
+
+    def _add_summary_line(self, line):
+        self.summary_lines.append(line)
+        self.summary_tokens += count_tokens(line)
+        # Oldest lines go first, except the very first one: it usually holds the user's description of the grievance.
+        while self.summary_tokens > HISTORY_SUMMARY_TOKEN_BUDGET and len(self.summary_lines) > 2:
+            self.summary_tokens -= count_tokens(self.summary_lines.pop(1))
+
+    def summary_text(self):
+        """The summary of evicted messages as prompt text, or None if nothing was evicted."""
+        if not self.summary_lines:
+            return None
+        return "Summary of the earlier conversation (older messages condensed):\n" + "\n".join(self.summary_lines)
@@ -0,0 +1,148 @@
+# Local yes/no intent matching for confirmations.
+# Affirmative and negative phrases per language (plus romanized Hindi/Marathi/Tamil/Kannada, as speech
+# recognition often transcribes "haan ji" or "theek hai" in Latin script) are compiled once at import
+# into one token trie per (intent, language). A reply is NFC-normalized, case-folded and stripped of
+# punctuation, then matched against the trie: the whole reply being a phrase, the reply starting with
+# one ("yes please, go ahead"), or a multi-word phrase appearing inside it ("i think that's right").
+# The strongest match across both intents decides, so "sahi nahi hai" is negative even though it
+# starts with "sahi".
+
+import re
+import unicodedata
+
+from .mappings_web import LANGUAGES
+
+AFFIRMATIVE = "affirmative"
+NEGATIVE = "negative"
+
+# Scores per kind of match; phrase matches need at least two words, as a single word inside a
+# longer reply ("not", "good") says little about the reply as a whole.
+EXACT_MATCH_SCORE = 1.0
+PREFIX_MATCH_SCORE = 0.9
+PHRASE_MATCH_SCORE = 0.7
+
+_INTENT_TERMS = {
+    AFFIRMATIVE: {
+        "english": ["yes", "yeah", "yep", "yup", "correct", "right", "sure", "ok", "okay", "alright", "all right", "perfect",
+                    "sounds good", "looks good", "that's right", "that is right", "that's correct", "proceed", "continue",
+                    "affirmative", "indeed", "certainly", "please do", "go ahead", "absolutely", "fine", "good", "great",
+                    "positive", "yes please", "of course"],
+        "hindi": ["हाँ", "जी हाँ", "ठीक है", "सही है", "आगे बढ़ें", "जारी रखें", "हाँ जी", "सही", "हाँजी", "जी", "बेशक", "ज़रूर",
+                  "अच्छा", "बहुत अच्छा", "सकारात्मक", "बिल्कुल", "हाँ सही है",
+                  "haan", "haa", "han", "haan ji", "ha ji", "ji haan", "ji", "theek hai", "thik hai", "theek", "sahi hai",
+                  "sahi", "bilkul", "zaroor", "jaroor", "achha", "accha", "aage badho", "aage badhiye", "chalega"],
+        "tamil": ["ஆம்", "சரி", "சரியானது", "தொடரவும்", "நிச்சயமாக", "கண்டிப்பாக", "நல்லது",
+                  "aam", "aamaam", "sari", "seri", "sariyanadhu", "nichayamaga"],
+        "marathi": ["होय", "हो", "बरोबर", "ठीक आहे", "पुढे जा", "नक्कीच", "नक्की", "चालेल", "उत्तम",
+                    "hoy", "ho", "barobar", "theek aahe", "nakki", "chalel"],
+        "kannada": ["ಹೌದು", "ಸರಿ", "ಸರಿಯಾಗಿದೆ", "ಮುಂದುವರಿಸಿ", "ಖಂಡಿತ", "ಖಂಡಿತವಾಗಿ", "ಒಳ್ಳೆಯದು",
+                    "haudu", "howdu", "sari", "sariyagide", "khandita"],
+    },
+    NEGATIVE: {
+        "english": ["no", "nope", "nah", "not", "incorrect", "wrong", "don't", "do not", "stop", "cancel", "negative",
+                    "not right", "not correct", "that's not it", "that's wrong", "that is wrong", "don t", "never",
+                    "bad", "false", "no thanks", "no thank you"],
+        "hindi": ["नहीं", "गलत", "सही नहीं", "मत करो", "रुको", "रद्द करें", "नहीं जी", "ना", "नहींजी", "कभी नहीं", "खराब", "असत्य",
+                  "ग़लत", "सही नहीं है", "बिल्कुल नहीं",
+                  "nahi", "nahin", "nai", "na", "nahi ji", "galat", "sahi nahi", "sahi nahi hai", "mat karo", "ruko",
+                  "kabhi nahi", "bilkul nahi"],
+        "tamil": ["இல்லை", "தவறு", "சரியல்ல", "வேண்டாம்", "நிறுத்து", "ஒருபோதும் இல்லை", "மோசமான",
+                  "illai", "illa", "thappu", "vendam", "sari illai"],
+        "marathi": ["नाही", "चुकीचे", "बरोबर नाही", "थांबा", "रद्द करा", "कधीच नाही", "वाईट",
+                    "nahi", "naahi", "chukiche", "barobar nahi", "thamba"],
+        "kannada": ["ಇಲ್ಲ", "ತಪ್ಪು", "ಸರಿಯಿಲ್ಲ", "ಬೇಡ", "ನಿಲ್ಲಿಸಿ", "ರದ್ದುಮಾಡಿ", "ಎಂದಿಗೂ ಇಲ್ಲ", "ಕೆಟ್ಟದು",
+                    "illa", "tappu", "sariyilla", "beda"],
+    },
+}
+
+# \w does not cover Indic vowel signs and viramas, so the Devanagari..Kannada blocks are kept whole (except the dandas).
+_NON_WORD_PATTERN = re.compile(r"[^\w\s'\u0900-\u0963\u0966-\u0cff]")
+_TERM_END = None # Trie key marking the end of a phrase; maps to the phrase's language
+
+
+def normalize_intent_text(text):
+    """
+    Canonical form used for matching: NFC, case-folded, chandrabindu folded onto anusvara ("हाँ" == "हां"),
+    punctuation removed and whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFC", str(text)).casefold().replace("ँ", "ं").replace("’", "'")
+    return " ".join(_NON_WORD_PATTERN.sub(" ", text).split())
+
+
+def _build_trie(terms_by_language):
+    """Token trie over the phrases: {token: {token: ..., _TERM_END: language}}. The first language listed wins a shared phrase."""
+    root = {}
+    for language, terms in terms_by_language:
+        for term in terms:
+            node = root
+            for token in normalize_intent_text(term).split():
+                node = node.setdefault(token, {})
+            node.setdefault(_TERM_END, language)
+    return root
+
+
+def _compile_matchers():
+    """One trie per (intent, conversation language): that language's phrases plus the English ones."""
+    matchers = {}
+    for intent, terms_map in _INTENT_TERMS.items():
+        for language in LANGUAGES:
+            sources = [(language, terms_map.get(language, []))]
+            if language != "english":
+                sources.append(("english", terms_map["english"]))
+            matchers[(intent, language)] = _build_trie(sources)
+    return matchers
+
+
+_MATCHERS = _compile_matchers()
+
+
+def _best_match(trie, tokens):
+    """
+    Strongest phrase of `trie` in `tokens`.
+
+    Returns:
+        tuple: (score, matched token count, language of the phrase); (0.0, 0, None) if nothing matches.
+    """
+    best = (0.0, 0, None)
+    for start in range(len(tokens)):
+        node = trie
+        for position in range(start, len(tokens)):
+            node = node.get(tokens[position])
+            if node is None:
+                break
+            if _TERM_END not in node:
+                continue
+            length = position - start + 1
+            if start == 0 and length == len(tokens):
+                score = EXACT_MATCH_SCORE
+            elif start == 0:
+                score = PREFIX_MATCH_SCORE
+            elif length > 1:
+                score = PHRASE_MATCH_SCORE
+            else:
+                continue
+            best = max(best, (score, length, node[_TERM_END]), key=lambda match: match[:2])
+    return best
+
+
+def match_confirmation(text, language):
+    """
+    Classifies a reply as affirmative or negative.
+
+    Args:
+        text (str): The user's reply.
+        language (str): Current conversation language; its phrases are checked along with the English ones.
+
+    Returns:
+        tuple: (intent, score, phrase language) - intent is AFFIRMATIVE, NEGATIVE or None (no match, or both
+        intents matched equally well), score is EXACT/PREFIX/PHRASE_MATCH_SCORE (0.0 without a match).
+    """
+    tokens = normalize_intent_text(text).split()
+    if language not in LANGUAGES:
+        language = "english"
+    affirmative = _best_match(_MATCHERS[(AFFIRMATIVE, language)], tokens)
+    negative = _best_match(_MATCHERS[(NEGATIVE, language)], tokens)
+    if affirmative[:2] == negative[:2]:
+        return None, 0.0, None
+    intent, (score, _, phrase_language) = (AFFIRMATIVE, affirmative) if affirmative[:2] > negative[:2] else (NEGATIVE, negative)
+    return intent, score, phrase_language
@@ -0,0 +1,143 @@
+# Background janitor for generated audio directories.
+# tts_audio_files and debug_audio grow by one file per bot turn / user recording.
+# Each directory gets a retention policy (maximum age and a byte quota); a sweeper
+# thread deletes expired files first, then the oldest files until the directory is
+# back under quota, and keeps totals of what it reclaimed.
+
+import os
+import logging
+import time
+import fnmatch
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionPolicy:
+    def __init__(self, directory, max_age_seconds=None, max_bytes=None, pattern="*", grace_seconds=120):
+        """
+        Args:
+            directory (str): Directory to police.
+            max_age_seconds (float, optional): Files older than this are deleted (None disables).
+            max_bytes (int, optional): Directory quota; oldest files are deleted beyond it (None disables).
+            pattern (str): Glob of file names the policy applies to; anything else is left alone.
+            grace_seconds (float): Files younger than this are never deleted, so a freshly returned
+                audio_url can still be fetched by the browser.
+        """
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.pattern = pattern
+        self.grace_seconds = grace_seconds
+
+
+class AudioJanitor:
+    def __init__(self, policies, interval=300):
+        """
+        Args:
+            policies (list[RetentionPolicy]): One policy per directory.
+            interval (float): Seconds between background sweeps (0 disables the thread).
+        """
+        self.policies = policies
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.sweeps = 0
+        self.files_deleted = 0
+        self.bytes_reclaimed = 0
+        self.last_sweep = {}
+
+        if self.interval:
+            threading.Thread(target=self._sweep_loop, name="audio-janitor", daemon=True).start()
+
+    def sweep(self):
+        """Applies every policy once. Returns {directory: {"deleted": n, "reclaimed_bytes": n, "remaining_bytes": n}}."""
+        report = {}
+        for policy in self.policies:
+            report[policy.directory] = self._apply(policy)
+        with self._lock:
+            self.sweeps += 1
+            self.last_sweep = report
+            for result in report.values():
+                self.files_deleted += result["deleted"]
+                self.bytes_reclaimed += result["reclaimed_bytes"]
+        reclaimed = sum(result["reclaimed_bytes"] for result in report.values())
+        if reclaimed:
+            logger.info("Audio janitor reclaimed %s bytes: %s", reclaimed, report)
+        return report
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sweeps": self.sweeps,
+                "files_deleted": self.files_deleted,
+                "bytes_reclaimed": self.bytes_reclaimed,
+                "last_sweep": self.last_sweep,
+            }
+
+    def close(self):
+        self._stop_event.set()
+
+    def _apply(self, policy):
+        result = {"deleted": 0, "reclaimed_bytes": 0, "remaining_bytes": 0}
+        if not os.path.isdir(policy.directory):
+            return result
+
+        now = time.time()
+        files = [] # (mtime, path, size), only files the policy may touch
+        with os.scandir(policy.directory) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False) or not fnmatch.fnmatch(entry.name, policy.pattern):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        files.sort()
+        total_bytes = sum(size for _, _, size in files)
+
+        def deletable(mtime):
+            return now - mtime >= policy.grace_seconds
+
+        survivors = []
+        for mtime, path, size in files:
+            expired = policy.max_age_seconds is not None and now - mtime > policy.max_age_seconds
+            if expired and deletable(mtime) and self._delete(path):
+                result["deleted"] += 1
+                result["reclaimed_bytes"] += size
+                total_bytes -= size
+            else:
+                survivors.append((mtime, path, size))
+
+        if policy.max_bytes is not None:
+            for mtime, path, size in survivors: # Oldest first
+                if total_bytes <= policy.max_bytes:
+                    break
+                if not deletable(mtime):
+                    break # Everything after this is newer still
+                if self._delete(path):
+                    result["deleted"] += 1
+                    result["reclaimed_bytes"] += size
+                    total_bytes -= size
+
+        result["remaining_bytes"] = total_bytes
+        return result
+
+    def _delete(self, path):
+        """Unlinks a file. On POSIX, a response already streaming it keeps its open handle and finishes
+        normally; where the OS refuses to delete open files, the file is skipped until the next sweep."""
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except PermissionError:
+            return False
+
+    def _sweep_loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("Error during audio janitor sweep: %s", e)
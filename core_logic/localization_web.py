@@ -0,0 +1,244 @@
+# Localized bot strings.
+# The table of everything the bot says outside LLM replies is built once at import: the built-in
+# strings below, overridden or extended by optional <language>.json resource files (LOCALIZATION_DIR),
+# are resolved for every language through its fallback chain (e.g. marathi -> hindi -> english) and
+# each template's placeholders are parsed up front. A translation whose placeholders differ from the
+# English template, or that is not a valid format string, is reported and skipped at load time instead
+# of failing mid-conversation. Looking a string up is then a dict lookup, plus str.format only for
+# templates that actually have placeholders.
+
+import os
+import logging
+import json
+import random
+import string
+
+from .config_web import LOCALIZATION_DIR, LOCALIZATION_FALLBACKS
+from .mappings_web import LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCALIZATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+REFERENCE_LANGUAGE = "english"
+
+# Built-in table: {key: {language_name: text or [variants]}}
+DEFAULT_STRINGS = {
+    "initial_greeting": {
+        "english": "Hello! I'm your virtual assistant. I can help you file a grievance about infrastructure, corruption, government services, or funding problems. What issue are you facing today?",
+        "hindi": "नमस्ते! मैं आपका वर्चुअल सहायक हूँ। मैं आपको बुनियादी ढाँचे, भ्रष्टाचार, सरकारी सेवाओं, या धन संबंधी समस्याओं के बारे में शिकायत दर्ज करने में मदद कर सकता हूँ। आज आप किस समस्या का सामना कर रहे हैं?",
+        "tamil": "வணக்கம்! நான் உங்கள் மெய்நிகர் உதவியாளர். உள்கட்டமைப்பு, ஊழல், அரசாங்க சேவைகள் அல்லது நிதிப் பிரச்சனைகள் பற்றிய புகாரைப் பதிவு செய்ய நான் உங்களுக்கு உதவ முடியும். இன்று நீங்கள் என்ன சிக்கலை எதிர்கொள்கிறீர்கள்?",
+        "marathi": "नमस्कार! मी तुमचा व्हर्च्युअल सहाय्यक आहे. पायाभूत सुविधा, भ्रष्टाचार, सरकारी सेवा किंवा निधी समस्यांबद्दल तक्रार दाखल करण्यास मी तुम्हाला मदत करू शकेन. आज तुम्हाला कोणती समस्या भेडसावत आहे?",
+        "kannada": "ನಮಸ್ಕಾರ! ನಾನು ನಿಮ್ಮ ವರ್ಚುವಲ್ ಸಹಾಯಕ. ಮೂಲಸೌಕರ್ಯ, ಭ್ರಷ್ಟಾಚಾರ, ಸರ್ಕಾರಿ ಸೇವೆಗಳು ಅಥವಾ ಹಣಕಾಸಿನ ಸಮಸ್ಯೆಗಳ ಕುರಿತು ದೂರನ್ನು ದಾಖಲಿಸಲು ನಾನು ನಿಮಗೆ ಸಹಾಯ ಮಾಡಬಲ್ಲೆ. ಇಂದು ನೀವು ಯಾವ ಸಮಸ್ಯೆಯನ್ನು ಎದುರಿಸುತ್ತಿದ್ದೀರಿ?"
+    },
+    "farewell_messages": { 
+        "english": ["Goodbye! Have a great day.", "Thanks for chatting. Take care!", "It was nice talking to you. Goodbye!"],
+        "hindi": ["अलविदा! आपका दिन शुभ हो।", "बातचीत के लिए धन्यवाद। अपना ख्याल रखना!", "आपसे बात करके अच्छा लगा। अलविदा!"],
+    },
+    "audio_capture_error": {
+        "english": "It seems there was an issue with capturing your audio or I didn't understand. Let's try that again. Could you please repeat?",
+        "hindi": "लगता है आपकी आवाज़ पकड़ने में कोई समस्या हुई या मुझे समझ नहीं आया। चलिए फिर से प्रयास करते हैं। क्या आप दोहरा सकते हैं?",
+    },
+    "submitting_form": { # This string is more for the point when form is being loaded by bot
+        "english": "Great! I'll prepare this form for you now. Please review the details on the right and submit it.",
+        "hindi": "बहुत बढ़िया! मैं अब आपके लिए यह फ़ॉर्म तैयार करूँगा। कृपया दाईं ओर विवरणों की समीक्षा करें और इसे जमा करें।",
+    },
+    "direct_to_form_filling_prompt": { # New string
+        "english": "Great, I believe I have all the necessary details for your {category_readable} grievance. I'll prepare the form for you to review and submit.",
+        "hindi": "बहुत बढ़िया, मुझे लगता है कि आपकी {category_readable} शिकायत के लिए मेरे पास सभी आवश्यक विवरण हैं। मैं आपके लिए फॉर्म तैयार करूँगा ताकि आप समीक्षा करके जमा कर सकें।"
+    },
+    "form_submitted_successfully": {
+        "english": "Your grievance has been noted as submitted. Is there anything else I can help you with today?",
+        "hindi": "आपकी शिकायत जमा कर दी गई है। क्या मैं आज आपकी कोई और मदद कर सकता हूँ?",
+    },
+     "form_filling_prompt": {
+        "english": "Please continue filling the form on the right. Let me know if you have questions or when you're done and have submitted it.",
+        "hindi": "कृपया दाईं ओर दिए गए फ़ॉर्म को भरते रहें। यदि आपके कोई प्रश्न हैं या जब आप भर चुके हों और जमा कर चुके हों तो मुझे बताएं।",
+    },
+    "update_information_prompt": {
+        "english": "No problem. Let's update your information. What would you like to change or provide first?",
+        "hindi": "कोई बात नहीं। चलिए आपकी जानकारी अपडेट करते हैं। आप सबसे पहले क्या बदलना या प्रदान करना चाहेंगे?",
+    },
+    "category_denied_re_understand": { 
+        "english": "My apologies. If '{category}' is not the right category, let's try to understand the issue again.",
+        "hindi": "क्षमा करें। यदि '{category}' सही श्रेणी नहीं है, तो चलिए समस्या को फिर से समझने का प्रयास करते हैं।",
+    },
+    "unhandled_stage_error": {
+        "english": "I seem to have lost my place. Let's start over. What issue are you facing?",
+        "hindi": "मैं अपनी जगह भूल गया लगता हूँ। चलिए फिर से शुरू करते हैं। आप किस समस्या का सामना कर रहे हैं?",
+    },
+    "internal_form_details_error": {
+         "english": "Internal error: Form details not found for this category. I'll have to restart our conversation.",
+         "hindi": "आंतरिक त्रुटि: इस श्रेणी के लिए फ़ॉर्म विवरण नहीं मिला। मुझे हमारी बातचीत पुनः आरंभ करनी होगी।"
+    },
+    "not_provided_placeholder": {"english": "[not provided]", "hindi": "[नहीं बताया गया]", "tamil": "[வழங்கப்படவில்லை]", "marathi": "[प्रदान केलेले नाही]", "kannada": "[ಒದಗಿಸಲಾಗಿಲ್ಲ]"},
+    "no_details_collected_placeholder": {"english": "no details collected yet", "hindi": "अभी तक कोई विवरण एकत्र नहीं किया गया है"},
+    "default_grievance_name": {"english": "grievance", "hindi": "शिकायत"},
+    "some_specific_details_placeholder": {"english": "some specific details", "hindi": "कुछ विशिष्ट विवरण"},
+    "none_confirmed_placeholder": {"english": "None explicitly confirmed yet by system", "hindi": "सिस्टम द्वारा अभी तक स्पष्ट रूप से कुछ भी पुष्टि नहीं की गई है"},
+    "all_collected_placeholder": {"english": "All seem to be mentioned or collected!", "hindi": "सभी का उल्लेख या संग्रह किया गया लगता है!"},
+    "confirmation_summary": { # This is the old summary prompt, less likely to be used for full summary now.
+        "english": "Okay, I have the following details for your {category_readable} complaint: {details_string}. Is all this information correct?",
+        "hindi": "ठीक है, आपकी {category_readable} शिकायत के लिए मेरे पास ये विवरण हैं: {details_string}। क्या यह सभी जानकारी सही है?",
+    },
+    "llm_error_collecting": {
+        "english": "I'm having a bit of trouble processing that. Could you please repeat or rephrase the last piece of information?",
+        "hindi": "मुझे इसे संसाधित करने में थोड़ी परेशानी हो रही है। क्या आप कृपया अंतिम जानकारी दोहरा सकते हैं या उसे दूसरे शब्दों में कह सकते हैं?",
+    },
+    "llm_error_collecting_after_ready_but_missing": { 
+        "english": "It seems I still need a few more details for the {category} form before we can proceed. Could we go over what's missing?",
+        "hindi": "लगता है {category} फॉर्म के लिए आगे बढ़ने से पहले मुझे अभी भी कुछ और विवरण चाहिए। क्या हम जो गायब है उस पर बात कर सकते हैं?"
+    },
+    "llm_error_general": {
+        "english": "I'm having some technical difficulties at the moment. Please try again in a short while.",
+        "hindi": "मुझे अभी कुछ तकनीकी दिक्कतें आ रही हैं। कृपया थोड़ी देर में पुनः प्रयास करें।",
+    },
+    "category_identified_prompt": {"english": "Okay, I think this is about {category}.", "hindi": "ठीक है, मुझे लगता है कि यह {category} के बारे में है।"},
+    "category_confirmation_prompt": {"english": "Is {category} the correct area for your grievance? We'll need some details if so.", "hindi": "क्या {category} आपकी शिकायत के लिए सही क्षेत्र है? यदि हाँ तो हमें कुछ विवरण चाहिए होंगे।"},
+    "ask_for_field_prompt": {"english": "Could you please provide your {field_name}?", "hindi": "क्या आप कृपया अपना {field_name} बता सकते हैं?"},
+    "simulated_confirmation_reprompt": {"english": "Is this information correct? Please say yes or no. (Simulated)", "hindi": "क्या यह जानकारी सही है? कृपया हाँ या नहीं कहें। (नकली)"}
+}
+
+
+def fallback_chain(language):
+    """Languages tried, in order, for a string missing in `language` (ends with English)."""
+    chain = [language] + [fallback for fallback in LOCALIZATION_FALLBACKS.get(language, []) if fallback != language]
+    if REFERENCE_LANGUAGE not in chain:
+        chain.append(REFERENCE_LANGUAGE)
+    return chain
+
+
+def _template_fields(template):
+    """Names of the placeholders in a format string (raises ValueError if it is malformed)."""
+    fields = set()
+    for _, field_name, _, _ in string.Formatter().parse(template):
+        if field_name is not None:
+            fields.add(field_name.split(".", 1)[0].split("[", 1)[0])
+    return frozenset(fields)
+
+
+def _load_resource_files(directory):
+    """Reads <language>.json files from `directory` into {key: {language_name: text or [variants]}}."""
+    overrides = {}
+    if not directory or not os.path.isdir(directory):
+        return overrides
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        language = filename[:-len(".json")].lower()
+        try:
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load localization file '%s': %s", filename, e)
+            continue
+        if not isinstance(entries, dict):
+            logger.warning("Localization file '%s' must hold a JSON object; ignored.", filename)
+            continue
+        for key, value in entries.items():
+            overrides.setdefault(key, {})[language] = value
+    return overrides
+
+
+def _compile_variants(key, language, value, reference_fields):
+    """
+    Validates one translation and returns its usable variants.
+
+    Args:
+        key (str): String key.
+        language (str): Language of the translation.
+        value (str or list): Text or list of variants.
+        reference_fields (frozenset or None): Placeholders of the English template (None: no reference to check against).
+
+    Returns:
+        tuple: (text, placeholder names) pairs; empty if none of the variants is usable.
+    """
+    variants = value if isinstance(value, list) else [value]
+    compiled = []
+    for variant in variants:
+        if not isinstance(variant, str) or not variant:
+            logger.warning("Localized string '%s' (%s) has a non-text variant; skipped.", key, language)
+            continue
+        try:
+            fields = _template_fields(variant)
+        except ValueError as e:
+            logger.warning("Localized string '%s' (%s) is not a valid template (%s); skipped.", key, language, e)
+            continue
+        if reference_fields is not None and fields != reference_fields:
+            logger.warning("Localized string '%s' (%s) uses placeholders %s, expected %s; skipped.", key, language, sorted(fields), sorted(reference_fields))
+            continue
+        compiled.append((variant, fields))
+    return tuple(compiled)
+
+
+def _compile_strings(table):
+    """
+    Resolves the table for every language through its fallback chain.
+
+    Returns:
+        tuple: ({(key, language): ((text, fields), ...)}, {key: placeholder names},
+        {key: {language: text or [variants]}} with every language filled in).
+    """
+    languages = set(LANGUAGES) | {language for translations in table.values() for language in translations}
+    compiled, key_fields, resolved = {}, {}, {}
+    for key, translations in table.items():
+        reference = _compile_variants(key, REFERENCE_LANGUAGE, translations[REFERENCE_LANGUAGE], None) \
+            if REFERENCE_LANGUAGE in translations else ()
+        reference_fields = reference[0][1] if reference else None
+        own = {}
+        for language, value in translations.items():
+            variants = reference if language == REFERENCE_LANGUAGE else \
+                _compile_variants(key, language, value, reference_fields)
+            if variants:
+                own[language] = variants
+        key_fields[key] = reference_fields if reference_fields is not None else \
+            frozenset().union(*(fields for variants in own.values() for _, fields in variants))
+        resolved[key] = {}
+        for language in languages:
+            source = next((candidate for candidate in fallback_chain(language) if candidate in own), None)
+            if source is None:
+                continue
+            compiled[(key, language)] = own[source]
+            texts = [text for text, _ in own[source]]
+            resolved[key][language] = texts if isinstance(translations[source], list) else texts[0]
+    return compiled, key_fields, resolved
+
+
+def _build_table():
+    table = {key: dict(translations) for key, translations in DEFAULT_STRINGS.items()}
+    for key, translations in _load_resource_files(LOCALIZATION_DIR or DEFAULT_LOCALIZATION_DIR).items():
+        table.setdefault(key, {}).update(translations)
+    return table
+
+
+_COMPILED, _KEY_FIELDS, LOCALIZED_STRINGS = _compile_strings(_build_table())
+
+
+def template_fields(key):
+    """Placeholder names the string `key` expects (empty if none or unknown)."""
+    return _KEY_FIELDS.get(key, frozenset())
+
+
+def localize(key, language, **kwargs):
+    """
+    Looks up and formats a localized string.
+
+    Args:
+        key (str): String key (e.g. "initial_greeting").
+        language (str): Language name; strings it lacks come from its fallback chain.
+        **kwargs: Values for the template's placeholders.
+
+    Returns:
+        str: The text (a random variant where there are several), or "[[UNTRANSLATED_KEY_<KEY>]]" for unknown keys.
+        If a placeholder value is missing, the unformatted template is returned.
+    """
+    variants = _COMPILED.get((key, language)) or _COMPILED.get((key, REFERENCE_LANGUAGE))
+    if not variants:
+        return f"[[UNTRANSLATED_KEY_{key.upper()}]]"
+    text, fields = variants[0] if len(variants) == 1 else random.choice(variants)
+    if not fields:
+        return text
+    missing = fields.difference(kwargs)
+    if missing:
+        logger.warning("Missing kwarg(s) %s for localized string key '%s', lang '%s'. Message: '%s'", sorted(missing), key, language, text)
+        return text
+    return text.format_map(kwargs)
@@ -0,0 +1,202 @@
+# Structured, level-gated logging.
+# Modules log through logging.getLogger(__name__) with %-style arguments, so a DEBUG record that is
+# disabled costs one level check and its message is never built. Enabled records are put on a queue
+# (QueueHandler) and written to stdout by a listener thread, keeping formatting of the JSON line,
+# PII redaction and the write itself off the request path. Each record carries the session and turn
+# ids of the request that produced it (context variables set by app.py), so one turn can be followed
+# across the interleaved output of concurrent requests.
+
+import re
+import sys
+import copy
+import json
+import uuid
+import time
+import queue
+import atexit
+import logging
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+
+from .config_web import LOG_LEVEL, LOG_FORMAT, LOG_REDACT_PII, LOG_PII_FIELDS
+
+session_id_var = contextvars.ContextVar("session_id", default=None)
+turn_id_var = contextvars.ContextVar("turn_id", default=None)
+
+REDACTED = "[redacted]"
+_EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# Indian mobile numbers (optionally +91) and 12-digit Aadhaar numbers, with or without separators
+_PHONE_PATTERN = re.compile(r"(?<!\d)(?:\+?91[\s-]?)?[6-9]\d{4}[\s-]?\d{5}(?!\d)")
+_AADHAAR_PATTERN = re.compile(r"(?<!\d)\d{4}[\s-]?\d{4}[\s-]?\d{4}(?!\d)")
+
+# Attributes every LogRecord has; anything else was passed through `extra` and is written as a field.
+_STANDARD_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "session_id", "turn_id"}
+
+_listener = None
+
+
+def redact_text(text):
+    """Masks email addresses, mobile numbers and Aadhaar numbers in free text (no-op unless LOG_REDACT_PII)."""
+    if not LOG_REDACT_PII or not text:
+        return text
+    text = _EMAIL_PATTERN.sub(REDACTED, text)
+    text = _AADHAAR_PATTERN.sub(REDACTED, text)
+    return _PHONE_PATTERN.sub(REDACTED, text)
+
+
+def redact_form_data(form_data):
+    """Copy of `form_data` with the values of LOG_PII_FIELDS masked (unchanged unless LOG_REDACT_PII)."""
+    if not LOG_REDACT_PII or not isinstance(form_data, dict):
+        return form_data
+    return {field: (REDACTED if field in LOG_PII_FIELDS and str(value).strip() else value) for field, value in form_data.items()}
+
+
+def redact_payload(payload):
+    """Copy of a turn payload with its "form_data" (LOAD_FORM actions) redacted."""
+    if not LOG_REDACT_PII or not isinstance(payload, dict) or "form_data" not in payload:
+        return payload
+    return {**payload, "form_data": redact_form_data(payload["form_data"])}
+
+
+class redacted:
+    """
+    Log argument that defers redaction until a record is actually emitted, so disabled DEBUG calls
+    cost nothing: logger.debug("Form data: %s", redacted(self.form_data)).
+    Accepts form data (dict), a JSON object as text (raw extraction output) or free text.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        value = self.value
+        if isinstance(value, str):
+            try:
+                parsed = json.loads(value)
+            except ValueError:
+                return redact_text(value)
+            if not isinstance(parsed, dict):
+                return redact_text(value)
+            value = parsed
+        return str(redact_form_data(value)) if isinstance(value, dict) else redact_text(str(value))
+
+
+def new_turn_id():
+    return uuid.uuid4().hex[:16]
+
+
+def set_log_context(session_id=None, turn_id=None):
+    """Sets the ids attached to records logged from the current context; returns tokens for reset_log_context()."""
+    return session_id_var.set(session_id), turn_id_var.set(turn_id)
+
+
+def reset_log_context(tokens):
+    session_token, turn_token = tokens
+    turn_id_var.reset(turn_token)
+    session_id_var.reset(session_token)
+
+
+@contextmanager
+def log_context(session_id=None, turn_id=None):
+    """Context manager form of set_log_context() (background work, CLI commands)."""
+    tokens = set_log_context(session_id, turn_id)
+    try:
+        yield
+    finally:
+        reset_log_context(tokens)
+
+
+def _extra_fields(record):
+    """Fields passed to the logging call through `extra`."""
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_RECORD_ATTRIBUTES and not key.startswith("_")}
+
+
+class _ContextFilter(logging.Filter):
+    """Stamps records with the session/turn ids; runs in the calling thread, where the context variables are set."""
+
+    def filter(self, record):
+        record.session_id = session_id_var.get()
+        record.turn_id = turn_id_var.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Merges the arguments into the message (they may change once the caller moves on) and renders any traceback
+    before the record is queued; JSON encoding, redaction and the write happen in the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, session_id, turn_id, msg, any `extra` fields and exc."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "session_id": getattr(record, "session_id", None),
+            "turn_id": getattr(record, "turn_id", None),
+            "msg": redact_text(record.getMessage()),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, with the same redaction as the JSON output."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(session_id)s %(turn_id)s] %(message)s")
+
+    def formatMessage(self, record):
+        record.message = redact_text(record.message)
+        extra = _extra_fields(record)
+        if extra:
+            record.message += " " + json.dumps(extra, ensure_ascii=False, default=str)
+        return super().formatMessage(record)
+
+
+def setup_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, stream=None):
+    """
+    Routes all logging through a queue to a background writer. Safe to call more than once.
+
+    Args:
+        level (str or int): Root log level (e.g. "INFO", "DEBUG").
+        log_format (str): "json" or "text".
+        stream: Output stream (default sys.stdout).
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if _listener is not None:
+        return
+
+    output_handler = logging.StreamHandler(stream or sys.stdout)
+    output_handler.setFormatter(TextFormatter() if log_format == "text" else JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(_ContextFilter())
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, output_handler)
+    _listener.start()
+    atexit.register(_listener.stop) # Flushes what is still queued on shutdown
@@ -1,5 +1,9 @@
 # Language and voice mappings for the voice chatbot
 
+import logging
+
+logger = logging.getLogger(__name__)
+
 # Mapping from common language names to ISO 639-1 codes (or similar)
 # Used by the chatbot logic internally
 LANGUAGES = {
@@ -79,5 +83,5 @@ def map_browser_lang_to_chat_lang(browser_lang_tag):
         if primary_tag == code:
             return name
             
-    print(f"Warning: Browser language tag '{browser_lang_tag}' not mapped. Defaulting to English.")
+    logger.warning("Browser language tag '%s' not mapped. Defaulting to English.", browser_lang_tag)
     return "english" 
@@ -0,0 +1,271 @@
+# In-process latency and usage metrics, exposed in the Prometheus text format at /metrics.
+# Every upstream call a turn makes (speech-to-text, language detection, the stage completion,
+# form extraction, text-to-speech) is timed per stage and model, with token/character usage and
+# error/timeout counts, so SLOs can be set per stage and regressions traced to the call that
+# caused them. Gauges (live sessions, audio directory sizes) are computed when scraped.
+# Values are per process; with several workers, Prometheus aggregates the scraped instances.
+
+import os
+import time
+import bisect
+import threading
+
+from .tracing_web import start_span, end_span, SPAN_KIND_CLIENT
+
+# Upper bounds (seconds) of the latency histogram buckets; LLM and TTS calls span 50 ms to tens of seconds.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {} # {label values: value}
+
+    def labels(self, *values):
+        """The child metric for one combination of label values (in labelnames order)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        return _Child(self, tuple(str(value) for value in values))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            samples = list(self._samples())
+        lines.extend(f"{name}{_format_labels(names, values)} {_format_value(value)}" for name, names, values, value in samples)
+        return "\n".join(lines)
+
+
+class _Child:
+    __slots__ = ("_metric", "_label_values")
+
+    def __init__(self, metric, label_values):
+        self._metric = metric
+        self._label_values = label_values
+
+    def inc(self, amount=1):
+        self._metric._inc(self._label_values, amount)
+
+    def observe(self, value):
+        self._metric._observe(self._label_values, value)
+
+    def set(self, value):
+        self._metric._set(self._label_values, value)
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1):
+        self._inc((), amount)
+
+    def _inc(self, label_values, amount):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self):
+        for label_values, value in sorted(self._values.items()):
+            yield self.name, self.labelnames, label_values, value
+
+
+class Gauge(_Metric):
+    """
+    Gauge set directly, or computed at scrape time by a function returning the value
+    (or {label values tuple: value} for a labelled gauge).
+    """
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value):
+        self._set((), value)
+
+    def set_function(self, function):
+        self._function = function
+
+    def _set(self, label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    def _samples(self):
+        values = self._values
+        if self._function is not None:
+            try:
+                result = self._function()
+            except Exception:
+                result = {}
+            values = result if isinstance(result, dict) else {(): result}
+        for label_values, value in sorted(values.items()):
+            yield self.name, self.labelnames, tuple(label_values), value
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value):
+        self._observe((), value)
+
+    def _observe(self, label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0] # Bucket counts, sum, count
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        bucket_labelnames = self.labelnames + ("le",)
+        for label_values, (bucket_counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", bucket_labelnames, label_values + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, label_values, total
+            yield f"{self.name}_count", self.labelnames, label_values, count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "grievance_stage_duration_seconds", "Duration of upstream calls per pipeline stage and model.", ("stage", "model")))
+STAGE_FIRST_CHUNK = REGISTRY.register(Histogram(
+    "grievance_stage_first_chunk_seconds", "Time to the first streamed token or audio chunk per stage and model.", ("stage", "model")))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "grievance_stage_errors_total", "Failed upstream calls per stage and model; kind is timeout or error.", ("stage", "model", "kind")))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "grievance_llm_tokens_total", "LLM tokens per stage and model; kind is prompt or completion.", ("stage", "model", "kind")))
+TTS_CHARACTERS = REGISTRY.register(Counter(
+    "grievance_tts_characters_total", "Characters sent to text-to-speech.", ("model",)))
+STT_AUDIO_BYTES = REGISTRY.register(Counter(
+    "grievance_stt_audio_bytes_total", "Bytes of recorded audio sent to speech-to-text.", ("model",)))
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "grievance_http_request_duration_seconds", "Time to response headers per endpoint and status.", ("endpoint", "status")))
+UPSTREAM_RETRIES = REGISTRY.register(Counter(
+    "grievance_upstream_retries_total", "Retried upstream attempts per call type; reason is timeout, connection or the HTTP status.", ("call_type", "reason")))
+UPSTREAM_HEDGES = REGISTRY.register(Counter(
+    "grievance_upstream_hedges_total", "Hedge requests sent per call type; outcome is won or lost.", ("call_type", "outcome")))
+UPSTREAM_SHORT_CIRCUITS = REGISTRY.register(Counter(
+    "grievance_upstream_short_circuits_total", "Calls failed fast because the call type's circuit was open.", ("call_type",)))
+UPSTREAM_CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    "grievance_upstream_circuit_open", "1 while the call type's circuit breaker is open or half-open.", ("call_type",)))
+ACTIVE_SESSIONS = REGISTRY.register(Gauge(
+    "grievance_active_sessions", "Chatbot sessions held by this process."))
+AUDIO_DIRECTORY_BYTES = REGISTRY.register(Gauge(
+    "grievance_audio_directory_bytes", "Bytes of audio stored per directory.", ("directory",)))
+
+
+def error_kind(exception):
+    """
+    Returns "timeout" for timeouts (including the OpenAI client's APITimeoutError), "circuit_open" for calls
+    refused by an open circuit breaker, otherwise "error".
+    """
+    name = type(exception).__name__
+    if name == "CircuitOpenError":
+        return "circuit_open"
+    return "timeout" if isinstance(exception, TimeoutError) or "Timeout" in name else "error"
+
+
+class track_stage:
+    """
+    Times one upstream call: with track_stage("chat", CHAT_MODEL) as call: ...
+    Records the duration on exit and counts the failure if the block raises.
+    For streamed calls, call.first_chunk() marks the first token/chunk and call.record_usage(response_or_chunk)
+    adds the token usage the response reports.
+    The call is also traced as an "openai.<stage>" span of the current turn (see tracing_web).
+    """
+
+    __slots__ = ("stage", "model", "_start", "_first_chunk_seen", "_span")
+
+    def __init__(self, stage, model):
+        self.stage = stage
+        self.model = model
+        self._first_chunk_seen = False
+
+    def __enter__(self):
+        self._span = start_span(f"openai.{self.stage}", SPAN_KIND_CLIENT, {"stage": self.stage, "model": self.model})
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        STAGE_DURATION.labels(self.stage, self.model).observe(time.perf_counter() - self._start)
+        failed = exc is not None and not isinstance(exc, GeneratorExit) # GeneratorExit: the client stopped reading a stream
+        if failed:
+            STAGE_ERRORS.labels(self.stage, self.model, error_kind(exc)).inc()
+        end_span(self._span, error=exc if failed else None)
+        return False
+
+    def first_chunk(self):
+        if not self._first_chunk_seen:
+            self._first_chunk_seen = True
+            elapsed = time.perf_counter() - self._start
+            STAGE_FIRST_CHUNK.labels(self.stage, self.model).observe(elapsed)
+            if self._span:
+                self._span.set_attribute("first_chunk_ms", round(elapsed * 1000, 3))
+
+    def record_usage(self, response):
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        if prompt_tokens:
+            LLM_TOKENS.labels(self.stage, self.model, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(self.stage, self.model, "completion").inc(completion_tokens)
+        if self._span:
+            self._span.set_attribute("llm.prompt_tokens", prompt_tokens)
+            self._span.set_attribute("llm.completion_tokens", completion_tokens)
+
+
+def directory_size(path, pattern_prefix=""):
+    """Total size of the regular files in `path` (optionally only names starting with `pattern_prefix`)."""
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith(pattern_prefix) and entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return total
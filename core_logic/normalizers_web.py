@@ -0,0 +1,312 @@
+# Local mapping of free text onto the fixed <select> option values of the grievance forms.
+# issue_duration, current_status, service_type and prior_followup only accept the option
+# values listed in their field descriptions (config_web.py). Instead of relying on the LLM
+# to perform that mapping (and re-asking when it fails), user answers and LLM outputs are
+# resolved here with multilingual synonym tables, numeric duration parsing and difflib
+# fuzzy matching for misspellings ("pasport", "adhar card").
+
+import re
+import difflib
+import unicodedata
+
+from .extractors_web import normalize_digits
+
+# Option values per field; must match the <option value="..."> lists in templates/*_form.html.
+FIELD_OPTIONS = {
+    "issue_duration": ("less_than_week", "one_to_four_weeks", "one_to_six_months", "six_to_twelve_months", "more_than_year"),
+    "current_status": ("not_applied", "application_submitted", "application_under_review", "application_approved",
+                       "partial_funds", "application_rejected", "other"),
+    "service_type": ("aadhar", "pan", "voter_id", "passport", "driving_license", "birth_certificate", "death_certificate",
+                     "income_certificate", "caste_certificate", "property_registration", "water_connection",
+                     "electricity_connection", "other"),
+    "prior_followup": ("no", "phone", "email", "visit", "multiple"),
+}
+
+# Phrases (English, romanized Hindi, Hindi, Marathi, Tamil, Kannada) per option value, matched case-insensitively.
+# Latin phrases must match whole words; phrases in Indic scripts match as substrings so inflected forms
+# ("पासपोर्टच्या", "ஆதாரில்") are found too. When several phrases match, the longest one wins, which is how
+# "not approved yet" beats "approved".
+_OPTION_SYNONYMS = {
+    "issue_duration": {
+        "less_than_week": ("less than a week", "few days", "couple of days", "since yesterday", "since today",
+                           "kuch din", "kal se", "aaj se", "कुछ दिन", "कल से", "आज से", "काही दिवस", "कालपासून",
+                           "சில நாட்கள்", "ಕೆಲವು ದಿನ"),
+        "one_to_four_weeks": ("since last week", "few weeks", "couple of weeks", "pichle hafte", "kuch hafte",
+                              "पिछले हफ्ते", "पिछले हफ़्ते", "कुछ हफ्ते", "मागच्या आठवड्या", "काही आठवडे",
+                              "கடந்த வாரம்", "ಕಳೆದ ವಾರ"),
+        "one_to_six_months": ("since last month", "few months", "couple of months", "several months", "pichle mahine",
+                              "kuch mahine", "kai mahine", "पिछले महीने", "कुछ महीने", "कई महीने", "मागच्या महिन्या",
+                              "काही महिने", "अनेक महिने", "கடந்த மாதம்", "பல மாதங்கள்", "ಕಳೆದ ತಿಂಗಳು", "ಹಲವು ತಿಂಗಳು"),
+        "six_to_twelve_months": ("almost a year", "nearly a year", "about a year", "half a year", "since last year",
+                                 "pichle saal", "पिछले साल", "करीब एक साल", "मागच्या वर्षी", "கடந்த ஆண்டு", "ಕಳೆದ ವರ್ಷ"),
+        "more_than_year": ("more than a year", "over a year", "over one year", "several years", "many years", "for years",
+                           "saal se zyada", "kai saal", "kai saalon", "ek saal se zyada", "एक साल से ज्यादा",
+                           "साल से ज़्यादा", "साल से ज्यादा", "कई साल", "कई सालों", "वर्षापेक्षा जास्त", "अनेक वर्षे",
+                           "பல ஆண்டுகள்", "ಹಲವು ವರ್ಷ"),
+    },
+    "current_status": {
+        "not_applied": ("not applied", "not yet applied", "haven't applied", "have not applied", "did not apply",
+                        "didn't apply", "apply nahi kiya", "आवेदन नहीं किया", "अर्ज केला नाही", "अर्ज केलेला नाही"),
+        "application_submitted": ("submitted", "applied", "application submitted", "apply kiya", "jama kiya",
+                                  "आवेदन किया", "आवेदन जमा", "जमा किया", "अर्ज केला", "अर्ज सादर", "விண்ணப்பித்தேன்",
+                                  "ಅರ್ಜಿ ಸಲ್ಲಿಸಿ"),
+        "application_under_review": ("under review", "pending", "in process", "in progress", "being processed",
+                                     "not approved yet", "still waiting", "no response", "no reply", "abhi tak pending",
+                                     "लंबित", "विचाराधीन", "प्रक्रिया में", "प्रलंबित", "प्रक्रियेत", "நிலுவையில்",
+                                     "ಬಾಕಿ"),
+        "application_approved": ("approved", "sanctioned", "approved but not received", "funds not received",
+                                 "money not received", "not received", "paisa nahi mila", "paise nahi mile",
+                                 "manzoor", "मंजूर", "स्वीकृत", "पैसा नहीं मिला", "पैसे नहीं मिले", "पैसे मिळाले नाहीत",
+                                 "அங்கீகரிக்கப்பட்டது", "ಮಂಜೂರು"),
+        "partial_funds": ("partial", "partially", "part of the money", "some money", "only some", "half the money",
+                          "installment", "instalment", "kuch paisa mila", "aadha paisa", "कुछ पैसे मिले",
+                          "आधा पैसा", "किस्त", "थोडे पैसे मिळाले", "हप्ता", "பகுதி", "ಭಾಗಶಃ"),
+        "application_rejected": ("rejected", "denied", "refused", "declined", "reject ho gaya", "khaarij", "अस्वीकार",
+                                 "खारिज", "रद्द", "नामंजूर", "फेटाळ", "நிராகரிக்கப்பட்டது", "ತಿರಸ್ಕರಿಸ"),
+    },
+    "service_type": {
+        "aadhar": ("aadhar", "aadhaar", "adhaar", "uid", "uidai", "आधार", "ஆதார்", "ಆಧಾರ್"),
+        "pan": ("pan", "pan card", "permanent account number", "पैन", "पॅन", "பான்", "ಪ್ಯಾನ್"),
+        "voter_id": ("voter id", "voter card", "voter", "election card", "मतदाता", "वोटर", "मतदार",
+                     "வாக்காளர்", "ಮತದಾರ"),
+        "passport": ("passport", "पासपोर्ट", "पारपत्र", "கடவுச்சீட்டு", "பாஸ்போர்ட்", "ಪಾಸ್‌ಪೋರ್ಟ್", "ಪಾಸ್ಪೋರ್ಟ್"),
+        "driving_license": ("driving license", "driving licence", "driving", "licence", "license", "dl",
+                            "ड्राइविंग", "लाइसेंस", "वाहन परवाना", "चालक परवाना", "ஓட்டுநர் உரிமம்", "ಚಾಲನಾ ಪರವಾನಗಿ"),
+        "birth_certificate": ("birth certificate", "birth", "janm praman", "janam praman", "जन्म प्रमाण",
+                              "जन्म दाखला", "जन्माचा दाखला", "பிறப்புச் சான்றிதழ்", "ಜನನ ಪ್ರಮಾಣ"),
+        "death_certificate": ("death certificate", "death", "mrityu praman", "मृत्यु प्रमाण", "मृत्यू दाखला",
+                              "इसापत्र", "இறப்புச் சான்றிதழ்", "ಮರಣ ಪ್ರಮಾಣ"),
+        "income_certificate": ("income certificate", "income", "aay praman", "आय प्रमाण", "उत्पन्नाचा दाखला",
+                               "उत्पन्न दाखला", "வருமானச் சான்றிதழ்", "ಆದಾಯ ಪ್ರಮಾಣ"),
+        "caste_certificate": ("caste certificate", "caste", "jaati praman", "jati praman", "जाति प्रमाण",
+                              "जात प्रमाणपत्र", "जातीचा दाखला", "சாதிச் சான்றிதழ்", "ಜಾತಿ ಪ್ರಮಾಣ"),
+        "property_registration": ("property registration", "land registration", "registry", "property", "zameen",
+                                  "रजिस्ट्री", "संपत्ति", "जमीन", "मालमत्ता", "खरेदीखत", "சொத்து பதிவு", "ಆಸ್ತಿ ನೋಂದಣಿ"),
+        "water_connection": ("water connection", "water supply", "water", "pani connection", "paani connection",
+                             "nal connection", "पानी कनेक्शन", "नल कनेक्शन", "पाणी कनेक्शन", "नळ जोडणी",
+                             "குடிநீர் இணைப்பு", "ನೀರಿನ ಸಂಪರ್ಕ"),
+        "electricity_connection": ("electricity connection", "electricity", "power connection", "bijli connection",
+                                   "meter", "बिजली कनेक्शन", "बिजली", "वीज जोडणी", "वीज कनेक्शन", "मीटर",
+                                   "மின் இணைப்பு", "ವಿದ್ಯುತ್ ಸಂಪರ್ಕ"),
+    },
+    "prior_followup": {
+        "no": ("no", "nope", "never", "not yet", "first time", "first complaint", "nahi", "nahin", "pehli baar",
+               "नहीं", "पहली बार", "नाही", "पहिल्यांदा", "இல்லை", "ಇಲ್ಲ"),
+        "phone": ("phone", "called", "call", "calls", "telephone", "helpline", "phone kiya", "call kiya", "फोन",
+                  "फ़ोन", "कॉल", "फोन केला", "தொலைபேசி", "போன்", "ಫೋನ್", "ಕರೆ"),
+        "email": ("email", "e-mail", "mail", "emailed", "wrote", "letter", "ईमेल", "ई-मेल", "चिट्ठी", "மின்னஞ்சல்",
+                  "ಇಮೇಲ್"),
+        "visit": ("visit", "visited", "went", "in person", "went to the office", "office gaya", "daftar gaya",
+                  "gaya tha", "gayi thi", "दफ्तर गया", "कार्यालय गया", "गया था", "गई थी", "कार्यालयात गेलो",
+                  "भेट दिली", "गेलो होतो", "நேரில்", "ನೇರವಾಗಿ"),
+        "multiple": ("multiple times", "many times", "several times", "again and again", "kai baar", "baar baar",
+                     "कई बार", "बार बार", "अनेक वेळा", "पुन्हा पुन्हा", "பல முறை", "ಹಲವು ಬಾರಿ"),
+    },
+}
+
+# Fields whose answers are too generic to map without the matching bot question ("no", "phone", "mail"
+# also occur in unrelated turns); these are only mapped from a user message when the question asked for them.
+_QUESTION_PATTERNS = {
+    "prior_followup": re.compile(
+        r"follow(?:ed)?[\s-]?up|contacted|complain\w* (?:before|earlier)|reached out|pehle|पहले|संपर्क|आधी|पाठपुरावा"
+        r"|முன்பு|ಹಿಂದೆ", re.IGNORECASE),
+    "current_status": re.compile(r"status|stage|स्थिति|स्थिती|स्टेटस|sthiti|நிலை|ಸ್ಥಿತಿ", re.IGNORECASE),
+}
+
+# --- Duration parsing (issue_duration) ---
+
+_DURATION_UNITS = (
+    # (unit length in days, word stems); a token starting with a stem counts, so plurals/inflections match.
+    (1, ("day", "din", "दिन", "दिवस", "நாள", "நாட்", "ದಿನ")),
+    (7, ("week", "hafta", "hafte", "hafton", "हफ्त", "हफ़्त", "सप्ताह", "आठवड", "வார", "ವಾರ")),
+    (30, ("month", "mahina", "mahine", "mahino", "महीन", "माह", "महिन", "மாத", "ತಿಂಗಳ")),
+    (365, ("year", "yr", "saal", "varsh", "साल", "वर्ष", "ஆண்டு", "வருட", "ವರ್ಷ")),
+)
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "ek": 1, "एक": 1, "ஒரு": 1, "ஒன்று": 1, "ಒಂದು": 1, "ಒಂದೂವರೆ": 1.5,
+    "two": 2, "couple": 2, "do": 2, "दो": 2, "दोन": 2, "இரண்டு": 2, "ಎರಡು": 2,
+    "three": 3, "few": 3, "teen": 3, "kuch": 3, "तीन": 3, "कुछ": 3, "काही": 3, "மூன்று": 3, "சில": 3, "ಮೂರು": 3, "ಕೆಲವು": 3,
+    "four": 4, "char": 4, "chaar": 4, "चार": 4, "நான்கு": 4, "ನಾಲ್ಕು": 4,
+    "five": 5, "paanch": 5, "panch": 5, "पांच": 5, "पाँच": 5, "पाच": 5, "ஐந்து": 5, "ಐದು": 5,
+    "six": 6, "chhe": 6, "छह": 6, "छः": 6, "सहा": 6, "ஆறு": 6, "ಆರು": 6,
+    "seven": 7, "saat": 7, "सात": 7, "ஏழு": 7, "ಏಳು": 7,
+    "eight": 8, "aath": 8, "आठ": 8, "எட்டு": 8, "ಎಂಟು": 8,
+    "nine": 9, "nau": 9, "नौ": 9, "नऊ": 9, "ஒன்பது": 9, "ಒಂಬತ್ತು": 9,
+    "ten": 10, "das": 10, "दस": 10, "दहा": 10, "பத்து": 10, "ಹತ್ತು": 10,
+    "eleven": 11, "twelve": 12, "gyarah": 11, "barah": 12, "ग्यारह": 11, "बारह": 12, "अकरा": 11, "बारा": 12,
+    "half": 0.5, "aadha": 0.5, "आधा": 0.5, "अर्धा": 0.5, "डेढ़": 1.5, "dedh": 1.5, "दीड": 1.5, "ढाई": 2.5, "adhai": 2.5,
+}
+# "more than 2 months" / "2 mahine se zyada" push a boundary value into the next bucket.
+_MORE_THAN_PATTERN = re.compile(
+    r"\b(?:more than|over|above|beyond|zyada|jyada)\b|ज़्यादा|ज्यादा|अधिक|पेक्षा जास्त|जास्त|க்கும் மேல்|ಕ್ಕಿಂತ ಹೆಚ್ಚು",
+    re.IGNORECASE)
+_WORD_SPLIT_PATTERN = re.compile(r"\d+(?:\.\d+)?|[^\s\d.,!?;:()\"'/]+")
+_FUZZY_CUTOFF = 0.8
+
+
+def _normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", normalize_digits(str(text))).casefold().split())
+
+def parse_duration_days(text):
+    """
+    Parses a spoken or written duration ("3 weeks", "do mahine se", "डेढ़ साल", "2 वर्षांपासून").
+
+    Args:
+        text (str): Free text containing a duration.
+
+    Returns:
+        float or None: The duration in days (slightly above the stated value after "more than"), or None.
+    """
+    tokens = _WORD_SPLIT_PATTERN.findall(_normalize_text(text))
+    for index, token in enumerate(tokens):
+        unit_days = next((days for days, stems in _DURATION_UNITS if token.startswith(stems)), None)
+        if unit_days is None or index == 0:
+            continue
+        previous = tokens[index - 1]
+        if previous in ("and", "a", "of") and index >= 2 and tokens[index - 2] in ("half", "couple"):
+            previous = tokens[index - 2] # "half a year", "couple of weeks"
+        quantity = _NUMBER_WORDS.get(previous)
+        if quantity is None:
+            try:
+                quantity = float(previous)
+            except ValueError:
+                continue
+        days = quantity * unit_days
+        if _MORE_THAN_PATTERN.search(" ".join(tokens[max(0, index - 3):index + 4])):
+            days += 1
+        return days
+    return None
+
+def duration_option(days):
+    """Maps a duration in days onto the issue_duration option values."""
+    if days < 7:
+        return "less_than_week"
+    if days < 30:
+        return "one_to_four_weeks"
+    if days <= 180:
+        return "one_to_six_months"
+    if days <= 365:
+        return "six_to_twelve_months"
+    return "more_than_year"
+
+
+# --- Synonym matching ---
+
+def _compile_phrase(phrase):
+    if phrase.isascii():
+        return re.compile(r"(?<![a-z0-9])" + re.escape(phrase) + r"(?![a-z0-9])")
+    return re.compile(re.escape(phrase))
+
+# Compiled once at import: {field: [(phrase, compiled pattern, option value)]}, longest phrases first.
+_COMPILED_SYNONYMS = {
+    field: sorted(
+        ((_normalize_text(phrase), _compile_phrase(_normalize_text(phrase)), value)
+         for value, phrases in options.items() for phrase in phrases + (value.replace("_", " "),)),
+        key=lambda item: len(item[0]), reverse=True)
+    for field, options in _OPTION_SYNONYMS.items()
+}
+# Single-word synonyms of 4+ characters, for fuzzy matching of misspelled words: {field: {word: option value}}
+_FUZZY_VOCABULARY = {
+    field: {phrase: value for phrase, _, value in entries if " " not in phrase and len(phrase) >= 4}
+    for field, entries in _COMPILED_SYNONYMS.items()
+}
+
+
+def _match_synonyms(field, text):
+    """Returns the option values whose phrases occur in `text` (normalized), longest phrase first."""
+    matched = []
+    covered = []
+    for phrase, pattern, value in _COMPILED_SYNONYMS[field]:
+        for match in pattern.finditer(text):
+            span = match.span()
+            if any(start <= span[0] and span[1] <= end for start, end in covered):
+                continue # Part of a longer phrase already matched ("approved" inside "not approved yet")
+            covered.append(span)
+            if value not in matched:
+                matched.append(value)
+    return matched
+
+def _match_fuzzy(field, text):
+    vocabulary = _FUZZY_VOCABULARY[field]
+    for token in _WORD_SPLIT_PATTERN.findall(text):
+        if len(token) < 4:
+            continue
+        close = difflib.get_close_matches(token, vocabulary, n=1, cutoff=_FUZZY_CUTOFF)
+        if close:
+            return vocabulary[close[0]]
+    return None
+
+def _resolve_option(field, text):
+    normalized = _normalize_text(text)
+    if normalized.replace(" ", "_") in FIELD_OPTIONS[field]:
+        return normalized.replace(" ", "_")
+
+    if field == "issue_duration":
+        days = parse_duration_days(normalized)
+        if days is not None:
+            return duration_option(days)
+
+    matched = _match_synonyms(field, normalized)
+    if field == "prior_followup":
+        channels = [value for value in matched if value in ("phone", "email", "visit")]
+        if len(channels) > 1:
+            return "multiple" # Followed up through different channels
+        if channels and "no" in matched:
+            matched.remove("no") # "no reply to my calls" still means they called
+    if matched:
+        return matched[0]
+    return _match_fuzzy(field, normalized)
+
+def match_option(field, text, context=""):
+    """
+    Maps a free-text user answer onto one of the field's option values.
+
+    Args:
+        field (str): One of FIELD_OPTIONS.
+        text (str): The user's message.
+        context (str): The bot question it answers. Fields in _QUESTION_PATTERNS are only mapped when it asks for them.
+
+    Returns:
+        str or None: The option value, or None if the text does not clearly name one.
+    """
+    if field not in FIELD_OPTIONS or not text:
+        return None
+    question_pattern = _QUESTION_PATTERNS.get(field)
+    if question_pattern and not question_pattern.search(context or ""):
+        return None
+    return _resolve_option(field, text)
+
+def normalize_option(field, value):
+    """
+    Coerces an extracted value (typically from the LLM) onto the field's option values.
+
+    Args:
+        field (str): Form field name.
+        value: The extracted value.
+
+    Returns:
+        The value unchanged for fields without fixed options; otherwise the matching option value, or ""
+        when it cannot be mapped (so the field is asked again instead of submitting an invalid option).
+    """
+    if field not in FIELD_OPTIONS or not str(value).strip():
+        return value
+    return _resolve_option(field, value) or "" # The value already answers this field; no question needed
+
+def extract_option_fields(text, fields, context=""):
+    """
+    Maps a user message onto the option values of the wanted fields, without any LLM call.
+
+    Args:
+        text (str): The user's message (several messages may be joined with newlines).
+        fields (iterable): Form fields still wanted; only fields with fixed options are considered.
+        context (str): The bot question the message answers.
+
+    Returns:
+        dict: {field: option value} for each wanted field that could be resolved.
+    """
+    found = {}
+    for field in fields:
+        value = match_option(field, text, context)
+        if value:
+            found[field] = value
+    return found
@@ -0,0 +1,325 @@
+# Shared OpenAI client with per-call-type deadlines, retries, hedging and circuit breakers.
+# Every upstream call names its call type (the same names as the stage metrics):
+#   client.for_call("extraction").chat.completions.create(...)
+# The call then runs under that type's total deadline (OPENAI_CALL_TIMEOUTS): attempts, backoff sleeps
+# and hedges all share it, and each attempt gets what is left of it as its HTTP timeout. For streamed
+# calls the deadline covers getting the response; the body is then read under that timeout per read.
+# Within it the call is retried with jittered exponential backoff after timeouts, connection errors,
+# 429 and 5xx, may be hedged (a duplicate request once the first is slow; the first answer wins), and goes
+# through the type's circuit breaker: after OPENAI_BREAKER_FAILURE_THRESHOLD consecutive failures
+# calls fail immediately with CircuitOpenError, so the caller's local fallback (local language
+# guess, browser speech, fixed prompts) answers at once instead of a worker waiting on a brownout.
+# All call types share one pooled HTTP client, so connections and TLS sessions are reused.
+
+import time
+import random
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait, TimeoutError as FutureTimeoutError
+
+from openai import OpenAI, APIConnectionError, APITimeoutError, APIStatusError
+
+from .config_web import (OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS, OPENAI_CONNECT_TIMEOUT, OPENAI_CALL_TIMEOUTS,
+                         OPENAI_MAX_RETRIES, OPENAI_RETRY_BASE_DELAY, OPENAI_RETRY_MAX_DELAY, OPENAI_HEDGE_CALL_TYPES,
+                         OPENAI_HEDGE_DELAY, OPENAI_BREAKER_FAILURE_THRESHOLD, OPENAI_BREAKER_RESET_TIMEOUT)
+from .metrics_web import UPSTREAM_RETRIES, UPSTREAM_HEDGES, UPSTREAM_SHORT_CIRCUITS, UPSTREAM_CIRCUIT_OPEN
+
+try:
+    import httpx # Optional: installed with openai; needed to size the connection pool
+    from openai import DefaultHttpxClient
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+MIN_ATTEMPT_SECONDS = 0.5 # No retry is started with less of the deadline left than this
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call type's total deadline runs out before any attempt has answered."""
+
+    def __init__(self, call_type, seconds):
+        super().__init__(f"OpenAI '{call_type}' call got no answer within its {seconds:.1f}s deadline")
+        self.call_type = call_type
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the API while the call type's circuit is open."""
+
+    def __init__(self, call_type, retry_in):
+        super().__init__(f"OpenAI circuit for '{call_type}' is open; retrying upstream in {retry_in:.0f}s")
+        self.call_type = call_type
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. Closed: calls pass. Open (after failure_threshold failures in a row):
+    calls are refused for reset_timeout seconds. Half-open: one trial call passes; its outcome closes or reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=OPENAI_BREAKER_FAILURE_THRESHOLD, reset_timeout=OPENAI_BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_count = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Whether a call may go upstream now (in half-open state, only the one trial call).
+
+        Returns:
+            str: CLOSED, or HALF_OPEN for the trial call (which must end with record_success(), record_failure()
+                or release_trial()); False if the call is refused.
+        """
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return self.CLOSED
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return self.HALF_OPEN
+            return False
+
+    def release_trial(self):
+        """Ends a trial call that told nothing about the upstream (e.g. a local error); the next call is the trial."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def retry_in(self):
+        """Seconds until the open circuit lets a trial call through."""
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("OpenAI circuit for '%s' closed again.", self.name)
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.opened_count += 1
+                logger.warning("OpenAI circuit for '%s' opened after %s consecutive failure(s); failing fast for %.0fs.",
+                               self.name, self.consecutive_failures, self.reset_timeout)
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive_failures, "opened": self.opened_count}
+
+
+def _retry_reason(error):
+    """Why `error` is worth retrying ("timeout", "connection" or the HTTP status), or None if it is not."""
+    if isinstance(error, (APITimeoutError, TimeoutError)):
+        return "timeout"
+    if isinstance(error, APIConnectionError):
+        return "connection"
+    if isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES:
+        return str(error.status_code)
+    return None
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait (Retry-After), if any."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after")) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class _Resource:
+    """Attribute path into the OpenAI client (e.g. chat.completions); calling it runs the call through the facade."""
+
+    __slots__ = ("_facade", "_call_type", "_path")
+
+    def __init__(self, facade, call_type, path):
+        self._facade = facade
+        self._call_type = call_type
+        self._path = path
+
+    def __getattr__(self, name):
+        return _Resource(self._facade, self._call_type, self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        method = self._facade._client
+        for name in self._path:
+            method = getattr(method, name)
+        if "with_streaming_response" in self._path:
+            # The request is made when the returned context manager is entered
+            return _StreamingResponseContext(self._facade, self._call_type, method, args, kwargs)
+        return self._facade._execute(self._call_type, lambda call_kwargs: method(*args, **call_kwargs), kwargs,
+                                     hedge=not kwargs.get("stream"))
+
+
+class _StreamingResponseContext:
+    """Wraps client.<...>.with_streaming_response.create(...) so opening the stream gets deadlines, retries and the breaker."""
+
+    def __init__(self, facade, call_type, method, args, kwargs):
+        self._facade = facade
+        self._call_type = call_type
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+        self._context = None
+
+    def __enter__(self):
+        def attempt(call_kwargs):
+            context = self._method(*self._args, **call_kwargs)
+            response = context.__enter__()
+            self._context = context
+            return response
+        return self._facade._execute(self._call_type, attempt, self._kwargs, hedge=False)
+
+    def __exit__(self, exc_type, exc, traceback):
+        return self._context.__exit__(exc_type, exc, traceback) if self._context else False
+
+
+class ResilientOpenAI:
+    """
+    Facade over one pooled OpenAI client. Use for_call(call_type) to get an object with the client's interface
+    (chat.completions.create, audio.speech.create, audio.speech.with_streaming_response.create,
+    audio.transcriptions.create) whose calls follow that call type's deadline, retry, hedging and breaker policy.
+    """
+
+    def __init__(self, api_key, call_timeouts=OPENAI_CALL_TIMEOUTS, max_retries=OPENAI_MAX_RETRIES,
+                 hedge_call_types=OPENAI_HEDGE_CALL_TYPES, hedge_delay=OPENAI_HEDGE_DELAY, **client_options):
+        """
+        Args:
+            api_key (str): OpenAI API key (OPENAI_BASE_URL, if set, is honoured by the client).
+            call_timeouts (dict): {call type: total deadline in seconds, shared by attempts, backoff and hedges}.
+            max_retries (int): Retries per call after retryable failures, within its deadline.
+            hedge_call_types (iterable): Call types whose slow requests are hedged.
+            hedge_delay (float): Seconds without an answer before the hedge request is sent.
+            **client_options: Passed on to OpenAI() (e.g. base_url).
+        """
+        if httpx is not None and "http_client" not in client_options:
+            client_options["http_client"] = DefaultHttpxClient(
+                limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS),
+                timeout=httpx.Timeout(max(call_timeouts.values()), connect=OPENAI_CONNECT_TIMEOUT))
+        # Retries are done here (jittered, deadline-aware, counted by the breaker), not by the client.
+        self._client = OpenAI(api_key=api_key, max_retries=0, **client_options)
+        self.call_timeouts = dict(call_timeouts)
+        self.max_retries = max_retries
+        self.hedge_call_types = frozenset(hedge_call_types)
+        self.hedge_delay = hedge_delay
+        self.breakers = {call_type: CircuitBreaker(call_type) for call_type in self.call_timeouts}
+        self._hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="openai-hedge") if self.hedge_call_types else None
+        self._views = {call_type: _Resource(self, call_type, ()) for call_type in self.call_timeouts}
+        UPSTREAM_CIRCUIT_OPEN.set_function(
+            lambda: {(call_type,): int(breaker.state != CircuitBreaker.CLOSED) for call_type, breaker in self.breakers.items()})
+
+    def for_call(self, call_type):
+        """The client interface for one call type (a key of OPENAI_CALL_TIMEOUTS)."""
+        try:
+            return self._views[call_type]
+        except KeyError:
+            raise ValueError(f"Unknown OpenAI call type '{call_type}' (expected one of {sorted(self._views)})") from None
+
+    def stats(self):
+        return {"call_timeouts": self.call_timeouts, "max_retries": self.max_retries,
+                "hedged_call_types": sorted(self.hedge_call_types),
+                "circuits": {call_type: breaker.stats() for call_type, breaker in self.breakers.items()}}
+
+    def _timeout(self, seconds):
+        if httpx is not None:
+            return httpx.Timeout(seconds, connect=min(OPENAI_CONNECT_TIMEOUT, seconds))
+        return seconds
+
+    def _attempt_kwargs(self, call_type, kwargs, deadline):
+        """`kwargs` with what is left of `deadline` as the request timeout (unless the caller set one)."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(call_type, self.call_timeouts[call_type])
+        return kwargs if "timeout" in kwargs else dict(kwargs, timeout=self._timeout(remaining))
+
+    def _execute(self, call_type, attempt, kwargs, hedge=True):
+        """Runs attempt(kwargs with a timeout) under the call type's breaker, deadline, retries and hedging."""
+        breaker = self.breakers[call_type]
+        admitted = breaker.allow()
+        if not admitted:
+            UPSTREAM_SHORT_CIRCUITS.labels(call_type).inc()
+            raise CircuitOpenError(call_type, breaker.retry_in())
+        deadline = time.monotonic() + self.call_timeouts[call_type]
+        hedge = hedge and call_type in self.hedge_call_types
+        retry = 0
+        try:
+            while True:
+                try:
+                    if hedge:
+                        result = self._hedged(call_type, attempt, kwargs, deadline)
+                    else:
+                        result = attempt(self._attempt_kwargs(call_type, kwargs, deadline))
+                except Exception as e:
+                    reason = _retry_reason(e)
+                    if reason is None:
+                        if isinstance(e, APIStatusError):
+                            breaker.record_success() # The API answered; the request itself was rejected
+                        raise
+                    breaker.record_failure()
+                    delay = random.uniform(0, min(OPENAI_RETRY_MAX_DELAY, OPENAI_RETRY_BASE_DELAY * 2 ** retry))
+                    delay = max(delay, min(_retry_after(e) or 0.0, OPENAI_RETRY_MAX_DELAY))
+                    if (retry >= self.max_retries or breaker.state == CircuitBreaker.OPEN
+                            or deadline - time.monotonic() - delay < MIN_ATTEMPT_SECONDS):
+                        raise
+                    retry += 1
+                    UPSTREAM_RETRIES.labels(call_type, reason).inc()
+                    logger.info("Retrying OpenAI '%s' call in %.2fs (%s, retry %s/%s).", call_type, delay, reason, retry, self.max_retries)
+                    time.sleep(delay)
+                    continue
+                breaker.record_success()
+                return result
+        finally:
+            if admitted == CircuitBreaker.HALF_OPEN:
+                breaker.release_trial() # No-op once an outcome was recorded; frees the trial after any other exception
+
+    def _hedged(self, call_type, attempt, kwargs, deadline):
+        """
+        Sends the request; if it has not been answered after hedge_delay, sends it again. The first success wins.
+        Both requests share `deadline`; the backup is only sent if there is time left for it.
+        """
+        primary = self._hedge_executor.submit(contextvars.copy_context().run, attempt, self._attempt_kwargs(call_type, kwargs, deadline))
+        try:
+            return primary.result(timeout=max(0.0, min(self.hedge_delay, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            pass
+        pending = {primary}
+        backup = None
+        if deadline - time.monotonic() >= MIN_ATTEMPT_SECONDS:
+            backup = self._hedge_executor.submit(contextvars.copy_context().run, attempt, self._attempt_kwargs(call_type, kwargs, deadline))
+            pending.add(backup)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break # Deadline passed; the abandoned requests end on their own timeouts
+            for future in done:
+                if future.exception() is None:
+                    if backup is not None:
+                        UPSTREAM_HEDGES.labels(call_type, "won" if future is backup else "lost").inc()
+                    return future.result()
+                error = future.exception()
+        if backup is not None:
+            UPSTREAM_HEDGES.labels(call_type, "lost").inc()
+        if error is not None and not pending:
+            raise error
+        raise DeadlineExceededError(call_type, self.call_timeouts[call_type])
@@ -0,0 +1,270 @@
+# System prompt registry.
+# Every stage prompt depends only on (engine, stage, language, category, inline detection),
+# so all of them are rendered once at import. Per-turn state (fields collected/still needed)
+# is not written into them; it goes into a short system message placed after the conversation
+# history. The request is then [static prompt] + history + [dynamic context]: the static
+# prompt is byte-identical across turns and the history only grows at the end, so consecutive
+# requests of a conversation share a long prefix that provider-side prompt caching can reuse.
+
+from functools import lru_cache
+
+from .config_web import GRIEVANCE_CATEGORIES, CHAT_MODEL
+from .mappings_web import LANGUAGES
+from .structured_turn_web import TURN_OUTPUT_INSTRUCTIONS
+
+try:
+    import tiktoken # Optional: exact token counts when installed
+except ImportError:
+    tiktoken = None
+
+CATEGORY_GUIDELINES = """Category Guidelines:
+- **infrastructure**: Issues related to physical structures and facilities (e.g., bad roads, damaged public buildings, problems with *existing* water pipe quality/supply regularity, electricity outages due to faulty lines).
+- **corruption**: Issues involving bribery, misuse of public office or funds by officials.
+- **funds**: Problems related to government financial schemes, scholarships, grants (e.g., non-disbursal, application issues).
+- **government_service**: Issues with the *process* of obtaining or using a specific government service (e.g., problems applying for an Aadhar card, delays in passport issuance, disputes over utility bills if not a physical infrastructure failure, issues with a government office's responsiveness for a service).
+  - For **water-related issues**:
+    - If about quality, quantity, or timing/regularity of water from an *existing connection* (e.g., "dirty water", "no water supply", "water comes at wrong time"): Categorize as **infrastructure**.
+    - If about *applying for a new water connection, billing disputes, meter problems, or customer service interactions* regarding water: Categorize as **government_service** (with service_type: 'water_connection')."""
+
+CLASSIC_STAGES = ("understanding", "categorizing", "collecting", "confirming", "form_filling")
+# Stages the structured engine (TURN_ENGINE == "structured") produces; form_filling/submitted are shared.
+STRUCTURED_STAGES = ("understanding", "categorizing", "collecting")
+
+# --- Classic engine templates (reply text with control markers) ---
+
+_CLASSIC_TEMPLATES = {
+    "understanding": """{language_instruction}
+You are a highly skilled multilingual grievance assistant for citizens, set to respond in {language}.
+Your primary goal is to accurately understand the user's grievance and categorize it into one of the following: {categories}.
+
+{category_guidelines}
+
+Interaction Flow:
+1. Be empathetic and understanding.
+2. Ask clarifying questions ONLY if absolutely necessary to determine the category.
+3. Once you are reasonably sure of the category based on the guidelines, identify it.
+4. CRITICAL: At the end of your response where you identify the category, you MUST include the marker "GRIEVANCE_CATEGORY:[category_name_lowercase_underscored]". Example for {language}: "It sounds like an issue with the quality of water from your tap. GRIEVANCE_CATEGORY:infrastructure" or "It seems you are having trouble with your passport application. GRIEVANCE_CATEGORY:government_service".
+5. Do not offer to file the form or collect detailed data at this stage. Your focus is solely on understanding and categorizing the grievance.
+Remember to respond ONLY in {language}.
+""",
+    "categorizing": """{language_instruction}
+You are a helpful grievance assistant, responding in {language}.
+The system believes the user's issue is a '{category}' grievance.
+1. Confirm this category with the user in a natural way.
+2. Briefly explain that to file this type of complaint, you'll need to collect information like: {fields_readable}.
+3. Ask the user if they would like to proceed with providing these details for the '{category}' form.
+4. Respond ONLY with this confirmation and question. Do not ask for any data yet.
+Example (if {language} is English): "Okay, that sounds like an infrastructure problem. To file a report, I'll need details such as your address, a description of the issue, and its location. Would you like to proceed with this?"
+""",
+    "collecting": """{language_instruction}
+You are a helpful grievance assistant, responding in {language}, helping the user file a '{category}' grievance.
+Your task is to collect the remaining necessary information based on the user's latest message.
+Required fields for '{category}': {fields_readable}.
+The system's current understanding of the collected data is given in the CURRENT FORM STATE message after the conversation.
+
+Guidelines:
+1. Analyze the user's latest message. If it provides data for any *missing* fields (from "Fields the system thinks are still needed"), acknowledge it.
+2. Ask for the next one or two *missing* pieces of information conversationally.
+3. If no fields are still needed according to the CURRENT FORM STATE, all required data appears to be collected. In this case, end your response with the exact phrase "READY_TO_CONFIRM". This marker is CRITICAL. Do not ask for confirmation yourself, just use the marker.
+4. Keep responses concise and suitable for voice.
+Example for asking (if {language} is English): "Thanks for providing your name. Next, could you please tell me your email address?"
+Example when all data seems collected (if {language} is English): "Great, I think I have all the details. READY_TO_CONFIRM"
+""",
+    "confirming": """{language_instruction}
+You are an assistant helping a user confirm a specific detail for a '{category}' grievance, responding in {language}.
+Your last message in the conversation asked the user to clarify a specific point, and the user's latest message is their response.
+
+Your task is to interpret the user's latest message regarding that specific point:
+1. If the user's response clearly confirms the detail you asked about, then respond with ONLY the marker: "USER_CONFIRMED_FORM_DATA". (This implies the specific point is confirmed, allowing collection to continue).
+2. If the user's response indicates the detail is incorrect or they want to change it, then respond with ONLY the marker: "USER_WANTS_TO_UPDATE_DATA". (This implies the specific point needs re-collection).
+3. If the user's response is unclear, ask them again to clarify that specific point.
+
+IMPORTANT:
+- If you output a marker, that marker MUST be the ONLY content in your response.
+- If you are re-prompting, just provide the re-prompt text.
+""",
+    "form_filling": """{language_instruction}
+You are an assistant helping a user who is currently viewing a '{category}' form, responding in {language}.
+The user might ask questions about the form or indicate they have submitted it.
+1. If they ask a question, try to answer it based on general knowledge or ask them to refer to the form's labels.
+2. If they indicate they have submitted the form (e.g., "I submitted it", "I'm done"), acknowledge this.
+3. Keep responses brief and helpful.
+""",
+}
+
+_CLASSIC_FORM_STATE = """CURRENT FORM STATE:
+- Collected so far: {collected}
+- Fields the system thinks are still needed (prioritize these): {missing}"""
+
+# --- Structured engine templates (JSON turn, see structured_turn_web.py) ---
+
+_STRUCTURED_HEADER = """You are a highly skilled multilingual grievance assistant for citizens.
+LANGUAGE: Identify which of these languages the user's latest message is written in: {languages} (if it is unclear or too short to tell, use {language}). Write your reply entirely in that language. No other languages are permitted in the reply."""
+
+_STRUCTURED_FIELDS = """Required fields for '{category}' (follow each description's format and exact option values in "field_updates"):
+{field_lines}
+The fields collected so far and still needed are given in the CURRENT FORM STATE message after the conversation.
+In "field_updates", include every required field the user has given a value for anywhere in the conversation that is not collected yet, and any collected value the user has corrected."""
+
+_STRUCTURED_TEMPLATES = {
+    "understanding": """Your current goal is to accurately understand the user's grievance and categorize it into one of the following: {categories}.
+
+{category_guidelines}
+
+Interaction Flow:
+1. Be empathetic and understanding.
+2. Ask clarifying questions ONLY if absolutely necessary to determine the category.
+3. Once you are reasonably sure of the category based on the guidelines, set "category" to it, and in your reply tell the user what kind of grievance it sounds like and ask whether they would like to proceed with filing it.
+4. Do not collect detailed data at this stage: leave "field_updates" empty and "ready" false.""",
+    "categorizing": """The user's issue appears to be a '{category}' grievance, and you have asked whether they would like to proceed with filing it.
+1. If the user agrees (or simply starts giving details), set "category_confirmation" to "confirmed", and in your reply ask for the next one or two still-needed fields.
+2. If the user says it is a different problem, set "category_confirmation" to "rejected". If they describe the real problem and it fits another category, set "category" to it and ask whether they would like to proceed with that; otherwise set "category" to "none" and ask them to describe their issue again.
+3. Otherwise set "category_confirmation" to "unclear" and ask again whether they would like to proceed.
+
+{fields_block}""",
+    "collecting": """You are helping the user file a '{category}' grievance by collecting the remaining necessary information.
+
+{fields_block}
+
+Guidelines:
+1. If the user's latest message provides data for any field, report it in "field_updates" and briefly acknowledge it.
+2. Ask for the next one or two still-needed pieces of information conversationally.
+3. If nothing is still needed after your field_updates, set "ready" to true and just thank the user briefly; the system tells them what happens next. Do not ask for confirmation yourself.""",
+}
+
+_STRUCTURED_FORM_STATE = """CURRENT FORM STATE:
+- Collected so far: {collected}
+- Still needed: {missing}"""
+
+_PINNED_FORM_DATA = """FORM DATA COLLECTED SO FAR (keep your answers consistent with it): {collected}"""
+
+
+# --- Token counting ---
+
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.encoding_for_model(CHAT_MODEL)
+    except Exception: # Unknown model name or encoding files unavailable offline
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = None
+
+MESSAGE_TOKEN_OVERHEAD = 4 # Role and separators per chat message
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Token count of `text` for CHAT_MODEL (tiktoken when installed, otherwise estimated as chars / 4)."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+# --- Rendering (import time) ---
+
+def _classic_language_instruction(language, inline):
+    if not inline:
+        return language, (f"RESPONSE LANGUAGE DIRECTIVE: Your response MUST be entirely in {language}. No other languages are "
+                          f"permitted in your output. Adhere strictly to {language} for all text.")
+    # The model identifies the user's language itself, saving the separate detection round trip.
+    return "the user's language", (
+        f"RESPONSE LANGUAGE DIRECTIVE: Identify which of these languages the user's latest message is written in: {', '.join(LANGUAGES.keys())} "
+        f"(if it is unclear or too short to tell, use {language}). Begin your response with the marker \"USER_LANGUAGE:<language_name>\" "
+        f"and write everything after it entirely in that language. No other languages are permitted in your output."
+    )
+
+def _render_classic(stage, language, category, inline):
+    language_label, language_instruction = _classic_language_instruction(language, inline)
+    fields = GRIEVANCE_CATEGORIES.get(category, {}).get("required_fields", [])
+    return _CLASSIC_TEMPLATES[stage].format(
+        language_instruction=language_instruction, language=language_label, category=category,
+        categories=", ".join(GRIEVANCE_CATEGORIES.keys()), category_guidelines=CATEGORY_GUIDELINES,
+        fields_readable=", ".join(field.replace("_", " ") for field in fields),
+    )
+
+def _render_structured(stage, language, category):
+    fields_block = ""
+    if category:
+        category_details = GRIEVANCE_CATEGORIES[category]
+        field_descriptions = category_details.get("field_descriptions", {})
+        field_lines = "\n".join(f"- {field}: {field_descriptions.get(field, field.replace('_', ' '))}"
+                                for field in category_details.get("required_fields", []))
+        fields_block = _STRUCTURED_FIELDS.format(category=category, field_lines=field_lines)
+    header = _STRUCTURED_HEADER.format(languages=", ".join(LANGUAGES.keys()), language=language)
+    task = _STRUCTURED_TEMPLATES[stage].format(
+        category=category, categories=", ".join(GRIEVANCE_CATEGORIES.keys()),
+        category_guidelines=CATEGORY_GUIDELINES, fields_block=fields_block,
+    )
+    return f"{header}\n\n{task}\n\n{TURN_OUTPUT_INSTRUCTIONS}"
+
+def _compile_prompts():
+    """{(engine, stage, language, category, inline): (prompt text, token count)} for every combination."""
+    prompts = {}
+    for language in LANGUAGES:
+        for inline in (False, True):
+            for stage in CLASSIC_STAGES:
+                for category in ([None] if stage == "understanding" else GRIEVANCE_CATEGORIES):
+                    text = _render_classic(stage, language, category, inline)
+                    prompts[("classic", stage, language, category, inline)] = (text, count_tokens(text))
+        for stage in STRUCTURED_STAGES:
+            for category in ([None] if stage == "understanding" else GRIEVANCE_CATEGORIES):
+                text = _render_structured(stage, language, category)
+                prompts[("structured", stage, language, category, False)] = (text, count_tokens(text))
+    return prompts
+
+_PROMPTS = _compile_prompts()
+
+
+def get_static_prompt(stage, language, category=None, engine="classic", inline=False):
+    """
+    Returns the precompiled system prompt for a stage.
+
+    Args:
+        stage (str): Conversation stage.
+        language (str): Response language name (e.g., "hindi"); unknown names fall back to English.
+        category (str, optional): Grievance category; ignored for 'understanding'.
+        engine (str): "classic" or "structured" (TURN_ENGINE).
+        inline (bool): Classic engine with LANG_DETECTION_MODE == "inline".
+
+    Returns:
+        tuple: (prompt text, token count), or (None, 0) if the stage/category has no prompt.
+    """
+    language = language if language in LANGUAGES else "english"
+    key = (engine, stage, language, None if stage == "understanding" else category, inline and engine == "classic")
+    return _PROMPTS.get(key, (None, 0))
+
+def fallback_prompt(stage, language, inline=False):
+    """Generic prompt for stages without a template (rendered per call; only reached for unexpected stages)."""
+    language_label, language_instruction = _classic_language_instruction(language, inline)
+    return f"{language_instruction} You are a helpful assistant. Your current stage is {stage}. Please respond naturally in {language_label}."
+
+def form_state_context(collected, missing, engine="classic"):
+    """Per-turn CURRENT FORM STATE message text (collected and still-needed field summaries)."""
+    template = _STRUCTURED_FORM_STATE if engine == "structured" else _CLASSIC_FORM_STATE
+    return template.format(collected=collected, missing=missing)
+
+def pinned_form_data_context(form_data):
+    """Per-turn message pinning the collected form values (stages without a CURRENT FORM STATE)."""
+    collected = "; ".join(f"{field}: '{value}'" for field, value in form_data.items() if str(value).strip())
+    return _PINNED_FORM_DATA.format(collected=collected)
+
+def build_prompt_messages(static_prompt, history, dynamic_context=None, summary=None):
+    """
+    [static system prompt] + [summary of condensed history] + history + [dynamic system context].
+    The static part stays a stable prefix; the summary only changes when older messages are condensed.
+    """
+    messages = [{"role": "system", "content": static_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": summary})
+    messages.extend(history)
+    if dynamic_context:
+        messages.append({"role": "system", "content": dynamic_context})
+    return messages
+
+def prompt_token_report(static_tokens, history_tokens, dynamic_context=None):
+    """Returns (static, history, dynamic) prompt token counts for logging."""
+    dynamic_tokens = count_tokens(dynamic_context) + MESSAGE_TOKEN_OVERHEAD if dynamic_context else 0
+    return static_tokens + MESSAGE_TOKEN_OVERHEAD, history_tokens, dynamic_tokens
@@ -0,0 +1,381 @@
+# Bounded registry for per-session chatbot instances.
+# Holds WebChatbot objects keyed by session, evicting least-recently-used entries
+# when the entry or approximate memory cap is exceeded, and dropping sessions
+# that have been idle longer than the TTL (checked on access and by a sweeper thread).
+# Also provides the shared backends that hold serialized conversation state.
+
+import sys
+import logging
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_bot_size(bot):
+    """Rough memory footprint (bytes) of a chatbot's per-conversation state."""
+    size = sys.getsizeof(bot)
+    for message in getattr(bot, "conversation_history", []) or []:
+        size += sys.getsizeof(message.get("content", "")) + 64
+    for key, value in (getattr(bot, "form_data", {}) or {}).items():
+        size += sys.getsizeof(key) + sys.getsizeof(str(value))
+    return size
+
+
+class SessionRegistry:
+    def __init__(self, max_entries=1000, max_bytes=None, idle_ttl=1800, sweep_interval=60, size_estimator=estimate_bot_size):
+        """
+        Args:
+            max_entries (int): Maximum number of live sessions before LRU eviction.
+            max_bytes (int, optional): Approximate memory cap across all sessions (None disables).
+            idle_ttl (float): Seconds of inactivity after which a session is dropped (0 disables).
+            sweep_interval (float): Seconds between background TTL sweeps (0 disables the sweeper).
+            size_estimator (callable): Returns the approximate size in bytes of a stored value.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.size_estimator = size_estimator
+
+        self._entries = OrderedDict() # key -> [value, last_access, size]; oldest first
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions_lru = 0
+        self.evictions_ttl = 0
+
+        self._sweeper_thread = None
+        if self.idle_ttl and self.sweep_interval:
+            self._sweeper_thread = threading.Thread(target=self._sweep_loop, name="session-registry-sweeper", daemon=True)
+            self._sweeper_thread.start()
+
+    def get(self, key):
+        """Returns the stored value and marks it recently used, or None if absent/expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._is_expired(entry, time.monotonic()):
+                self._remove(key)
+                self.evictions_ttl += 1
+                self.misses += 1
+                return None
+            entry[1] = time.monotonic()
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Stores a value (replacing any existing one) and enforces the caps."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            size = self.size_estimator(value) if self.size_estimator else 0
+            self._entries[key] = [value, time.monotonic(), size]
+            self._total_bytes += size
+            self._enforce_limits()
+
+    def touch(self, key):
+        """Re-measures an entry after its value grew (e.g. a new conversation turn)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            new_size = self.size_estimator(entry[0]) if self.size_estimator else 0
+            self._total_bytes += new_size - entry[2]
+            entry[2] = new_size
+            entry[1] = time.monotonic()
+            self._entries.move_to_end(key)
+            self._enforce_limits()
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._remove(key)
+            return entry[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def sweep(self):
+        """Drops every idle-expired session. Returns the number removed."""
+        if not self.idle_ttl:
+            return 0
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            # Entries are ordered by last access, so expired ones are at the front.
+            for key, entry in list(self._entries.items()):
+                if not self._is_expired(entry, now):
+                    break
+                self._remove(key)
+                removed += 1
+            self.evictions_ttl += removed
+        if removed:
+            logger.info("Session sweeper evicted %s idle session(s).", removed)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "approx_bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions_lru": self.evictions_lru,
+                "evictions_ttl": self.evictions_ttl,
+            }
+
+    def close(self):
+        self._stop_event.set()
+
+    def _is_expired(self, entry, now):
+        return bool(self.idle_ttl) and now - entry[1] > self.idle_ttl
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry[2]
+
+    def _enforce_limits(self):
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries) or
+            (self.max_bytes and self._total_bytes > self.max_bytes and len(self._entries) > 1)
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions_lru += 1
+
+    def _sweep_loop(self):
+        while not self._stop_event.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("Error during session sweep: %s", e)
+
+
+class BotPool:
+    """Keeps a few ready-made chatbot instances so new visitors don't pay construction cost."""
+
+    def __init__(self, factory, size=4):
+        """
+        Args:
+            factory (callable): Creates a new chatbot instance.
+            size (int): Number of idle instances kept ready (0 disables pooling).
+        """
+        self.factory = factory
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self.served_from_pool = 0
+        self.created_on_demand = 0
+        if self.size:
+            self._refill_needed.set()
+            threading.Thread(target=self._refill_loop, name="bot-pool-refill", daemon=True).start()
+
+    def acquire(self):
+        """Returns a pre-initialized instance, or a freshly created one if the pool is empty."""
+        with self._lock:
+            bot = self._idle.pop() if self._idle else None
+            if bot is not None:
+                self.served_from_pool += 1
+            else:
+                self.created_on_demand += 1
+        if self.size:
+            self._refill_needed.set()
+        return bot if bot is not None else self.factory()
+
+    def stats(self):
+        with self._lock:
+            return {"idle": len(self._idle), "size": self.size,
+                    "served_from_pool": self.served_from_pool, "created_on_demand": self.created_on_demand}
+
+    def _refill_loop(self):
+        while True:
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            while True:
+                with self._lock:
+                    if len(self._idle) >= self.size:
+                        break
+                try:
+                    bot = self.factory()
+                except Exception as e:
+                    logger.error("Error pre-initializing pooled chatbot: %s", e)
+                    break
+                with self._lock:
+                    self._idle.append(bot)
+
+
+# --- Shared session backends ---
+# Store packed ConversationState snapshots so any worker can serve any turn.
+# Each chat turn costs one load() before and one save() after. Short-lived entries
+# (stream tokens, TTS job statuses) are saved with a ttl and purged once it passes.
+
+class MemorySessionBackend:
+    """
+    Process-local backend; only suitable for a single worker or for development. Bounded like SessionRegistry:
+    snapshots idle longer than idle_ttl are dropped, and the least recently saved go beyond max_entries.
+    """
+
+    def __init__(self, idle_ttl=1800, max_entries=None, purge_every=500):
+        """
+        Args:
+            idle_ttl (float): Snapshots untouched for this many seconds are dropped (0 disables).
+            max_entries (int, optional): Keep at most this many snapshots, evicting the least recently saved.
+            purge_every (int): Run an opportunistic purge after this many saves.
+        """
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._data = OrderedDict() # key -> (blob, updated_at, expires_at or None), least recently saved first
+        self._lock = threading.Lock()
+        self._saves_since_purge = 0
+
+    def load(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            now = time.time()
+            if (self.idle_ttl and now - entry[1] > self.idle_ttl) or (entry[2] is not None and now >= entry[2]):
+                del self._data[key]
+                return None
+            return entry[0]
+
+    def save(self, key, blob, ttl=None):
+        """Stores `blob`; with `ttl`, it expires (and is purged) that many seconds from now."""
+        with self._lock:
+            now = time.time()
+            self._data[key] = (blob, now, now + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while self.max_entries and len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            self._saves_since_purge += 1
+            purge_due = self.idle_ttl and self.purge_every and self._saves_since_purge >= self.purge_every
+            if purge_due:
+                self._saves_since_purge = 0
+        if purge_due:
+            self.purge(self.idle_ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def purge(self, idle_seconds):
+        """Deletes snapshots idle for longer than `idle_seconds` or past their expiry. Returns the number removed."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, updated_at, expires_at) in self._data.items()
+                       if updated_at < now - idle_seconds or (expires_at is not None and now >= expires_at)]
+            for key in expired:
+                del self._data[key]
+        if expired:
+            logger.info("Purged %s idle session snapshot(s) from memory.", len(expired))
+        return len(expired)
+
+
+class SQLiteSessionBackend:
+    """Shared-file backend: one SQLite database (WAL mode) used by every worker on the host or shared volume."""
+
+    def __init__(self, db_path, idle_ttl=1800, purge_every=500):
+        """
+        Args:
+            db_path (str): Path of the SQLite database file shared by all workers.
+            idle_ttl (float): Snapshots untouched for this many seconds are purged (0 disables).
+            purge_every (int): Run an opportunistic purge after this many saves.
+        """
+        self.db_path = db_path
+        self.idle_ttl = idle_ttl
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._saves_since_purge = 0
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL, expires_at REAL)")
+        if "expires_at" not in [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]:
+            conn.execute("ALTER TABLE sessions ADD COLUMN expires_at REAL") # Databases created before per-key expiry
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, key):
+        row = self._connection().execute("SELECT data, expires_at FROM sessions WHERE key = ?", (key,)).fetchone()
+        if row and row[1] is not None and time.time() >= row[1]:
+            self.delete(key)
+            return None
+        return bytes(row[0]) if row else None
+
+    def save(self, key, blob, ttl=None):
+        """Stores `blob`; with `ttl`, it expires (and is purged) that many seconds from now."""
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO sessions (key, data, updated_at, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+            (key, blob, now, now + ttl if ttl else None)
+        )
+        self._saves_since_purge += 1
+        if self.idle_ttl and self.purge_every and self._saves_since_purge >= self.purge_every:
+            self._saves_since_purge = 0
+            self.purge(self.idle_ttl)
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def purge(self, idle_seconds):
+        """Deletes snapshots idle for longer than `idle_seconds` or past their expiry. Returns the number removed."""
+        now = time.time()
+        cursor = self._connection().execute("DELETE FROM sessions WHERE updated_at < ? OR expires_at <= ?", (now - idle_seconds, now))
+        if cursor.rowcount:
+            logger.info("Purged %s idle session snapshot(s) from %s.", cursor.rowcount, self.db_path)
+        return cursor.rowcount
+
+
+SESSION_BACKENDS = {
+    "memory": MemorySessionBackend,
+    "sqlite": SQLiteSessionBackend,
+}
+
+def create_session_backend(kind, db_path=None, idle_ttl=1800, max_entries=None):
+    """
+    Builds a backend by name ("sqlite", "memory"). Returns None for "none" (per-process sessions only).
+
+    Args:
+        kind (str): Backend name.
+        db_path (str, optional): SQLite database file ("sqlite" only).
+        idle_ttl (float): Seconds after which an untouched snapshot is dropped.
+        max_entries (int, optional): Snapshot cap ("memory" only; least recently saved are evicted).
+    """
+    if not kind or kind.lower() == "none":
+        return None
+    backend_cls = SESSION_BACKENDS.get(kind.lower())
+    if backend_cls is None:
+        raise ValueError(f"Unknown session backend '{kind}'. Choose from: {', '.join(SESSION_BACKENDS)}, none")
+    if backend_cls is MemorySessionBackend:
+        return backend_cls(idle_ttl=idle_ttl, max_entries=max_entries)
+    return backend_cls(db_path, idle_ttl=idle_ttl)
@@ -0,0 +1,79 @@
+# Per-conversation state for WebChatbot, kept separate from the bot object so it
+# can be snapshotted into a session backend and restored by any worker process.
+
+import json
+
+from .history_web import ConversationMemory
+
+try:
+    import msgpack # Optional: smaller and faster snapshots when installed
+except ImportError:
+    msgpack = None
+
+STATE_FORMAT_VERSION = 2 # 2 added the history summary; version 1 snapshots are still read
+
+# Snapshots are tagged with their encoding so workers with and without msgpack can read each other's data.
+_MSGPACK_TAG = b"M"
+_JSON_TAG = b"J"
+
+# Roles are stored as single characters to keep snapshots small.
+_ROLE_TO_CODE = {"user": "u", "assistant": "a", "system": "s"}
+_CODE_TO_ROLE = {code: role for role, code in _ROLE_TO_CODE.items()}
+
+
+class ConversationState:
+    __slots__ = ("default_language", "language_code", "conversation_stage", "grievance_category",
+                 "form_data", "conversation_history")
+
+    def __init__(self, default_language="english", language_code="en"):
+        self.default_language = default_language
+        self.language_code = language_code
+        self.conversation_stage = "understanding"
+        self.grievance_category = None
+        self.form_data = {}
+        self.conversation_history = ConversationMemory()
+
+    def to_record(self):
+        """Compact positional record (msgpack-style array) of the state."""
+        return [
+            STATE_FORMAT_VERSION,
+            self.default_language,
+            self.language_code,
+            self.conversation_stage,
+            self.grievance_category,
+            self.form_data,
+            [[_ROLE_TO_CODE.get(msg["role"], msg["role"]), msg["content"]] for msg in self.conversation_history],
+            self.conversation_history.summary_lines,
+        ]
+
+    @classmethod
+    def from_record(cls, record):
+        version = record[0]
+        if version not in (1, STATE_FORMAT_VERSION):
+            raise ValueError(f"Unsupported conversation state version: {version}")
+        state = cls(default_language=record[1], language_code=record[2])
+        state.conversation_stage = record[3]
+        state.grievance_category = record[4]
+        state.form_data = dict(record[5] or {})
+        state.conversation_history = ConversationMemory(
+            ({"role": _CODE_TO_ROLE.get(role, role), "content": content} for role, content in record[6]),
+            summary_lines=record[7] if version >= 2 else ())
+        return state
+
+    def pack(self):
+        """Serializes the state to bytes for a session backend."""
+        record = self.to_record()
+        if msgpack:
+            return _MSGPACK_TAG + msgpack.packb(record, use_bin_type=True)
+        return _JSON_TAG + json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def unpack(cls, blob):
+        tag, payload = blob[:1], blob[1:]
+        if tag == _MSGPACK_TAG:
+            if not msgpack:
+                raise ValueError("Session snapshot was written with msgpack, which is not installed in this worker.")
+            return cls.from_record(msgpack.unpackb(payload, raw=False))
+        if tag == _JSON_TAG:
+            return cls.from_record(json.loads(payload.decode("utf-8")))
+        raise ValueError(f"Unknown conversation state encoding tag: {tag!r}")
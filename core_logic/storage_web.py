@@ -0,0 +1,348 @@
+# Append-only storage for submitted grievance forms.
+# Replaces the old "load the whole grievances.json array, append, rewrite" cycle
+# with a segmented JSON-lines log. Writers hand records to a single background
+# thread which batches them into one write + fsync (group commit), so submit
+# latency does not depend on how many grievances are already archived.
+
+import os
+import logging
+import re
+import json
+import gzip
+import time
+import threading
+
+try:
+    import fcntl # POSIX only; used to serialize appends across worker processes
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{8})\.jsonl(\.gz)?$")
+MIGRATION_SEGMENT_NUMBER = 0 # Segment 0 is reserved for records migrated from the legacy array file
+
+
+class GrievanceStore:
+    def __init__(self, base_dir, legacy_file_name="grievances.json", segment_max_bytes=16 * 1024 * 1024,
+                 group_commit_interval=0.005, group_commit_max_batch=256, compaction_interval=600,
+                 compress_after_segments=2):
+        """
+        Args:
+            base_dir (str): Directory holding the log (e.g. "<app>/submissions").
+            legacy_file_name (str): Old JSON-array file, copied into segment 0 by migrate_legacy_file().
+            segment_max_bytes (int): Active segment is rotated once it grows past this size.
+            group_commit_interval (float): Seconds the writer waits to gather a batch before fsync.
+            group_commit_max_batch (int): Upper bound on records written per fsync.
+            compaction_interval (float): Seconds between background compaction passes (0 disables).
+            compress_after_segments (int): Sealed segments older than the newest N are gzip-compacted.
+        """
+        self.base_dir = base_dir
+        self.log_dir = os.path.join(base_dir, "grievance_log")
+        self.legacy_file_path = os.path.join(base_dir, legacy_file_name)
+        self.segment_max_bytes = segment_max_bytes
+        self.group_commit_interval = group_commit_interval
+        self.group_commit_max_batch = group_commit_max_batch
+        self.compaction_interval = compaction_interval
+        self.compress_after_segments = compress_after_segments
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._lock_file_path = os.path.join(self.log_dir, ".lock")
+
+        self._pending = [] # list of (encoded_line, _PendingWrite)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stop_compaction = threading.Event()
+        self._active_fh = None
+        self._active_path = None
+
+        with self._process_lock():
+            self._repair_tail()
+
+        self._writer_thread = threading.Thread(target=self._writer_loop, name="grievance-store-writer", daemon=True)
+        self._writer_thread.start()
+        self._compactor_thread = None
+        if self.compaction_interval:
+            self._compactor_thread = threading.Thread(target=self._compaction_loop, name="grievance-store-compactor", daemon=True)
+            self._compactor_thread.start()
+
+    # --- Public API ---
+    def append(self, record, timeout=10.0):
+        """Appends one record and blocks until it is durable on disk (fsync'd)."""
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if b"\n" in line[:-1]:
+            raise ValueError("Encoded grievance record must not contain raw newlines.")
+        pending = _PendingWrite()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GrievanceStore is closed.")
+            self._pending.append((line, pending))
+            self._cond.notify()
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for grievance record to be committed.")
+        if pending.error:
+            raise pending.error
+
+    def iter_records(self):
+        """Yields every stored record in submission order (migrated records first)."""
+        for number, path in self._segment_entries():
+            try:
+                f = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+            except FileNotFoundError:
+                # A concurrent compact() replaced the plain segment with its .gz since we listed it.
+                f = gzip.open(self._segment_path(number, compressed=True), "rb")
+            with f:
+                for raw_line in f:
+                    if not raw_line.endswith(b"\n"):
+                        continue # Partially written tail; never acknowledged to a client
+                    try:
+                        yield json.loads(raw_line)
+                    except json.JSONDecodeError:
+                        continue
+
+    def count(self):
+        return sum(1 for _ in self.iter_records())
+
+    def close(self):
+        """Flushes pending writes and stops background threads."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._stop_compaction.set()
+        self._writer_thread.join(timeout=5)
+        if self._compactor_thread:
+            self._compactor_thread.join(timeout=5)
+        if self._active_fh:
+            self._active_fh.close()
+            self._active_fh = None
+
+    # --- Segment bookkeeping ---
+    def _segment_entries(self):
+        """Returns sorted (number, path) for all segments, preferring the plain file if both forms exist."""
+        entries = {}
+        for name in os.listdir(self.log_dir):
+            match = SEGMENT_PATTERN.match(name)
+            if not match:
+                continue
+            number = int(match.group(1))
+            path = os.path.join(self.log_dir, name)
+            if number not in entries or not match.group(2):
+                entries[number] = path
+        return sorted(entries.items())
+
+    def _segment_path(self, number, compressed=False):
+        return os.path.join(self.log_dir, f"segment-{number:08d}.jsonl" + (".gz" if compressed else ""))
+
+    def _latest_segment_number(self):
+        entries = self._segment_entries()
+        return entries[-1][0] if entries else None
+
+    def _process_lock(self):
+        return _FileLock(self._lock_file_path)
+
+    def migrate_legacy_file(self, legacy_file_path=None):
+        """
+        Copies the legacy JSON array into segment 0, once. The legacy file is left in place; remove it
+        by hand after checking the migrated records. Not run on construction: call it from a startup
+        step (python app.py, flask --app app migrate-grievances).
+
+        Args:
+            legacy_file_path (str): Legacy file to read instead of <base_dir>/<legacy_file_name>.
+
+        Returns:
+            int: Number of records migrated (0 if there was nothing to do).
+        """
+        legacy_file_path = legacy_file_path or self.legacy_file_path
+        if not os.path.exists(legacy_file_path):
+            return 0
+        migrated_path = self._segment_path(MIGRATION_SEGMENT_NUMBER)
+        with self._process_lock():
+            if os.path.exists(migrated_path) or os.path.exists(migrated_path + ".gz"):
+                return 0
+            try:
+                with open(legacy_file_path, "r", encoding="utf-8") as f:
+                    legacy_records = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning("Could not read legacy grievance file %s: %s. Skipping migration.", legacy_file_path, e)
+                return 0
+            if not isinstance(legacy_records, list):
+                legacy_records = [legacy_records]
+            tmp_path = migrated_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                for record in legacy_records:
+                    f.write((json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, migrated_path)
+            _fsync_dir(self.log_dir)
+        logger.info("Migrated %s grievances from %s into %s (legacy file kept)", len(legacy_records), legacy_file_path, migrated_path)
+        return len(legacy_records)
+
+    # --- Startup: tail repair ---
+
+    def _repair_tail(self):
+        """Truncates a torn last line left behind by a crash mid-write in the newest plain segment."""
+        latest = self._latest_segment_number()
+        if latest is None:
+            return
+        path = self._segment_path(latest)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as f:
+            data = f.read()
+            valid_length = len(data)
+            if data and not data.endswith(b"\n"):
+                valid_length = data.rfind(b"\n") + 1
+            # The last complete line must also parse; a crash can leave garbage ending in "\n" on some filesystems.
+            while valid_length > 0:
+                line_start = data.rfind(b"\n", 0, valid_length - 1) + 1
+                try:
+                    json.loads(data[line_start:valid_length])
+                    break
+                except json.JSONDecodeError:
+                    valid_length = line_start
+            if valid_length != len(data):
+                logger.warning("Truncating %s bytes of torn tail from %s", len(data) - valid_length, path)
+                f.truncate(valid_length)
+                f.flush()
+                os.fsync(f.fileno())
+
+    # --- Writer (group commit) ---
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+            # Give concurrent submitters a moment to join this batch.
+            if self.group_commit_interval:
+                time.sleep(self.group_commit_interval)
+            with self._cond:
+                batch = self._pending[:self.group_commit_max_batch]
+                del self._pending[:len(batch)]
+            error = None
+            try:
+                self._write_batch(b"".join(line for line, _ in batch))
+            except Exception as e:
+                logger.error("Error committing %s grievance record(s): %s", len(batch), e)
+                error = e
+            for _, pending in batch:
+                pending.error = error
+                pending.done.set()
+
+    def _write_batch(self, payload):
+        with self._process_lock():
+            fh = self._open_active_segment()
+            fh.write(payload)
+            fh.flush()
+            os.fsync(fh.fileno())
+            if fh.tell() >= self.segment_max_bytes:
+                self._rotate()
+
+    def _open_active_segment(self):
+        """Returns a handle on the newest segment, reopening if another process rotated it."""
+        latest = self._latest_segment_number()
+        if latest is None or latest == MIGRATION_SEGMENT_NUMBER or not os.path.exists(self._segment_path(latest)):
+            latest = (latest or 0) + 1
+        path = self._segment_path(latest)
+        if self._active_path != path or self._active_fh is None:
+            if self._active_fh:
+                self._active_fh.close()
+            self._active_fh = open(path, "ab")
+            self._active_path = path
+            if self._active_fh.tell() == 0:
+                _fsync_dir(self.log_dir)
+        return self._active_fh
+
+    def _rotate(self):
+        """Seals the active segment by creating the next (empty) one. Caller holds the process lock."""
+        current = self._latest_segment_number()
+        next_path = self._segment_path(current + 1)
+        with open(next_path, "ab"):
+            pass
+        _fsync_dir(self.log_dir)
+        if self._active_fh:
+            self._active_fh.close()
+        self._active_fh = None
+        self._active_path = None
+        logger.info("Rotated grievance log; new active segment %s", next_path)
+
+    # --- Background compaction ---
+    def _compaction_loop(self):
+        while not self._stop_compaction.wait(self.compaction_interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error("Error during grievance log compaction: %s", e)
+
+    def compact(self):
+        """Gzips sealed segments, keeping the newest `compress_after_segments` plain for cheap reads."""
+        with self._process_lock():
+            entries = self._segment_entries()
+            latest = entries[-1][0] if entries else None
+            sealed = [(number, path) for number, path in entries if number != latest and not path.endswith(".gz")]
+            candidates = sealed[:max(0, len(sealed) - self.compress_after_segments)]
+        reclaimed = 0
+        for number, path in candidates:
+            gz_path = self._segment_path(number, compressed=True)
+            tmp_path = f"{gz_path}.{os.getpid()}.tmp"
+            try:
+                with open(path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+                    for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                        dst.write(chunk)
+                with open(tmp_path, "rb") as f:
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, gz_path)
+                _fsync_dir(self.log_dir)
+                reclaimed += os.path.getsize(path) - os.path.getsize(gz_path)
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker compacted this segment first.
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        if candidates:
+            logger.info("Compacted %s grievance segment(s), reclaimed %s bytes.", len(candidates), reclaimed)
+        return len(candidates)
+
+
+class _PendingWrite:
+    __slots__ = ("done", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class _FileLock:
+    """Exclusive advisory lock on a file, shared by all processes using the same log directory."""
+    _thread_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl:
+            self._fh = open(self.path, "a")
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._fh:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+        self._thread_lock.release()
+
+
+def _fsync_dir(path):
+    """Makes directory entry changes (create/rename) durable where the platform allows it."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
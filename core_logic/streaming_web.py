@@ -0,0 +1,221 @@
+# Helpers for streaming chat replies to the browser as the LLM generates them.
+# The model's raw output contains control markers (GRIEVANCE_CATEGORY:..., READY_TO_CONFIRM,
+# ...) that the turn logic consumes once the reply is complete; MarkerFilter keeps them
+# out of the streamed text without waiting for the whole reply. SentenceSplitter cuts the
+# streamed text into sentences so each can be sent to TTS while the rest is generated.
+# JsonFieldStreamer plays MarkerFilter's role for structured (JSON) replies: it decodes
+# one string field of the JSON object while the rest of the object is still being generated.
+
+import re
+import json
+
+# Markers the stage prompts ask the model to emit. They are expected at the end of a reply,
+# so everything from the first marker onwards is withheld from the stream.
+CONTROL_MARKERS = ("GRIEVANCE_CATEGORY:", "READY_TO_CONFIRM", "USER_CONFIRMED_FORM_DATA", "USER_WANTS_TO_UPDATE_DATA")
+
+# Prefix requested from the model in inline language detection mode ("USER_LANGUAGE: hindi").
+INLINE_LANGUAGE_PREFIX = "USER_LANGUAGE:"
+_LANGUAGE_NAME_PATTERN = re.compile(r"\s*[A-Za-z]+\s*")
+
+# Sentence ends for all supported scripts: Latin/Tamil/Kannada punctuation and the Devanagari
+# danda/double danda, optionally followed by closing quotes or brackets. The terminator only counts
+# once whitespace follows it, so "3.5" or a reply cut mid-stream is not split. Newlines also end a sentence.
+_SENTENCE_END_PATTERN = re.compile(r"[.!?।॥]+[\"'”’)\]]*(?=\s)|\n+")
+
+
+class MarkerFilter:
+    """
+    Incrementally forwards streamed reply text while withholding control markers.
+
+    Text that could still turn out to be the start of a marker (e.g. a trailing "READY_")
+    is held back until the next delta decides it, as is trailing whitespace, so the
+    forwarded text is always a prefix of the stripped, marker-free reply.
+    """
+
+    def __init__(self, markers=CONTROL_MARKERS, strip_language_prefix=False):
+        """
+        Args:
+            markers (iterable): Control markers to withhold.
+            strip_language_prefix (bool): Also drop a leading "USER_LANGUAGE: <name>" (inline detection mode).
+        """
+        self.markers = tuple(markers)
+        self._buffer = ""
+        self._awaiting_prefix = strip_language_prefix
+        self._started = False # Leading whitespace is never forwarded
+        self._suppressed = False # A marker was seen; nothing more is forwarded
+        self.language_name = None # Language reported in the stripped prefix, once known
+
+    def feed(self, delta):
+        """Adds a streamed delta and returns the text that is safe to display now (may be empty)."""
+        if self._suppressed or not delta:
+            return ""
+        self._buffer += delta
+        if self._awaiting_prefix and not self._consume_language_prefix():
+            return ""
+        return self._release(final=False)
+
+    def flush(self):
+        """Call when the stream ends; returns whatever was still held back and is not a marker."""
+        if self._suppressed:
+            return ""
+        if self._awaiting_prefix:
+            self._buffer = "" # The reply ended inside (or right after) the language prefix
+            self._awaiting_prefix = False
+        return self._release(final=True)
+
+    def _consume_language_prefix(self):
+        """Returns True once the leading language prefix has been stripped or ruled out."""
+        stripped = self._buffer.lstrip()
+        head = stripped[:len(INLINE_LANGUAGE_PREFIX)].upper()
+        if not INLINE_LANGUAGE_PREFIX.startswith(head):
+            self._awaiting_prefix = False # Not a prefix after all
+            return True
+        if len(stripped) <= len(INLINE_LANGUAGE_PREFIX):
+            return False
+        rest = stripped[len(INLINE_LANGUAGE_PREFIX):]
+        name_match = _LANGUAGE_NAME_PATTERN.match(rest)
+        if name_match and name_match.end() < len(rest):
+            self.language_name = name_match.group(0).strip().lower()
+            self._buffer = rest[name_match.end():]
+            self._awaiting_prefix = False
+            return True
+        return False # Language name (or the whitespace after it) may still be arriving
+
+    def _release(self, final):
+        text = self._buffer if self._started else self._buffer.lstrip()
+        marker_positions = [text.find(marker) for marker in self.markers if marker in text]
+        if marker_positions:
+            self._suppressed = True
+            forwarded, held = text[:min(marker_positions)].rstrip(), ""
+        elif final:
+            forwarded, held = text.rstrip(), ""
+        else:
+            partial = self._partial_marker_length(text)
+            forwarded = text[:len(text) - partial].rstrip()
+            held = text[len(forwarded):]
+        self._buffer = held
+        if forwarded:
+            self._started = True
+        return forwarded
+
+    def _partial_marker_length(self, text):
+        """Length of the longest suffix of `text` that is a proper prefix of some marker."""
+        longest = max(len(marker) for marker in self.markers) - 1
+        for length in range(min(longest, len(text)), 0, -1):
+            suffix = text[-length:]
+            if any(marker.startswith(suffix) for marker in self.markers):
+                return length
+        return 0
+
+
+class SentenceSplitter:
+    """
+    Accumulates streamed reply text and returns complete sentences as soon as they end.
+    Sentences shorter than `min_chars` are merged with the following one, so short
+    fragments ("Okay.") don't each cost a TTS request.
+    """
+
+    def __init__(self, min_chars=24):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """Adds streamed text; returns the list of sentences completed by it (possibly empty)."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END_PATTERN.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()].strip()
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Returns the unfinished tail (as a one-item list) when the reply is complete."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return [remainder] if remainder else []
+
+
+class JsonFieldStreamer:
+    """
+    Incrementally decodes a streamed JSON object and returns the value of one top-level
+    string field as it is generated (e.g. the "reply" of a structured turn).
+
+    Other top-level string fields are collected in `values` once complete, so a field the
+    model generates earlier (such as "language") is known before the streamed one starts.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.values = {} # Completed top-level string fields
+        self._depth = 0
+        self._in_string = False
+        self._string_is_key = False
+        self._string_parts = []
+        self._escape = None # Escape sequence being read ("\\", "\\u00", ...)
+        self._high_surrogate = ""
+        self._last_key = None
+        self._expecting_value = False
+
+    def feed(self, delta):
+        """Adds a raw JSON delta; returns the newly decoded text of the streamed field (may be empty)."""
+        forwarded = []
+        for char in delta:
+            if self._in_string:
+                decoded = self._consume_string_char(char)
+                if decoded and self._depth == 1 and not self._string_is_key and self._last_key == self.field:
+                    forwarded.append(decoded)
+            elif char == '"':
+                self._in_string = True
+                self._string_is_key = self._depth == 1 and not self._expecting_value
+                self._string_parts = []
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+            elif char == ":" and self._depth == 1:
+                self._expecting_value = True
+            elif char == "," and self._depth == 1:
+                self._expecting_value = False
+        return "".join(forwarded)
+
+    def _consume_string_char(self, char):
+        """Reads one character inside a JSON string; returns the text it completes (may be empty)."""
+        if self._escape is not None:
+            self._escape += char
+            if self._escape.startswith("\\u"):
+                if len(self._escape) < 6:
+                    return ""
+                decoded = chr(int(self._escape[2:], 16))
+            else:
+                decoded = json.loads(f'"{self._escape}"')
+            self._escape = None
+            if "\ud800" <= decoded <= "\udbff":
+                self._high_surrogate = decoded # Wait for the low half of the pair
+                return ""
+            if self._high_surrogate:
+                decoded = (self._high_surrogate + decoded).encode("utf-16", "surrogatepass").decode("utf-16")
+                self._high_surrogate = ""
+        elif char == "\\":
+            self._escape = char
+            return ""
+        elif char == '"':
+            self._end_string()
+            return ""
+        else:
+            decoded = char
+        self._string_parts.append(decoded)
+        return decoded
+
+    def _end_string(self):
+        self._in_string = False
+        if self._depth != 1:
+            return
+        text = "".join(self._string_parts)
+        if self._string_is_key:
+            self._last_key = text
+        else:
+            self.values[self._last_key] = text
@@ -0,0 +1,99 @@
+# Response schema and parsing for the structured turn engine (TURN_ENGINE == "structured").
+# Instead of a language detection call, a free-text reply scanned for GRIEVANCE_CATEGORY:/READY_TO_CONFIRM
+# markers and separate extraction calls, one chat completion returns a JSON object holding the user's
+# language, the category decision, field updates, a readiness flag and the reply to speak.
+
+import re
+import json
+
+from .config_web import GRIEVANCE_CATEGORIES
+from .mappings_web import LANGUAGES
+
+NO_CATEGORY = "none"
+CATEGORY_CONFIRMATIONS = ("confirmed", "rejected", "unclear")
+
+# Every field of every category; field_updates entries may name any of them.
+ALL_FORM_FIELDS = sorted({field for info in GRIEVANCE_CATEGORIES.values() for field in info.get("required_fields", [])})
+
+# Properties are generated in this order, so "language" is known before the reply starts streaming
+# and the reply is written after the model has decided on the category and field values.
+TURN_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "grievance_turn",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "language": {"type": "string", "enum": list(LANGUAGES.keys())},
+                "category": {"type": "string", "enum": list(GRIEVANCE_CATEGORIES.keys()) + [NO_CATEGORY]},
+                "category_confirmation": {"type": "string", "enum": list(CATEGORY_CONFIRMATIONS)},
+                "field_updates": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "field": {"type": "string", "enum": ALL_FORM_FIELDS},
+                            "value": {"type": "string"},
+                        },
+                        "required": ["field", "value"],
+                        "additionalProperties": False,
+                    },
+                },
+                "ready": {"type": "boolean"},
+                "reply": {"type": "string"},
+            },
+            "required": ["language", "category", "category_confirmation", "field_updates", "ready", "reply"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+TURN_OUTPUT_INSTRUCTIONS = f"""OUTPUT FORMAT: Respond with ONLY a JSON object with these keys:
+- "language": the language of the user's latest message (one of {', '.join(LANGUAGES.keys())}).
+- "category": the grievance category you have identified ({', '.join(GRIEVANCE_CATEGORIES.keys())}), or "{NO_CATEGORY}" if it is not clear yet.
+- "category_confirmation": "confirmed" if the user agrees to proceed with the proposed category (or simply starts giving details), "rejected" if they say it is a different problem, otherwise "unclear".
+- "field_updates": a list of {{"field", "value"}} objects for form values the user has provided or corrected. Leave it empty if there are none.
+- "ready": true only when, after your field_updates, no required field is still missing.
+- "reply": what you say to the user, written entirely in "language". Keep it concise and suitable for voice."""
+
+
+def parse_turn_result(json_text):
+    """
+    Parses and validates the JSON object returned by a structured turn.
+
+    Args:
+        json_text (str): Raw model output.
+
+    Returns:
+        dict or None: {"language", "category", "category_confirmation", "field_updates" ({field: value}),
+        "ready", "reply"} with invalid entries replaced by None/defaults, or None if no usable reply was found.
+    """
+    try:
+        result = json.loads(json_text)
+    except json.JSONDecodeError:
+        match = re.search(r"\{[\s\S]*\}", json_text or "")
+        if not match:
+            return None
+        try:
+            result = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(result, dict) or not str(result.get("reply", "")).strip():
+        return None
+
+    field_updates = {}
+    for update in result.get("field_updates") or []:
+        if isinstance(update, dict) and update.get("field") in ALL_FORM_FIELDS and str(update.get("value", "")).strip():
+            field_updates[update["field"]] = str(update["value"]).strip()
+    language = str(result.get("language", "")).lower()
+    category = str(result.get("category", "")).lower()
+    confirmation = str(result.get("category_confirmation", "")).lower()
+    return {
+        "language": language if language in LANGUAGES else None,
+        "category": category if category in GRIEVANCE_CATEGORIES else None,
+        "category_confirmation": confirmation if confirmation in CATEGORY_CONFIRMATIONS else "unclear",
+        "field_updates": field_updates,
+        "ready": result.get("ready") is True,
+        "reply": str(result["reply"]).strip(),
+    }
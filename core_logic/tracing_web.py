@@ -0,0 +1,318 @@
+# Per-turn tracing.
+# A voice turn takes several browser requests (/transcribe_audio, /send_message, the audio fetches).
+# The browser sends one turn id with all of them (X-Turn-Id header, or the turn_id cookie for audio
+# elements and event streams); it becomes the trace id and the log records' turn_id. Each request,
+# the chatbot steps and every upstream call (see metrics_web.track_stage) are recorded as spans:
+# timed, parented through a context variable, and kept in an in-memory ring buffer that can be
+# exported as Chrome-trace JSON (chrome://tracing, Perfetto) or OTLP/JSON (OpenTelemetry collectors).
+# An opt-in sampling profiler records the stacks of requests while they run and keeps them only
+# for the slow ones, so tail-latency outliers can be explained after the fact.
+
+import os
+import re
+import sys
+import time
+import uuid
+import hashlib
+import logging
+import threading
+import functools
+import contextvars
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from .config_web import TRACING_ENABLED, TRACE_BUFFER_SPANS, TRACE_PROFILE_SLOW_TURNS, TRACE_SLOW_TURN_SECONDS, TRACE_PROFILE_INTERVAL
+from .logging_web import turn_id_var, session_id_var, new_turn_id
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "grievance-chatbot"
+TURN_ID_HEADER = "X-Turn-Id"
+TURN_ID_COOKIE = "turn_id"
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+_TURN_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+_current_span_var = contextvars.ContextVar("current_span", default=None)
+
+
+def valid_turn_id(value):
+    """`value` if it is usable as a turn id (8-64 letters, digits, '-' or '_'), else None."""
+    return value if value and _TURN_ID_PATTERN.match(value) else None
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "session_id", "start_ns", "end_ns",
+                 "attributes", "error", "thread_id", "thread_name", "_token", "_profiled")
+
+    def __init__(self, name, trace_id, parent_id=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.session_id = session_id_var.get()
+        self.attributes = dict(attributes) if attributes else {}
+        self.error = None
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self._token = None
+        self._profiled = False
+        self.end_ns = None
+        self.start_ns = time.time_ns()
+
+    @property
+    def duration(self):
+        """Seconds from start to end (or to now, while the span is open)."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class SpanBuffer:
+    """Thread-safe ring buffer of finished spans; the oldest are dropped once `max_spans` is reached."""
+
+    def __init__(self, max_spans=TRACE_BUFFER_SPANS):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, trace_id=None):
+        """Buffered spans, oldest first; only those of `trace_id` if given."""
+        with self._lock:
+            spans = list(self._spans)
+        return spans if trace_id is None else [span for span in spans if span.trace_id == trace_id]
+
+    def traces(self, limit=50):
+        """Summaries of the most recent traces, newest first."""
+        summaries = {}
+        for span in self.spans():
+            summary = summaries.get(span.trace_id)
+            if summary is None:
+                summary = summaries[span.trace_id] = {"turn_id": span.trace_id, "session_id": span.session_id, "spans": 0,
+                                                      "errors": 0, "start_ns": span.start_ns, "end_ns": span.end_ns, "requests": []}
+            summary["spans"] += 1
+            summary["errors"] += span.error is not None
+            summary["start_ns"] = min(summary["start_ns"], span.start_ns)
+            summary["end_ns"] = max(summary["end_ns"], span.end_ns)
+            if span.kind == SPAN_KIND_SERVER:
+                summary["requests"].append(span.name)
+        ordered = sorted(summaries.values(), key=lambda summary: summary["end_ns"], reverse=True)[:limit]
+        for summary in ordered:
+            summary["duration_ms"] = round((summary.pop("end_ns") - summary["start_ns"]) / 1e6, 3)
+        return ordered
+
+
+SPAN_BUFFER = SpanBuffer()
+
+
+def _collapse_stack(frame, max_depth=64):
+    """Folded stack ("module:function;module:function", outermost first) of `frame`."""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowTurnProfiler:
+    """
+    Sampling profiler for threads that are handling a request. While at least one thread is registered,
+    a background thread samples their stacks every `interval` seconds; on stop() the folded stacks are
+    returned if the request took at least `threshold` seconds and discarded otherwise.
+    """
+
+    def __init__(self, threshold=TRACE_SLOW_TURN_SECONDS, interval=TRACE_PROFILE_INTERVAL, max_stacks=20):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self._samples = {} # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._sampler = None
+        self.profiles_kept = 0
+
+    def start(self):
+        """Starts sampling the calling thread."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name="slow-turn-profiler", daemon=True)
+                self._sampler.start()
+            self._active.set()
+
+    def stop(self, elapsed):
+        """
+        Stops sampling the calling thread.
+
+        Returns:
+            list: [(folded stack, sample count), ...] most frequent first if `elapsed` >= threshold, else None.
+        """
+        with self._lock:
+            samples = self._samples.pop(threading.get_ident(), None)
+            if not self._samples:
+                self._active.clear()
+        if not samples or elapsed < self.threshold:
+            return None
+        self.profiles_kept += 1
+        return samples.most_common(self.max_stacks)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own_id:
+                        samples[_collapse_stack(frame)] += 1
+
+
+SLOW_TURN_PROFILER = SlowTurnProfiler() if TRACING_ENABLED and TRACE_PROFILE_SLOW_TURNS else None
+
+
+def current_span():
+    return _current_span_var.get()
+
+
+def start_span(name, kind=SPAN_KIND_INTERNAL, attributes=None, profile=False):
+    """
+    Starts a span as a child of the current one and makes it current; finish it with end_span().
+
+    Args:
+        name (str): Span name (e.g. "POST send_message", "openai.chat").
+        kind (int): SPAN_KIND_INTERNAL, SPAN_KIND_SERVER or SPAN_KIND_CLIENT.
+        attributes (dict, optional): Initial attributes.
+        profile (bool): Sample this thread's stacks until the span ends (only with TRACE_PROFILE_SLOW_TURNS).
+
+    Returns:
+        Span: The new span, or None when tracing is disabled.
+    """
+    if not TRACING_ENABLED:
+        return None
+    parent = _current_span_var.get()
+    trace_id = parent.trace_id if parent else (turn_id_var.get() or new_turn_id())
+    span = Span(name, trace_id, parent.span_id if parent else None, kind, attributes)
+    span._token = _current_span_var.set(span)
+    if profile and SLOW_TURN_PROFILER is not None:
+        SLOW_TURN_PROFILER.start()
+        span._profiled = True
+    return span
+
+
+def end_span(span, error=None):
+    """Ends `span` (no-op for None or an ended span), restores its parent as current and buffers it."""
+    if span is None or span.end_ns is not None:
+        return
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    if span._profiled:
+        profile = SLOW_TURN_PROFILER.stop(span.duration)
+        if profile:
+            span.set_attribute("profile.folded_stacks", "\n".join(f"{stack} {count}" for stack, count in profile))
+            logger.warning("Slow %s (%.2fs); most sampled stack: %s", span.name, span.duration, profile[0][0],
+                           extra={"profile": profile[:5]})
+    try:
+        _current_span_var.reset(span._token)
+    except ValueError:
+        pass # Ended from another context (e.g. a generator closed elsewhere); that context's current span is left as is
+    SPAN_BUFFER.add(span)
+
+
+@contextmanager
+def span(name, kind=SPAN_KIND_INTERNAL, attributes=None, profile=False):
+    """Context manager form of start_span()/end_span(); an exception escaping the block marks the span as failed."""
+    current = start_span(name, kind, attributes, profile)
+    try:
+        yield current
+    except Exception as e:
+        end_span(current, error=e)
+        raise
+    finally:
+        end_span(current)
+
+
+def traced(name):
+    """Decorator recording each call of the function as a span named `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def to_chrome_trace(spans):
+    """Spans as Chrome trace-event JSON ("X" complete events, one row per thread)."""
+    pid = os.getpid()
+    events = []
+    thread_names = {}
+    for span in spans:
+        thread_names[span.thread_id] = span.thread_name
+        args = {"turn_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id, "session_id": span.session_id}
+        args.update(span.attributes)
+        if span.error:
+            args["error"] = span.error
+        events.append({"name": span.name, "cat": span.trace_id, "ph": "X", "pid": pid, "tid": span.thread_id,
+                       "ts": span.start_ns / 1000, "dur": ((span.end_ns or span.start_ns) - span.start_ns) / 1000, "args": args})
+    events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}}
+                  for thread_id, thread_name in thread_names.items())
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_trace_id(trace_id):
+    """OTLP trace ids are 32 hex digits; other turn ids are hashed onto one (the original stays in "turn.id")."""
+    if re.fullmatch(r"[0-9a-f]{32}", trace_id):
+        return trace_id
+    return hashlib.blake2b(trace_id.encode(), digest_size=16).hexdigest()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp_json(spans):
+    """Spans as an OTLP/JSON ExportTraceServiceRequest (POST it to a collector's /v1/traces)."""
+    otlp_spans = []
+    for span in spans:
+        attributes = {"turn.id": span.trace_id, "session.id": span.session_id, "thread.name": span.thread_name}
+        attributes.update(span.attributes)
+        otlp_spans.append({
+            "traceId": _otlp_trace_id(span.trace_id),
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": _otlp_attributes(attributes),
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}],
+    }]}
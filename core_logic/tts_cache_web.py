@@ -0,0 +1,161 @@
+# Content-addressed cache for synthesized speech.
+# Clips are keyed by a hash of (text, voice, TTS model, audio format, language),
+# stored as blobs on disk and tracked by an in-memory LRU index that is bounded by
+# total size. Repeated phrases (greetings, fixed prompts, farewells) are then served
+# without calling the TTS API at all.
+
+import os
+import logging
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, audio_format="mp3"):
+        """
+        Args:
+            cache_dir (str): Directory holding the cached audio blobs.
+            max_bytes (int): Total size the cache may reach before least-recently-used clips are evicted.
+            audio_format (str): File extension / TTS response_format of the stored clips.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.audio_format = audio_format
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._index = OrderedDict() # key -> size in bytes; least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(text, voice, model, audio_format, language_code=""):
+        """Stable content hash identifying one synthesized clip."""
+        material = "\x1f".join([model, voice, audio_format, language_code or "", text.strip()])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def filename_for(self, key):
+        return f"{key}.{self.audio_format}"
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, self.filename_for(key))
+
+    def get(self, key):
+        """Returns the cached clip's filename, or None on a miss."""
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                hit = False
+        path = self.path_for(key)
+        if hit:
+            if os.path.exists(path):
+                _touch(path) # Keeps LRU order across restarts (the index is rebuilt from mtimes)
+                return self.filename_for(key)
+            with self._lock: # Evicted on disk by another worker sharing this directory
+                self._forget(key)
+                self.hits -= 1
+        elif os.path.exists(path):
+            # Written by another worker sharing this directory; adopt it into our index.
+            with self._lock:
+                self._adopt(key, os.path.getsize(path))
+                self.hits += 1
+            return self.filename_for(key)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, audio_bytes):
+        """Stores a clip atomically and evicts old clips past the size bound. Returns its filename."""
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio_bytes)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._adopt(key, len(audio_bytes))
+            evicted = self._evict_over_limit()
+        self._delete_files(evicted)
+        return self.filename_for(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _load_index(self):
+        suffix = f".{self.audio_format}"
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                _remove_quietly(path) # Left over from an interrupted write
+                continue
+            if not name.endswith(suffix):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(suffix)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        evicted = self._evict_over_limit()
+        self._delete_files(evicted)
+        logger.info("TTS cache loaded: %s clip(s), %s bytes in %s", len(self._index), self._total_bytes, self.cache_dir)
+
+    def _adopt(self, key, size):
+        self._forget(key)
+        self._index[key] = size
+        self._total_bytes += size
+
+    def _forget(self, key):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict_over_limit(self):
+        """Pops least-recently-used keys until under max_bytes. Caller holds the lock."""
+        evicted = []
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            evicted.append(key)
+        return evicted
+
+    def _delete_files(self, keys):
+        for key in keys:
+            _remove_quietly(self.path_for(key))
+
+
+def _touch(path):
+    try:
+        now = time.time()
+        os.utime(path, (now, now))
+    except OSError:
+        pass
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
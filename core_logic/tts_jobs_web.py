@@ -0,0 +1,209 @@
+# Asynchronous text-to-speech jobs.
+# /send_message can return the bot's text straight away together with an audio job id;
+# the clip is synthesized on a bounded worker pool and the browser picks up the
+# audio_url by polling or over server-sent events. Job status is written to the shared
+# session backend (when configured) so any worker can answer the poll; it is removed once
+# the browser has been given the final status, or when the job's TTL runs out.
+# SentenceSpeechPipeline uses the same pool to voice a streamed reply sentence by sentence.
+
+import json
+import logging
+import time
+import uuid
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from .streaming_web import SentenceSplitter
+from .tracing_web import span
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class TTSJobQueue:
+    def __init__(self, synthesize, max_workers=4, max_pending=64, backend=None, ttl=300):
+        """
+        Args:
+            synthesize (callable): synthesize(text, language_code) -> audio_url or None. Runs on the pool.
+            max_workers (int): Concurrent TTS requests.
+            max_pending (int): Jobs queued or running before new submissions are refused.
+            backend (optional): Shared session backend used to publish job status across workers.
+            ttl (float): Seconds a finished job's status is kept.
+        """
+        self.synthesize = synthesize
+        self.max_pending = max_pending
+        self.backend = backend
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._jobs = {} # job_id -> status dict; this worker's jobs
+        self._events = {} # job_id -> threading.Event set when the job finishes
+        self._callbacks = {} # job_id -> on_done callable, if one was given
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, text, language_code, on_done=None):
+        """
+        Queues a synthesis job. Returns its id, or None if the queue is full (caller should fall back).
+        on_done, if given, is called on the worker thread with the final status dict.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logger.warning("TTS job queue full (%s pending); skipping server audio for this turn.", self.max_pending)
+            return None
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire_local()
+            self.submitted += 1
+            self._events[job_id] = threading.Event()
+            if on_done:
+                self._callbacks[job_id] = on_done
+        self._publish(job_id, {"status": JOB_PENDING, "audio_url": None, "created_at": time.time()})
+        # Runs in a copy of the caller's context, so the job's log records and spans belong to the submitting turn
+        self._executor.submit(contextvars.copy_context().run, self._run, job_id, text, language_code)
+        return job_id
+
+    def status(self, job_id):
+        """Returns {"status": ..., "audio_url": ...} or None if the job is unknown/expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.backend:
+            blob = self.backend.load(self._backend_key(job_id))
+            job = json.loads(blob.decode("utf-8")) if blob else None
+        if job and time.time() - job["created_at"] > self.ttl:
+            self.forget(job_id)
+            return None
+        return job
+
+    def forget(self, job_id):
+        """Drops a job's status, e.g. once the browser has received its final status."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._events.pop(job_id, None)
+        if self.backend:
+            self.backend.delete(self._backend_key(job_id))
+
+    def wait(self, job_id, timeout):
+        """Blocks until the job finishes or `timeout` elapses; returns the latest status."""
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+            return self.status(job_id)
+        # Job belongs to another worker: poll the shared backend.
+        deadline = time.monotonic() + timeout
+        job = self.status(job_id)
+        while job and job["status"] == JOB_PENDING and time.monotonic() < deadline:
+            time.sleep(0.1)
+            job = self.status(job_id)
+        return job
+
+    def stats(self):
+        with self._lock:
+            return {"submitted": self.submitted, "rejected": self.rejected,
+                    "completed": self.completed, "failed": self.failed,
+                    "max_pending": self.max_pending}
+
+    def _run(self, job_id, text, language_code):
+        created_at = time.time()
+        try:
+            with span("tts_job", attributes={"job_id": job_id, "characters": len(text)}):
+                audio_url = self.synthesize(text, language_code)
+            outcome = {"status": JOB_DONE if audio_url else JOB_FAILED, "audio_url": audio_url}
+        except Exception as e:
+            logger.error("Error in TTS job %s: %s", job_id, e)
+            outcome = {"status": JOB_FAILED, "audio_url": None}
+        finally:
+            self._slots.release()
+        with self._lock:
+            created_at = self._jobs.get(job_id, {}).get("created_at", created_at)
+            if outcome["status"] == JOB_DONE:
+                self.completed += 1
+            else:
+                self.failed += 1
+        outcome["created_at"] = created_at
+        self._publish(job_id, outcome)
+        with self._lock:
+            event = self._events.get(job_id)
+            on_done = self._callbacks.pop(job_id, None)
+        if event:
+            event.set()
+        if on_done:
+            try:
+                on_done(outcome)
+            except Exception as e:
+                logger.error("Error in TTS job %s completion callback: %s", job_id, e)
+            self.forget(job_id) # The callback delivered the result; nobody polls for it
+
+    def _publish(self, job_id, job):
+        with self._lock:
+            self._jobs[job_id] = job
+        if self.backend:
+            self.backend.save(self._backend_key(job_id), json.dumps(job).encode("utf-8"), ttl=self.ttl)
+
+    def _backend_key(self, job_id):
+        return f"tts_job_{job_id}"
+
+    def _expire_local(self):
+        """Drops finished jobs past their TTL. Caller holds the lock."""
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, job in self._jobs.items() if job["created_at"] < cutoff and job["status"] != JOB_PENDING]:
+            self._jobs.pop(job_id, None)
+            self._events.pop(job_id, None)
+
+
+class SentenceSpeechPipeline:
+    """
+    Voices a reply while it is still being generated: streamed text is cut into sentences and
+    each finished sentence is synthesized right away. Clips may finish out of order, so every
+    one is reported with its sequence number and the browser plays them as an ordered playlist.
+    """
+
+    def __init__(self, speak, on_audio, min_chars=24):
+        """
+        Args:
+            speak (callable): speak(text, on_ready) starts synthesis of one sentence and later calls
+                on_ready(audio_url or None), from any thread.
+            on_audio (callable): on_audio(seq, audio_url or None, text) for every sentence.
+            min_chars (int): Shorter sentences are merged with the next one.
+        """
+        self.speak = speak
+        self.on_audio = on_audio
+        self._splitter = SentenceSplitter(min_chars=min_chars)
+        self._streamed_text = ""
+        self.sentence_count = 0
+
+    def feed(self, text):
+        """Adds a piece of the streamed reply."""
+        self._streamed_text += text
+        for sentence in self._splitter.feed(text):
+            self._speak(sentence)
+
+    def finish(self, final_text):
+        """
+        Voices whatever is left once the turn is complete. Text the turn logic appended after the
+        streamed part (e.g. the form prompt) is voiced too. Returns the total number of sentences;
+        0 means nothing was streamed (a fixed reply) and the caller should voice the reply as a whole,
+        which keeps warmed-up clips of static prompts usable.
+        """
+        if not self._streamed_text:
+            return 0
+        if final_text and final_text.startswith(self._streamed_text):
+            for sentence in self._splitter.feed(final_text[len(self._streamed_text):]):
+                self._speak(sentence)
+        for sentence in self._splitter.flush():
+            self._speak(sentence)
+        return self.sentence_count
+
+    def _speak(self, sentence):
+        seq = self.sentence_count
+        self.sentence_count += 1
+        self.speak(sentence, lambda audio_url: self.on_audio(seq, audio_url, sentence))
@@ -0,0 +1,131 @@
+# Streaming text-to-speech relay.
+# Instead of synthesizing a whole clip to disk before answering, /send_message hands
+# the browser a stream URL. When the browser fetches it, TTS bytes are relayed as
+# they arrive from the API (chunked transfer), so playback starts after the first
+# chunk. The relayed bytes can be teed into the TTS cache or a file on disk.
+
+import os
+import logging
+import json
+import time
+import uuid
+import threading
+
+from .metrics_web import track_stage, TTS_CHARACTERS
+
+logger = logging.getLogger(__name__)
+
+AUDIO_MIME_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+    "pcm": "audio/L16",
+}
+
+
+class PendingSpeechStreams:
+    """
+    Remembers what text a stream token should speak until the browser fetches it.
+    Uses the shared session backend when one is configured, so the audio request may
+    land on a different worker than the /send_message request that created it.
+    Entries are removed once consumed (the clip is in the TTS cache) or expired.
+    """
+
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+        self._local = {} # token -> (created_at, spec); used without a shared backend
+        self._lock = threading.Lock()
+
+    def register(self, text, language_code, cache_key):
+        token = uuid.uuid4().hex
+        spec = {"text": text, "language": language_code, "cache_key": cache_key, "created_at": time.time()}
+        if self.backend:
+            self.backend.save(self._backend_key(token), json.dumps(spec, ensure_ascii=False).encode("utf-8"), ttl=self.ttl)
+        else:
+            with self._lock:
+                self._expire_local()
+                self._local[token] = spec
+        return token
+
+    def get(self, token):
+        """Returns the stream spec for a token, or None if unknown/expired. Tokens stay valid until they are
+        consumed or reach the TTL, so a browser re-requesting the same audio URL mid-stream still gets it."""
+        if self.backend:
+            blob = self.backend.load(self._backend_key(token))
+            spec = json.loads(blob.decode("utf-8")) if blob else None
+        else:
+            with self._lock:
+                spec = self._local.get(token)
+        if spec and time.time() - spec["created_at"] > self.ttl:
+            self.consume(token)
+            return None
+        return spec
+
+    def consume(self, token):
+        """Forgets a token whose clip no longer needs it (e.g. it is now in the TTS cache)."""
+        if self.backend:
+            self.backend.delete(self._backend_key(token))
+        else:
+            with self._lock:
+                self._local.pop(token, None)
+
+    def _backend_key(self, token):
+        return f"tts_stream_{token}"
+
+    def _expire_local(self):
+        cutoff = time.time() - self.ttl
+        for token in [t for t, spec in self._local.items() if spec["created_at"] < cutoff]:
+            del self._local[token]
+
+
+def relay_speech(client, model, voice, text, audio_format, chunk_size=4096, tee_to_cache=None, tee_to_path=None):
+    """
+    Generator yielding TTS audio chunks as the API produces them.
+
+    Args:
+        client (ResilientOpenAI): Shared OpenAI client (see openai_client_web).
+        model (str): TTS model name.
+        voice (str): TTS voice name.
+        text (str): Text to speak.
+        audio_format (str): TTS response_format (e.g. "mp3").
+        chunk_size (int): Bytes per relayed chunk.
+        tee_to_cache (callable, optional): Called with the complete clip bytes once the stream finishes.
+        tee_to_path (str, optional): File the relayed bytes are also written to as they stream.
+    """
+    collected = [] if tee_to_cache else None
+    tee_file = open(tee_to_path + ".part", "wb") if tee_to_path else None
+    completed = False
+    try:
+        TTS_CHARACTERS.labels(model).inc(len(text))
+        with track_stage("tts", model) as call, client.for_call("tts").audio.speech.with_streaming_response.create(
+            model=model,
+            voice=voice,
+            input=text,
+            response_format=audio_format
+        ) as response:
+            for chunk in response.iter_bytes(chunk_size):
+                if not chunk:
+                    continue
+                call.first_chunk()
+                if collected is not None:
+                    collected.append(chunk)
+                if tee_file:
+                    tee_file.write(chunk)
+                yield chunk
+        completed = True
+    finally:
+        # Only complete clips are kept; a client disconnect or API error discards the partial tee.
+        if tee_file:
+            tee_file.close()
+            if completed:
+                os.replace(tee_to_path + ".part", tee_to_path)
+            else:
+                os.remove(tee_to_path + ".part")
+        if completed and collected is not None:
+            try:
+                tee_to_cache(b"".join(collected))
+            except Exception as e:
+                logger.error("Error storing streamed TTS clip in cache: %s", e)
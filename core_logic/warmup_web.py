@@ -0,0 +1,85 @@
+# Startup / build-time warm-up for text-to-speech.
+# Every fixed bot utterance (greeting, farewells, error messages, form prompts) is
+# known ahead of time for all languages in LANGUAGES, so they can be synthesized once
+# into the TTS cache instead of on the first visitor's request.
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .config_web import GRIEVANCE_CATEGORIES
+from .mappings_web import LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+# Localized string keys the bot speaks on their own (placeholders used inside prompts are excluded).
+STATIC_SPOKEN_KEYS = [
+    "initial_greeting", "farewell_messages", "audio_capture_error", "submitting_form",
+    "form_submitted_successfully", "form_filling_prompt", "update_information_prompt",
+    "unhandled_stage_error", "internal_form_details_error", "llm_error_collecting", "llm_error_general",
+]
+
+# Keys whose only placeholder is the grievance category; rendered once per category.
+CATEGORY_SPOKEN_KEYS = {
+    "direct_to_form_filling_prompt": lambda category: {"category_readable": category.replace("_", " ")},
+    "llm_error_collecting_after_ready_but_missing": lambda category: {"category": category},
+}
+
+
+def static_prompt_texts(strings_table):
+    """
+    Enumerates every fixed utterance the bot can speak, per language.
+
+    Args:
+        strings_table (dict): {key: {language_name: text or [variants]}}, e.g. localization_web.LOCALIZED_STRINGS.
+
+    Returns:
+        list: Unique (text, language_code) pairs, with missing languages falling back to English.
+    """
+    pairs = []
+    seen = set()
+
+    def add(text, language_code):
+        if text and (text, language_code) not in seen:
+            seen.add((text, language_code))
+            pairs.append((text, language_code))
+
+    for language_name, language_code in LANGUAGES.items():
+        for key in STATIC_SPOKEN_KEYS + list(CATEGORY_SPOKEN_KEYS):
+            variants_by_language = strings_table.get(key, {})
+            message_or_list = variants_by_language.get(language_name, variants_by_language.get("english"))
+            variants = message_or_list if isinstance(message_or_list, list) else [message_or_list]
+            for variant in variants:
+                if not isinstance(variant, str):
+                    continue
+                if key in CATEGORY_SPOKEN_KEYS:
+                    for category in GRIEVANCE_CATEGORIES:
+                        add(variant.format(**CATEGORY_SPOKEN_KEYS[key](category)), language_code)
+                else:
+                    add(variant, language_code)
+    return pairs
+
+
+def warm_tts_cache(strings_table, synthesize, max_workers=4):
+    """
+    Synthesizes all static utterances through `synthesize(text, language_code)`.
+    `synthesize` is expected to consult and fill the TTS cache (e.g. app.get_tts_audio_url).
+
+    Returns:
+        dict: {"total": n, "ready": n, "failed": n}
+    """
+    pairs = static_prompt_texts(strings_table)
+    results = {"total": len(pairs), "ready": 0, "failed": 0}
+
+    def run(pair):
+        text, language_code = pair
+        try:
+            return synthesize(text, language_code) is not None
+        except Exception as e:
+            logger.warning("TTS warm-up failed for (%s) '%s...': %s", language_code, text[:40], e)
+            return False
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-warmup") as executor:
+        for ok in executor.map(run, pairs):
+            results["ready" if ok else "failed"] += 1
+    logger.info("TTS warm-up finished: %s/%s clip(s) ready, %s failed.", results['ready'], results['total'], results['failed'])
+    return results
@@ -15,26 +15,45 @@ document.addEventListener('DOMContentLoaded', () => {
     // let chatbotCurrentLanguage = 'en-US'; 
     let currentBotLanguageCode = 'en'; // For STT hint & backend TTS language context
 
+    // --- Turn ids: every request of one turn (transcription, reply, audio) carries the same id, so the server traces them together ---
+    let currentTurnId = null;
+    const startTurn = () => {
+        currentTurnId = Array.from(crypto.getRandomValues(new Uint8Array(8)), (byte) => byte.toString(16).padStart(2, '0')).join('');
+        // Audio elements and event streams cannot send headers; they carry the id in a short-lived cookie
+        document.cookie = `turn_id=${currentTurnId}; path=/; max-age=300; SameSite=Strict`;
+        return currentTurnId;
+    };
+
     // --- Audio Playback for Backend TTS ---
     let currentBotAudio = null; // To manage the audio object
 
-    const playBackendAudio = (audioUrl) => {
+    const playBackendAudio = (audioUrl, fallbackText = null) => {
         if (currentBotAudio) {
             currentBotAudio.pause(); // Stop any currently playing audio
         }
         currentBotAudio = new Audio(audioUrl);
+        // Streamed audio can fail after the response is returned; fall back to browser TTS then.
+        currentBotAudio.onerror = () => {
+            console.warn("Backend audio failed to load, falling back to browser TTS.");
+            if (fallbackText) speakWithBrowser(fallbackText, mapLangCodeToBrowserTTS(currentBotLanguageCode));
+        };
         currentBotAudio.play()
             .catch(error => console.error("Error playing backend audio:", error));
     };
 
     // --- Web Speech API (Speech Synthesis for bot responses - FALLBACK ONLY) ---
-    const speakWithBrowser = (text, lang = 'en-US') => {
+    // onEnd (optional) is called when the utterance finishes or cannot be spoken
+    const speakWithBrowser = (text, lang = 'en-US', onEnd = null) => {
         if ('speechSynthesis' in window) {
             if (speechSynthesis.speaking) {
                 speechSynthesis.cancel();
             }
             const utterance = new SpeechSynthesisUtterance(text);
             utterance.lang = lang;
+            if (onEnd) {
+                utterance.onend = onEnd;
+                utterance.onerror = onEnd;
+            }
             const voices = speechSynthesis.getVoices();
             let selectedVoice = voices.find(voice => voice.lang === lang && voice.default);
             if (!selectedVoice) {
@@ -46,6 +65,7 @@ document.addEventListener('DOMContentLoaded', () => {
             speechSynthesis.speak(utterance);
         } else {
             console.warn('Browser speech synthesis not supported.');
+            if (onEnd) onEnd();
         }
     };
 
@@ -56,17 +76,115 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
 
-    const addMessageToHistory = (text, sender, audioUrl = null) => {
+    // --- Asynchronous backend TTS: reply text arrives first, audio follows via an audio job ---
+    let latestAudioJobId = null; // Only the newest bot message may start playing
+
+    const waitForAudioJob = (jobId) => new Promise((resolve) => {
+        if (!('EventSource' in window)) {
+            // Poll when server-sent events are unavailable
+            const poll = async () => {
+                try {
+                    const response = await fetch(`/tts_job/${jobId}`);
+                    const job = response.ok ? await response.json() : { status: 'failed' };
+                    if (job.status === 'pending') { setTimeout(poll, 300); return; }
+                    resolve(job.status === 'done' ? job.audio_url : null);
+                } catch (error) { resolve(null); }
+            };
+            poll();
+            return;
+        }
+        const events = new EventSource(`/tts_job/${jobId}/events`);
+        events.onmessage = (event) => {
+            events.close();
+            const job = JSON.parse(event.data);
+            resolve(job.status === 'done' ? job.audio_url : null);
+        };
+        events.onerror = () => { events.close(); resolve(null); };
+    });
+
+    const playAudioJob = async (jobId, text) => {
+        latestAudioJobId = jobId;
+        const audioUrl = await waitForAudioJob(jobId);
+        if (latestAudioJobId !== jobId) return; // A newer reply has arrived meanwhile
+        if (audioUrl) {
+            playBackendAudio(audioUrl, text);
+        } else {
+            console.warn("Audio job failed, falling back to browser TTS for bot message.");
+            speakWithBrowser(text, mapLangCodeToBrowserTTS(currentBotLanguageCode));
+        }
+    };
+
+    // --- Sentence playlist: clips of a streamed reply arrive as each sentence is synthesized ---
+    let sentencePlaylist = null; // Playlist of the newest streamed reply; older ones stop advancing
+
+    const queueSentenceAudio = (seq, audioUrl, text) => {
+        if (!sentencePlaylist) {
+            if (currentBotAudio) currentBotAudio.pause();
+            latestAudioJobId = null;
+            sentencePlaylist = { clips: [], next: 0, playing: false };
+        }
+        sentencePlaylist.clips[seq] = { audioUrl, text };
+        playNextSentence(sentencePlaylist);
+    };
+
+    const playNextSentence = (playlist) => {
+        if (playlist !== sentencePlaylist || playlist.playing) return;
+        const clip = playlist.clips[playlist.next];
+        if (!clip) return; // Not synthesized yet; queueSentenceAudio resumes playback
+        playlist.playing = true;
+        playlist.next += 1;
+        const advance = () => {
+            playlist.playing = false;
+            playNextSentence(playlist);
+        };
+        const browserLang = mapLangCodeToBrowserTTS(currentBotLanguageCode);
+        if (clip.audioUrl) {
+            currentBotAudio = new Audio(clip.audioUrl);
+            currentBotAudio.onended = advance;
+            currentBotAudio.onerror = () => speakWithBrowser(clip.text, browserLang, advance);
+            currentBotAudio.play().catch(error => {
+                console.error("Error playing sentence audio:", error);
+                advance();
+            });
+        } else if (clip.text) {
+            speakWithBrowser(clip.text, browserLang, advance);
+        } else {
+            advance();
+        }
+    };
+
+    // Called when the reply stream has ended: sentences whose audio never arrived are skipped
+    const closeSentencePlaylist = (total) => {
+        if (!sentencePlaylist) return;
+        for (let seq = 0; seq < total; seq++) {
+            if (!sentencePlaylist.clips[seq]) sentencePlaylist.clips[seq] = { audioUrl: null, text: '' };
+        }
+        playNextSentence(sentencePlaylist);
+    };
+
+    const createMessageElement = (sender) => {
         const messageDiv = document.createElement('div');
         messageDiv.classList.add('message', sender === 'user' ? 'user-msg' : 'bot-msg', 'break-words');
-        messageDiv.textContent = text;
         chatHistory.appendChild(messageDiv);
+        return messageDiv;
+    };
+
+    // messageDiv: an existing bubble (e.g. one filled by streamed tokens) to finalize instead of adding a new one
+    // spokenBySentence: the reply is already being voiced through the sentence playlist
+    const addMessageToHistory = (text, sender, audioUrl = null, audioJobId = null, messageDiv = null, spokenBySentence = false) => {
+        messageDiv = messageDiv || createMessageElement(sender);
+        messageDiv.textContent = text;
         chatHistory.scrollTop = chatHistory.scrollHeight;
 
-        if (sender === 'bot') {
+        if (sender === 'bot' && !spokenBySentence) {
+            sentencePlaylist = null;
             if (audioUrl) {
-                playBackendAudio(audioUrl);
+                latestAudioJobId = null;
+                playBackendAudio(audioUrl, text);
+            } else if (audioJobId) {
+                playAudioJob(audioJobId, text);
             } else {
+                latestAudioJobId = null;
                 // Fallback to browser TTS if no audio_url (e.g., error in backend TTS)
                 console.warn("No audio_url from backend, falling back to browser TTS for bot message.");
                 const browserLang = mapLangCodeToBrowserTTS(currentBotLanguageCode);
@@ -118,7 +236,7 @@ document.addEventListener('DOMContentLoaded', () => {
                  if (data.language) { 
                     updateChatbotLanguage(data.language);
                  }
-                 addMessageToHistory(data.bot_response, 'bot', data.audio_url); // Pass audio_url
+                 addMessageToHistory(data.bot_response, 'bot', data.audio_url, data.audio_job_id); // Pass audio_url / audio job
             }
             userInput.focus();
         } catch (error) {
@@ -128,58 +246,81 @@ document.addEventListener('DOMContentLoaded', () => {
     };
     
 
-    const sendMessage = async (messageText) => {
+    // --- Streamed replies: /send_message_stream sends "token" events, then "done" with the full payload ---
+    const supportsStreamedReplies = 'ReadableStream' in window && 'TextDecoder' in window;
+
+    // Reads token/audio/done/error events until the server closes the stream; returns the "done" payload
+    const readTurnStream = async (response, { onToken, onAudio, onDone }) => {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let donePayload = null;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let eventName = 'message';
+                let dataText = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataText += line.slice(5).trim();
+                });
+                const payload = dataText ? JSON.parse(dataText) : {};
+                if (eventName === 'token') onToken(payload.text);
+                else if (eventName === 'audio') onAudio(payload);
+                else if (eventName === 'done') { donePayload = payload; onDone(payload); }
+                else if (eventName === 'error') throw new Error(payload.error || 'Failed to get response');
+            }
+        }
+        if (!donePayload) throw new Error('Reply stream ended unexpectedly');
+        return donePayload;
+    };
+
+    const postMessage = (url, messageText) => fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-Turn-Id': currentTurnId },
+        body: JSON.stringify({ message: messageText, language: currentBotLanguageCode }),
+    });
+
+    // continueTurn is set when the message comes from a transcription, which already started the turn
+    const sendMessage = async (messageText, continueTurn = false) => {
         if (!messageText.trim()) return;
+        if (!continueTurn || !currentTurnId) startTurn();
 
         addMessageToHistory(messageText, 'user'); // User message has no audio_url
         userInput.value = '';
 
+        let streamingDiv = null; // Bot bubble filled as tokens arrive
         try {
-            const response = await fetch('/send_message', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message: messageText, language: currentBotLanguageCode }),
-            });
+            const response = await postMessage(supportsStreamedReplies ? '/send_message_stream' : '/send_message', messageText);
 
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({ detail: "Unknown error" }));
                 throw new Error(`HTTP error! status: ${response.status}, message: ${errorData.detail || errorData.error || "Failed to get response"}`);
             }
             
-            const data = await response.json();
-
-            if (data.bot_response) {
-                if (data.language) { 
-                    updateChatbotLanguage(data.language);
-                }
-                // Add bot message to history, with audio_url if present
-                addMessageToHistory(data.bot_response, 'bot', data.audio_url);
-            }
-
-            // Handle actions like loading forms
-            if (data.action === 'LOAD_FORM' && data.form_url) {
-                formStatus.textContent = `Loading ${data.form_type || 'grievance'} form...`;
-                grievanceFormFrame.src = data.form_url;
-
-                grievanceFormFrame.onload = () => {
-                    formStatus.textContent = `${data.form_type || 'Grievance'} form loaded.`;
-                    if (data.form_data && Object.keys(data.form_data).length > 0) {
-                        grievanceFormFrame.contentWindow.postMessage({
-                            type: 'PREFILL_FORM',
-                            payload: data.form_data
-                        }, window.location.origin);
-                        formStatus.textContent += ' Form data pre-filled.';
-                    }
-                };
-            } else if (data.action === 'FORM_SUBMITTED') {
-                formStatus.textContent = `Form submission confirmed. Thank you!`;
-                grievanceFormFrame.src = 'about:blank';
-            } else if (data.action === 'END_CONVERSATION') {
-                formStatus.textContent = "Conversation ended.";
+            if (supportsStreamedReplies) {
+                sentencePlaylist = null; // Sentence clips of this reply start a new playlist
+                const data = await readTurnStream(response, {
+                    onToken: (text) => {
+                        streamingDiv = streamingDiv || createMessageElement('bot');
+                        streamingDiv.textContent += text;
+                        chatHistory.scrollTop = chatHistory.scrollHeight;
+                    },
+                    onAudio: (clip) => queueSentenceAudio(clip.seq, clip.audio_url, clip.text),
+                    onDone: (payload) => handleBotTurn(payload, streamingDiv),
+                });
+                closeSentencePlaylist(data.audio_sentences || 0);
+            } else {
+                handleBotTurn(await response.json(), null);
             }
-
         } catch (error) {
             console.error('Error sending message:', error);
+            if (streamingDiv) streamingDiv.remove();
             // For error messages from JS side, use browser TTS or just text
             const browserLang = mapLangCodeToBrowserTTS(currentBotLanguageCode);
             speakWithBrowser(`Error: ${error.message || 'Could not connect to the bot.'}`, browserLang);
@@ -187,6 +328,41 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // Shows a turn's reply and runs its action. streamingDiv is the bubble streamed tokens went into, if any.
+    const handleBotTurn = (data, streamingDiv) => {
+        if (data.bot_response) {
+            if (data.language) { 
+                updateChatbotLanguage(data.language);
+            }
+            // Add bot message to history (replacing the streamed text with the final reply), with audio_url (or pending audio job) if present
+            addMessageToHistory(data.bot_response, 'bot', data.audio_url, data.audio_job_id, streamingDiv, data.audio_sentences > 0);
+        } else if (streamingDiv) {
+            streamingDiv.remove();
+        }
+
+        // Handle actions like loading forms
+        if (data.action === 'LOAD_FORM' && data.form_url) {
+            formStatus.textContent = `Loading ${data.form_type || 'grievance'} form...`;
+            grievanceFormFrame.src = data.form_url;
+
+            grievanceFormFrame.onload = () => {
+                formStatus.textContent = `${data.form_type || 'Grievance'} form loaded.`;
+                if (data.form_data && Object.keys(data.form_data).length > 0) {
+                    grievanceFormFrame.contentWindow.postMessage({
+                        type: 'PREFILL_FORM',
+                        payload: data.form_data
+                    }, window.location.origin);
+                    formStatus.textContent += ' Form data pre-filled.';
+                }
+            };
+        } else if (data.action === 'FORM_SUBMITTED') {
+            formStatus.textContent = `Form submission confirmed. Thank you!`;
+            grievanceFormFrame.src = 'about:blank';
+        } else if (data.action === 'END_CONVERSATION') {
+            formStatus.textContent = "Conversation ended.";
+        }
+    };
+
     // --- MediaRecorder Setup for STT ---
     if (navigator.mediaDevices && navigator.mediaDevices.getUserMedia) {
         micButton.addEventListener('click', () => {
@@ -232,14 +408,14 @@ document.addEventListener('DOMContentLoaded', () => {
                 formData.append('language', currentBotLanguageCode);
                 try {
                     micStatus.textContent = 'Transcribing...';
-                    const response = await fetch('/transcribe_audio', { method: 'POST', body: formData });
+                    const response = await fetch('/transcribe_audio', { method: 'POST', body: formData, headers: { 'X-Turn-Id': startTurn() } });
                     if (!response.ok) {
                         const errData = await response.json().catch(() => ({ error: "Transcription failed" }));
                         throw new Error(errData.error || `Service error: ${response.status}`);
                     }
                     const data = await response.json();
                     if (data.transcript) {
-                        userInput.value = data.transcript; sendMessage(data.transcript);
+                        userInput.value = data.transcript; sendMessage(data.transcript, true);
                         micStatus.textContent = 'Click mic to speak';
                     } else if (data.error) { throw new Error(data.error); }
                     else { micStatus.textContent = 'No transcript. Try again.'; }
@@ -0,0 +1,36 @@
+import unittest
+
+from core_logic.extractors_web import extract_fixed_format_fields
+
+DATE_FIELDS = ["incident_date", "application_date"]
+
+
+class DateExtractionTest(unittest.TestCase):
+    def test_month_names_must_be_whole_words(self):
+        for text in ("मैंने 5 मेले देखे", "मेरे 3 मेरे बच्चे हैं", "2 में से एक", "இது 10 மேல் நாட்கள்"):
+            self.assertEqual(extract_fixed_format_fields(text, DATE_FIELDS, "When did it happen?"), {}, text)
+
+    def test_ambiguous_month_needs_a_year_or_a_date_question(self):
+        self.assertEqual(extract_fixed_format_fields("number 5 may be lost", DATE_FIELDS), {})
+        self.assertEqual(extract_fixed_format_fields("on 5 may 2025", ["incident_date"], "When did it happen?"),
+                         {"incident_date": "05/05/2025"})
+        self.assertIn("incident_date", extract_fixed_format_fields("5 may", ["incident_date"], "When did it happen?"))
+
+    def test_date_field_follows_the_question(self):
+        self.assertEqual(extract_fixed_format_fields("12 March 2024", DATE_FIELDS, "When did you apply?"),
+                         {"application_date": "12/03/2024"})
+        self.assertEqual(extract_fixed_format_fields("5 मे 2025", DATE_FIELDS, "कधी अर्ज केला?"),
+                         {"application_date": "05/05/2025"})
+        self.assertEqual(extract_fixed_format_fields("I applied on 12 March 2024", DATE_FIELDS),
+                         {"application_date": "12/03/2024"})
+
+    def test_unclear_date_field_is_left_empty(self):
+        self.assertEqual(extract_fixed_format_fields("12 March 2024", DATE_FIELDS, "What is the date?"), {})
+        self.assertEqual(extract_fixed_format_fields("12 March 2024", ["incident_date"]), {})
+        self.assertEqual(extract_fixed_format_fields("12 March 2024", ["incident_date"], "When did you apply?"), {})
+        self.assertEqual(extract_fixed_format_fields("12 March 2024", ["incident_date"], "What is the date?"),
+                         {"incident_date": "12/03/2024"})
+
+
+if __name__ == "__main__":
+    unittest.main()
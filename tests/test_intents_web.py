@@ -0,0 +1,43 @@
+import unittest
+
+from core_logic.intents_web import (match_confirmation, normalize_intent_text, AFFIRMATIVE, NEGATIVE,
+                                    EXACT_MATCH_SCORE, PREFIX_MATCH_SCORE, PHRASE_MATCH_SCORE)
+
+
+class NormalizeIntentTextTest(unittest.TestCase):
+    def test_case_punctuation_and_chandrabindu(self):
+        self.assertEqual(normalize_intent_text("  Yes,   please! "), "yes please")
+        self.assertEqual(normalize_intent_text("हाँ।"), normalize_intent_text("हां"))
+        self.assertEqual(normalize_intent_text("That’s right"), "that's right")
+
+
+class MatchConfirmationTest(unittest.TestCase):
+    def test_scores_by_kind_of_match(self):
+        self.assertEqual(match_confirmation("yes", "english"), (AFFIRMATIVE, EXACT_MATCH_SCORE, "english"))
+        self.assertEqual(match_confirmation("Yes please, go ahead!", "english"), (AFFIRMATIVE, PREFIX_MATCH_SCORE, "english"))
+        self.assertEqual(match_confirmation("i think that's right", "english"), (AFFIRMATIVE, PHRASE_MATCH_SCORE, "english"))
+
+    def test_longer_phrase_beats_its_prefix(self):
+        self.assertEqual(match_confirmation("sahi", "hindi")[0], AFFIRMATIVE)
+        self.assertEqual(match_confirmation("sahi nahi hai", "hindi"), (NEGATIVE, EXACT_MATCH_SCORE, "hindi"))
+
+    def test_native_and_english_phrases(self):
+        self.assertEqual(match_confirmation("हां जी", "hindi"), (AFFIRMATIVE, EXACT_MATCH_SCORE, "hindi"))
+        self.assertEqual(match_confirmation("ஆம்", "tamil"), (AFFIRMATIVE, EXACT_MATCH_SCORE, "tamil"))
+        self.assertEqual(match_confirmation("ok", "tamil"), (AFFIRMATIVE, EXACT_MATCH_SCORE, "english"))
+        self.assertEqual(match_confirmation("ಇಲ್ಲ", "kannada"), (NEGATIVE, EXACT_MATCH_SCORE, "kannada"))
+
+    def test_other_languages_phrases_are_not_used(self):
+        self.assertEqual(match_confirmation("होय", "tamil"), (None, 0.0, None))
+        self.assertEqual(match_confirmation("होय", "marathi")[0], AFFIRMATIVE)
+
+    def test_single_word_inside_a_reply_does_not_count(self):
+        self.assertEqual(match_confirmation("I'm not sure", "english"), (None, 0.0, None))
+        self.assertEqual(match_confirmation("hmm", "english"), (None, 0.0, None))
+
+    def test_unknown_language_uses_english(self):
+        self.assertEqual(match_confirmation("no", "klingon"), (NEGATIVE, EXACT_MATCH_SCORE, "english"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from core_logic.localization_web import fallback_chain, localize, template_fields, _compile_strings, _load_resource_files
+
+
+class FallbackTest(unittest.TestCase):
+    def test_chain_ends_with_english(self):
+        self.assertEqual(fallback_chain("marathi"), ["marathi", "hindi", "english"])
+        self.assertEqual(fallback_chain("tamil"), ["tamil", "english"])
+        self.assertEqual(fallback_chain("english"), ["english"])
+
+    def test_missing_translation_comes_from_the_fallback_chain(self):
+        hindi = localize("category_identified_prompt", "hindi", category="X")
+        self.assertEqual(localize("category_identified_prompt", "marathi", category="X"), hindi)
+        self.assertEqual(localize("category_identified_prompt", "tamil", category="X"), "Okay, I think this is about X.")
+
+    def test_unknown_key_and_missing_placeholder(self):
+        self.assertEqual(localize("no_such_key", "english"), "[[UNTRANSLATED_KEY_NO_SUCH_KEY]]")
+        with self.assertLogs("core_logic.localization_web", "WARNING"):
+            self.assertEqual(localize("category_identified_prompt", "english"), "Okay, I think this is about {category}.")
+        self.assertEqual(template_fields("category_identified_prompt"), frozenset({"category"}))
+
+
+class PlaceholderValidationTest(unittest.TestCase):
+    def compile(self, table):
+        with self.assertLogs("core_logic.localization_web", "WARNING") as logs:
+            compiled, key_fields, resolved = _compile_strings(table)
+        return compiled, key_fields, resolved, logs.output
+
+    def test_translation_with_other_placeholders_is_skipped(self):
+        compiled, key_fields, resolved, logs = self.compile({
+            "ask": {"english": "Your {field_name}?", "hindi": "आपका {naam}?", "tamil": "உங்கள் {field_name}?"},
+        })
+        self.assertEqual(key_fields["ask"], frozenset({"field_name"}))
+        self.assertEqual(resolved["ask"]["hindi"], "Your {field_name}?")
+        self.assertEqual(resolved["ask"]["tamil"], "உங்கள் {field_name}?")
+        self.assertEqual(len(logs), 1)
+
+    def test_malformed_template_and_bad_variants_are_skipped(self):
+        compiled, _, resolved, logs = self.compile({
+            "bye": {"english": ["Bye!", "See you!"], "hindi": "अलविदा {", "marathi": ["", "निरोप!"]},
+        })
+        self.assertEqual(resolved["bye"]["hindi"], ["Bye!", "See you!"])
+        self.assertEqual(resolved["bye"]["marathi"], ["निरोप!"])
+        self.assertEqual(len(logs), 2)
+
+
+class ResourceFileTest(unittest.TestCase):
+    def test_json_files_are_read_and_bad_ones_ignored(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with open(os.path.join(directory, "Tamil.json"), "w", encoding="utf-8") as f:
+            json.dump({"ask": "உங்கள் {field_name}?"}, f, ensure_ascii=False)
+        with open(os.path.join(directory, "hindi.json"), "w", encoding="utf-8") as f:
+            f.write("[1, 2")
+        with self.assertLogs("core_logic.localization_web", "WARNING"):
+            overrides = _load_resource_files(directory)
+        self.assertEqual(overrides, {"ask": {"tamil": "உங்கள் {field_name}?"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from core_logic.normalizers_web import parse_duration_days, duration_option, match_option, normalize_option, extract_option_fields
+
+
+class DurationTest(unittest.TestCase):
+    def test_durations_in_several_languages(self):
+        self.assertEqual(parse_duration_days("3 weeks"), 21)
+        self.assertEqual(parse_duration_days("do mahine se"), 60)
+        self.assertEqual(parse_duration_days("डेढ़ साल"), 547.5)
+        self.assertEqual(parse_duration_days("2 वर्षांपासून"), 730)
+        self.assertEqual(parse_duration_days("half a year"), 182.5)
+        self.assertIsNone(parse_duration_days("since yesterday"))
+
+    def test_more_than_moves_a_boundary_into_the_next_bucket(self):
+        self.assertEqual(duration_option(parse_duration_days("one year")), "six_to_twelve_months")
+        self.assertEqual(duration_option(parse_duration_days("more than one year")), "more_than_year")
+
+    def test_synonym_without_a_number(self):
+        self.assertEqual(match_option("issue_duration", "since yesterday"), "less_than_week")
+
+
+class MatchOptionTest(unittest.TestCase):
+    def test_misspellings_and_inflections(self):
+        self.assertEqual(match_option("service_type", "pasport"), "passport")
+        self.assertEqual(match_option("service_type", "adhar card"), "aadhar")
+        self.assertEqual(match_option("service_type", "पासपोर्टच्या लिए"), "passport")
+
+    def test_longest_phrase_wins(self):
+        self.assertEqual(match_option("current_status", "not approved yet", "What is the status?"), "application_under_review")
+        self.assertEqual(match_option("current_status", "approved", "What is the status?"), "application_approved")
+
+    def test_generic_answers_need_the_matching_question(self):
+        self.assertIsNone(match_option("current_status", "approved"))
+        self.assertIsNone(match_option("prior_followup", "no", "Please describe the issue."))
+        self.assertEqual(match_option("prior_followup", "no", "Have you followed up before?"), "no")
+
+    def test_followup_channels(self):
+        question = "Have you followed up before?"
+        self.assertEqual(match_option("prior_followup", "no reply to my calls", question), "phone")
+        self.assertEqual(match_option("prior_followup", "I called and emailed", question), "multiple")
+
+
+class NormalizeOptionTest(unittest.TestCase):
+    def test_values_are_coerced_onto_options(self):
+        self.assertEqual(normalize_option("service_type", "Passport"), "passport")
+        self.assertEqual(normalize_option("issue_duration", "one_to_four_weeks"), "one_to_four_weeks")
+        self.assertEqual(normalize_option("service_type", "xyz"), "")
+
+    def test_fields_without_options_are_unchanged(self):
+        self.assertEqual(normalize_option("name", "Ravi"), "Ravi")
+
+    def test_extract_option_fields_only_fills_wanted_option_fields(self):
+        self.assertEqual(extract_option_fields("my passport for 3 weeks", ["service_type", "issue_duration", "name"]),
+                         {"service_type": "passport", "issue_duration": "one_to_four_weeks"})
+
+
+if __name__ == "__main__":
+    unittest.main()
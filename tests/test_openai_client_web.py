@@ -0,0 +1,82 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from core_logic.openai_client_web import ResilientOpenAI, CircuitBreaker, CircuitOpenError, DeadlineExceededError
+
+
+def make_client(create, call_timeouts=None, hedge_call_types=(), hedge_delay=0.05, failure_threshold=1, reset_timeout=0.05):
+    """ResilientOpenAI whose upstream chat.completions.create is `create`, with one fast-resetting "chat" breaker."""
+    client = ResilientOpenAI(api_key="sk-test", call_timeouts=call_timeouts or {"chat": 2.0}, max_retries=0,
+                             hedge_call_types=hedge_call_types, hedge_delay=hedge_delay)
+    client._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    client.breakers["chat"] = CircuitBreaker("chat", failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+    return client
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def open_circuit(self, client):
+        with self.assertRaises(TimeoutError):
+            client.for_call("chat").chat.completions.create(model="m", messages=[])
+        self.assertEqual(client.breakers["chat"].state, CircuitBreaker.OPEN)
+        time.sleep(0.06) # Past reset_timeout: the next call is the half-open trial
+
+    def test_trial_with_non_api_error_frees_the_trial(self):
+        outcomes = [TimeoutError("upstream down"), ValueError("bad response"), "ok"]
+
+        def create(**kwargs):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        client = make_client(create)
+        self.open_circuit(client)
+        with self.assertRaises(ValueError):
+            client.for_call("chat").chat.completions.create(model="m", messages=[])
+        self.assertEqual(client.breakers["chat"].state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(client.for_call("chat").chat.completions.create(model="m", messages=[]), "ok")
+        self.assertEqual(client.breakers["chat"].state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens_the_circuit(self):
+        def create(**kwargs):
+            raise TimeoutError("upstream down")
+
+        client = make_client(create)
+        self.open_circuit(client)
+        with self.assertRaises(TimeoutError):
+            client.for_call("chat").chat.completions.create(model="m", messages=[])
+        with self.assertRaises(CircuitOpenError):
+            client.for_call("chat").chat.completions.create(model="m", messages=[])
+
+
+class DeadlineTest(unittest.TestCase):
+    def test_retries_stay_within_the_total_deadline(self):
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs["timeout"])
+            raise TimeoutError("slow upstream")
+
+        client = make_client(create, call_timeouts={"chat": 1.0}, failure_threshold=100)
+        client.max_retries = 50
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            client.for_call("chat").chat.completions.create(model="m", messages=[])
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertTrue(all(float(getattr(timeout, "read", timeout)) <= 1.0 for timeout in calls))
+
+    def test_hedged_call_stops_at_the_deadline(self):
+        def create(**kwargs):
+            time.sleep(2.0)
+            return "late"
+
+        client = make_client(create, call_timeouts={"chat": 0.6}, hedge_call_types=("chat",), failure_threshold=100)
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceededError):
+            client.for_call("chat").chat.completions.create(model="m", messages=[])
+        self.assertLess(time.monotonic() - start, 0.8)
+
+
+if __name__ == "__main__":
+    unittest.main()
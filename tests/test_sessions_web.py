@@ -0,0 +1,127 @@
+import os
+import time
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from core_logic.sessions_web import SessionRegistry, MemorySessionBackend, SQLiteSessionBackend, create_session_backend
+
+
+def make_registry(**kwargs):
+    """SessionRegistry without the sweeper thread, sizing every value by its length."""
+    kwargs.setdefault("sweep_interval", 0)
+    kwargs.setdefault("size_estimator", len)
+    return SessionRegistry(**kwargs)
+
+
+class SessionRegistryTest(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        registry = make_registry(max_entries=2)
+        registry.put("a", "1")
+        registry.put("b", "2")
+        registry.get("a")
+        registry.put("c", "3")
+        self.assertNotIn("b", registry)
+        self.assertEqual(registry.get("a"), "1")
+        self.assertEqual(registry.stats()["evictions_lru"], 1)
+
+    def test_byte_cap_evicts_oldest_but_keeps_the_newest(self):
+        registry = make_registry(max_bytes=10)
+        registry.put("a", "x" * 6)
+        registry.put("b", "x" * 6)
+        self.assertNotIn("a", registry)
+        registry.put("c", "x" * 50)
+        self.assertEqual(len(registry), 1)
+        self.assertIn("c", registry)
+
+    def test_touch_remeasures_a_grown_value(self):
+        registry = make_registry(max_bytes=10)
+        value = ["x"]
+        registry.put("a", value)
+        registry.put("b", ["x"])
+        value.extend("x" * 9)
+        registry.touch("a")
+        self.assertNotIn("b", registry)
+        self.assertEqual(registry.stats()["approx_bytes"], 10)
+
+    def test_idle_entries_expire(self):
+        registry = make_registry(idle_ttl=0.05)
+        registry.put("a", "1")
+        registry.put("b", "2")
+        time.sleep(0.1)
+        registry.put("c", "3")
+        self.assertIsNone(registry.get("a"))
+        self.assertEqual(registry.sweep(), 1)
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.stats()["evictions_ttl"], 2)
+
+    def test_sweeper_thread_drops_idle_entries(self):
+        registry = make_registry(idle_ttl=0.05, sweep_interval=0.02)
+        self.addCleanup(registry.close)
+        registry.put("a", "1")
+        time.sleep(0.2)
+        self.assertEqual(len(registry), 0)
+
+
+class MemorySessionBackendTest(unittest.TestCase):
+    def test_least_recently_saved_snapshot_is_evicted(self):
+        backend = MemorySessionBackend(max_entries=2)
+        backend.save("a", b"1")
+        backend.save("b", b"2")
+        backend.save("a", b"1")
+        backend.save("c", b"3")
+        self.assertIsNone(backend.load("b"))
+        self.assertEqual(backend.load("a"), b"1")
+
+    def test_idle_and_expired_snapshots_are_dropped(self):
+        backend = MemorySessionBackend(idle_ttl=0.05)
+        backend.save("idle", b"1")
+        backend.save("short", b"2", ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(backend.load("short"))
+        time.sleep(0.05)
+        self.assertIsNone(backend.load("idle"))
+
+    def test_purge_deletes_entries(self):
+        backend = MemorySessionBackend()
+        backend.save("idle", b"1")
+        backend.save("short", b"2", ttl=0.01)
+        time.sleep(0.05)
+        backend.save("fresh", b"3")
+        self.assertEqual(backend.purge(0.03), 2)
+        self.assertEqual(list(backend._data), ["fresh"])
+
+    def test_empty_backend_is_truthy(self):
+        self.assertTrue(create_session_backend("memory"))
+
+
+class SQLiteSessionBackendTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.db_path = os.path.join(directory, "sessions.db")
+
+    def test_expired_snapshot_is_purged(self):
+        backend = SQLiteSessionBackend(self.db_path)
+        backend.save("short", b"1", ttl=0.01)
+        backend.save("kept", b"2")
+        time.sleep(0.02)
+        self.assertEqual(backend.purge(60), 1)
+        self.assertIsNone(backend.load("short"))
+        self.assertEqual(backend.load("kept"), b"2")
+
+    def test_database_without_expiry_column_is_upgraded(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE sessions (key TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)")
+        conn.execute("INSERT INTO sessions VALUES ('old', x'01', ?)", (time.time(),))
+        conn.commit()
+        conn.close()
+        backend = SQLiteSessionBackend(self.db_path)
+        self.assertEqual(backend.load("old"), b"\x01")
+        backend.save("short", b"1", ttl=60)
+        self.assertEqual(backend.load("short"), b"1")
+
+
+if __name__ == "__main__":
+    unittest.main()
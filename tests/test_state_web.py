@@ -0,0 +1,70 @@
+import json
+import unittest
+from unittest import mock
+
+from core_logic import state_web
+from core_logic.state_web import ConversationState, STATE_FORMAT_VERSION
+
+
+def make_state():
+    state = ConversationState(default_language="hindi", language_code="hi")
+    state.conversation_stage = "collecting_info"
+    state.grievance_category = "corruption"
+    state.form_data = {"name": "सुनीता", "bribe_amount": "5000"}
+    state.conversation_history.append("user", "मेरे से रिश्वत मांगी गई")
+    state.conversation_history.append("assistant", "Could you please provide your name?")
+    state.conversation_history.summary_lines.append("user: earlier turn")
+    return state
+
+
+class ConversationStateTest(unittest.TestCase):
+    def assertSameState(self, restored, original):
+        for attribute in ("default_language", "language_code", "conversation_stage", "grievance_category", "form_data"):
+            self.assertEqual(getattr(restored, attribute), getattr(original, attribute))
+        self.assertEqual(restored.conversation_history.to_list(), original.conversation_history.to_list())
+        self.assertEqual(restored.conversation_history.summary_lines, original.conversation_history.summary_lines)
+
+    def test_json_snapshot_round_trips(self):
+        state = make_state()
+        with mock.patch.object(state_web, "msgpack", None):
+            blob = state.pack()
+        self.assertEqual(blob[:1], b"J")
+        self.assertSameState(ConversationState.unpack(blob), state)
+
+    @unittest.skipUnless(state_web.msgpack, "msgpack is not installed")
+    def test_msgpack_snapshot_round_trips(self):
+        state = make_state()
+        blob = state.pack()
+        self.assertEqual(blob[:1], b"M")
+        self.assertSameState(ConversationState.unpack(blob), state)
+
+    def test_msgpack_snapshot_without_msgpack_is_rejected(self):
+        with mock.patch.object(state_web, "msgpack", None):
+            with self.assertRaises(ValueError):
+                ConversationState.unpack(b"M\x98\x02")
+
+    def test_unknown_tag_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ConversationState.unpack(b"X[]")
+
+    def test_roles_are_stored_as_codes(self):
+        record = make_state().to_record()
+        self.assertEqual(record[0], STATE_FORMAT_VERSION)
+        self.assertEqual([role for role, _ in record[6]], ["u", "a"])
+
+    def test_version_1_snapshot_is_read_without_summary(self):
+        record = [1, "english", "en", "understanding", None, {"name": "Ravi"}, [["u", "hello"], ["a", "Hi!"]]]
+        state = ConversationState.unpack(b"J" + json.dumps(record).encode("utf-8"))
+        self.assertEqual(state.form_data, {"name": "Ravi"})
+        self.assertEqual(state.conversation_history.to_list(),
+                         [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "Hi!"}])
+        self.assertEqual(state.conversation_history.summary_lines, [])
+
+    def test_unsupported_version_is_rejected(self):
+        record = [STATE_FORMAT_VERSION + 1, "english", "en", "understanding", None, {}, [], []]
+        with self.assertRaises(ValueError):
+            ConversationState.unpack(b"J" + json.dumps(record).encode("utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+from core_logic.storage_web import GrievanceStore
+
+
+class GrievanceStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, ignore_errors=True)
+
+    def make_store(self, **kwargs):
+        """GrievanceStore in the test directory without a background compactor unless asked for."""
+        kwargs.setdefault("compaction_interval", 0)
+        store = GrievanceStore(self.base_dir, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def segment_names(self, store):
+        return sorted(name for name in os.listdir(store.log_dir) if name.startswith("segment-"))
+
+    def test_concurrent_appends_share_a_commit(self):
+        store = self.make_store(group_commit_interval=0.05)
+        batches = []
+        write_batch = store._write_batch
+        store._write_batch = lambda payload: (batches.append(payload.count(b"\n")), write_batch(payload))
+
+        threads = [threading.Thread(target=store.append, args=({"id": i},)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(batches), 20)
+        self.assertLess(len(batches), 20)
+        self.assertEqual(sorted(record["id"] for record in store.iter_records()), list(range(20)))
+
+    def test_torn_tail_is_truncated_on_startup(self):
+        log_dir = os.path.join(self.base_dir, "grievance_log")
+        os.makedirs(log_dir)
+        with open(os.path.join(log_dir, "segment-00000001.jsonl"), "wb") as f:
+            f.write(b'{"id":1}\n{"id":2}\n{"id":3,"na')
+        store = self.make_store()
+        self.assertEqual([record["id"] for record in store.iter_records()], [1, 2])
+        store.append({"id": 4})
+        self.assertEqual([record["id"] for record in store.iter_records()], [1, 2, 4])
+
+    def test_active_segment_rotates_past_max_size(self):
+        store = self.make_store(segment_max_bytes=64)
+        for i in range(10):
+            store.append({"id": i, "text": "x" * 20})
+        self.assertGreater(len(self.segment_names(store)), 3)
+        self.assertEqual([record["id"] for record in store.iter_records()], list(range(10)))
+
+    def test_compaction_gzips_sealed_segments(self):
+        store = self.make_store(segment_max_bytes=64, compress_after_segments=1)
+        for i in range(10):
+            store.append({"id": i, "text": "x" * 20})
+        self.assertGreater(store.compact(), 0)
+        names = self.segment_names(store)
+        self.assertTrue(any(name.endswith(".gz") for name in names))
+        self.assertFalse(names[-1].endswith(".gz"))
+        self.assertEqual(store.compact(), 0)
+        self.assertEqual([record["id"] for record in store.iter_records()], list(range(10)))
+
+    def test_iter_records_survives_concurrent_compaction(self):
+        store = self.make_store(segment_max_bytes=64, compress_after_segments=0)
+        for i in range(10):
+            store.append({"id": i, "text": "x" * 20})
+        segment_entries = store._segment_entries
+
+        def listed_before_compaction():
+            entries = segment_entries()
+            store._segment_entries = segment_entries
+            store.compact()
+            return entries
+
+        store._segment_entries = listed_before_compaction
+        self.assertEqual([record["id"] for record in store.iter_records()], list(range(10)))
+
+    def test_close_stops_the_compactor(self):
+        store = self.make_store(compaction_interval=60)
+        store.close()
+        self.assertFalse(store._compactor_thread.is_alive())
+
+    def test_legacy_file_is_migrated_once(self):
+        with open(os.path.join(self.base_dir, "grievances.json"), "w", encoding="utf-8") as f:
+            json.dump([{"id": "old-1"}, {"id": "old-2"}], f)
+        store = self.make_store()
+        store.append({"id": "new"})
+        self.assertEqual(store.migrate_legacy_file(), 2)
+        self.assertEqual(store.migrate_legacy_file(), 0)
+        self.assertEqual([record["id"] for record in store.iter_records()], ["old-1", "old-2", "new"])
+        self.assertTrue(os.path.exists(os.path.join(self.base_dir, "grievances.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()